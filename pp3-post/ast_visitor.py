@@ -0,0 +1,142 @@
+# ast_visitor.py
+"""
+Shared node dispatch for the compiler phases.
+
+Every AST node built by the parser is a one-key dict such as
+{"IfStmt": {...}}. node_kind() reads that key once, and each phase
+(format_nodes, semantic_analyzer, code_generation) builds a handler table
+with make_dispatcher() so a node is routed with a single dictionary lookup
+instead of testing every possible key in turn.
+"""
+
+NODE_KINDS = frozenset({
+    "Program", "FnDecl", "VarDecl", "StmtBlock",
+    "AssignExpr", "ReturnStmt", "PrintStmt", "IfStmt", "WhileStmt", "ForStmt",
+    "BreakStmt", "ContinueStmt", "Call", "FieldAccess",
+    "ArithmeticExpr", "LogicalExpr", "EqualityExpr", "RelationalExpr",
+    "IntConstant", "DoubleConstant", "BoolConstant", "StringConstant",
+    "ReadIntegerExpr", "ReadLine", "Empty",
+})
+
+# Bare (unwrapped) expression dicts are classified by their operator
+OPERATOR_KINDS = {
+    "+": "ArithmeticExpr", "-": "ArithmeticExpr", "*": "ArithmeticExpr",
+    "/": "ArithmeticExpr", "%": "ArithmeticExpr",
+    "&&": "LogicalExpr", "||": "LogicalExpr", "!": "LogicalExpr",
+    "==": "EqualityExpr", "!=": "EqualityExpr",
+    "<": "RelationalExpr", "<=": "RelationalExpr",
+    ">": "RelationalExpr", ">=": "RelationalExpr",
+}
+
+
+class UnknownNodeError(ValueError):
+    """Raised when a phase is handed a node kind it has no handler for."""
+
+
+def node_kind(node):
+    """
+    Returns (kind, payload) for an AST node.
+    Wrapped nodes give their single key and inner dict; bare operator
+    dicts are classified by operator and returned unchanged.
+    Anything else gives (None, node).
+    """
+    if isinstance(node, dict) and node:
+        if len(node) == 1:
+            kind = next(iter(node))
+            if kind in NODE_KINDS:
+                return kind, node[kind]
+        operator = node.get("operator")
+        if operator in OPERATOR_KINDS and "right" in node:
+            return OPERATOR_KINDS[operator], node
+    return None, node
+
+
+def describe_node(node):
+    """Short human-readable label for a node, used in error messages."""
+    kind, _ = node_kind(node)
+    if kind is not None:
+        return kind
+    if isinstance(node, dict) and node:
+        return next(iter(node))
+    return type(node).__name__
+
+
+def report_unknown_node(phase, node):
+    """
+    Central handler for nodes a phase does not understand.
+    Every dispatcher ends up here instead of silently skipping the node.
+    """
+    raise UnknownNodeError(f"{phase}: unhandled node kind '{describe_node(node)}'")
+
+
+def make_dispatcher(phase, handlers, arity=1):
+    """
+    Builds the dispatch function for one phase.
+    handlers maps node kind -> callable(payload, *args) and arity is the
+    number of extra arguments every handler takes (e.g. 1 for `level` in
+    format_nodes). The returned function detects the kind once and calls the
+    matching handler, reporting unknown kinds through report_unknown_node().
+    """
+    for kind in handlers:
+        if kind not in NODE_KINDS:
+            raise ValueError(f"{phase}: '{kind}' is not a known node kind")
+
+    table = dict(handlers)
+    get_handler = table.get
+
+    def dispatch_slow(node, args):
+        kind, payload = node_kind(node)
+        handler = get_handler(kind)
+        if handler is None:
+            report_unknown_node(phase, node)
+        return handler(payload, *args)
+
+    # Fixed-arity fast paths avoid packing *args on every node. A wrapped node
+    # is a one-key dict, so its first key is the kind.
+    if arity == 1:
+        def dispatch(node, arg):
+            if type(node) is dict:
+                for kind in node:
+                    handler = get_handler(kind)
+                    if handler is not None and len(node) == 1:
+                        return handler(node[kind], arg)
+                    break
+            return dispatch_slow(node, (arg,))
+    elif arity == 2:
+        def dispatch(node, arg1, arg2):
+            if type(node) is dict:
+                for kind in node:
+                    handler = get_handler(kind)
+                    if handler is not None and len(node) == 1:
+                        return handler(node[kind], arg1, arg2)
+                    break
+            return dispatch_slow(node, (arg1, arg2))
+    else:
+        def dispatch(node, *args):
+            return dispatch_slow(node, args)
+
+    dispatch.phase = phase
+    dispatch.handlers = table
+    return dispatch
+
+
+def iter_children(node):
+    """
+    Yields the direct child nodes of an AST node.
+    Identifier/Type wrappers and plain values are skipped.
+    """
+    _, payload = node_kind(node)
+    if isinstance(payload, dict):
+        values = payload.values()
+    elif isinstance(payload, list):
+        values = [payload]
+    else:
+        return
+
+    for value in values:
+        if isinstance(value, list):
+            for item in value:
+                if node_kind(item)[0] is not None:
+                    yield item
+        elif node_kind(value)[0] is not None:
+            yield value
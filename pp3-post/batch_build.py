@@ -0,0 +1,231 @@
+# batch_build.py
+"""
+Batch compilation of a directory tree (decafc build).
+
+Every .decaf file under SRC_DIR is compiled to OUT_DIR/<same relative
+path>.s, optionally linked with defs.asm. Files are compiled in parallel
+worker processes. An input is skipped when its output is up to date: a
+manifest in OUT_DIR records each input's modification time and SHA-256
+together with the options and compiler version it was built with; an
+input whose mtime changed but whose content did not is not recompiled
+either. A file that fails to compile, including one that makes the
+compiler raise, is reported as a failure and loses any .s left from an
+earlier successful build. Outputs and manifest entries of sources that
+no longer exist are removed. The build ends with a summary of failures
+and timings.
+
+Usage: python decafc.py build SRC_DIR OUT_DIR [-j N] [--link] [--force]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from compiler import compile, link_runtime
+
+MANIFEST_NAME = ".decafc-manifest.json"
+COMPILER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def file_sha256(path):
+    with open(path, "rb") as source_file:
+        return hashlib.sha256(source_file.read()).hexdigest()
+
+
+def compiler_version():
+    """
+    Hash of the compiler's own modules and runtime, so outputs are rebuilt
+    after the compiler changes.
+    """
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(COMPILER_DIR)):
+        if name.endswith(".py") or name == "defs.asm":
+            with open(os.path.join(COMPILER_DIR, name), "rb") as module_file:
+                digest.update(name.encode() + b"\0" + module_file.read())
+    return digest.hexdigest()
+
+
+def find_sources(src_dir):
+    """Relative paths of all .decaf files under src_dir, sorted."""
+    sources = []
+    for root, dirs, files in os.walk(src_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith(".decaf"):
+                sources.append(os.path.relpath(os.path.join(root, name), src_dir))
+    return sources
+
+
+def output_path_for(out_dir, rel_path):
+    return os.path.join(out_dir, os.path.splitext(rel_path)[0] + ".s")
+
+
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME), "r") as manifest_file:
+            return json.load(manifest_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    with open(path + ".tmp", "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def is_up_to_date(record, source_path, output_path, options, mtime_ns):
+    """
+    Cheap check first (same mtime), content hash only when the mtime moved.
+    mtime_ns is taken by the caller before the file is read.
+    """
+    if record is None or record.get("options") != options or not os.path.exists(output_path):
+        return False
+    if record.get("mtime_ns") == mtime_ns:
+        return True
+    return file_sha256(source_path) == record["sha256"]
+
+
+def build_one(job):
+    """
+    Compiles one file and writes its .s on success, or removes a stale .s
+    on failure. Runs in a worker process; returns a small picklable summary.
+    An exception raised by the compiler is a failure of this file only.
+    The mtime is read before the source: if the file is saved while it
+    compiles, the recorded mtime is older than the file's and the next
+    build compares hashes instead of trusting a stale .s.
+    """
+    rel_path, source_path, output_path, link = job
+    start = time.perf_counter()
+    mtime_ns = os.stat(source_path).st_mtime_ns
+    with open(source_path, "rb") as source_file:
+        raw = source_file.read()
+    try:
+        result = compile(raw.decode())
+    except Exception as error:
+        ok, phase, message = False, "internal", f"{type(error).__name__}: {error}"
+    else:
+        ok, phase = result.ok, result.phase
+        # "*** Error line N." plus the message, without the echoed source line
+        first_error = [line for line in result.errors[0].splitlines() if line.startswith("***")] if result.errors else []
+        message = " ".join(first_error)
+
+    if ok:
+        output = link_runtime(result.output) if link else result.output
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        with open(output_path, "w") as out_file:
+            out_file.write(output)
+    elif os.path.exists(output_path):
+        os.remove(output_path)
+
+    return {
+        "path": rel_path,
+        "ok": ok,
+        "phase": phase,
+        "error": message,
+        "seconds": time.perf_counter() - start,
+        "sha256": hashlib.sha256(raw).hexdigest(),
+        "mtime_ns": mtime_ns,
+    }
+
+
+def build(src_dir, out_dir, jobs=1, link=False, force=False):
+    """Runs a build and returns the list of per-file results (skipped files excluded)."""
+    start = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    options = {"link": link, "compiler": compiler_version()}
+    previous = load_manifest(out_dir)
+    manifest = {} if force else previous
+    sources = find_sources(src_dir)
+
+    removed = remove_orphans(out_dir, previous, sources)
+    for rel_path in removed:
+        manifest.pop(rel_path, None)
+
+    pending, skipped = [], 0
+    for rel_path in sources:
+        source_path = os.path.join(src_dir, rel_path)
+        output_path = output_path_for(out_dir, rel_path)
+        record = manifest.get(rel_path)
+        mtime_ns = os.stat(source_path).st_mtime_ns
+        if is_up_to_date(record, source_path, output_path, options, mtime_ns):
+            # Content unchanged; remember the new mtime so the next check is cheap
+            record["mtime_ns"] = mtime_ns
+            skipped += 1
+        else:
+            pending.append((rel_path, source_path, output_path, link))
+
+    if jobs > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(jobs) as pool:
+            results = list(pool.map(build_one, pending, chunksize=max(1, len(pending) // (jobs * 8))))
+    else:
+        results = [build_one(job) for job in pending]
+
+    for result in results:
+        if result["ok"]:
+            manifest[result["path"]] = {
+                "sha256": result["sha256"],
+                "mtime_ns": result["mtime_ns"],
+                "options": options,
+            }
+        else:
+            manifest.pop(result["path"], None)
+    save_manifest(out_dir, manifest)
+
+    print_summary(results, skipped, len(removed), time.perf_counter() - start, jobs)
+    return results
+
+
+def remove_orphans(out_dir, manifest, sources):
+    """
+    Deletes the .s of every manifest entry whose source is gone and
+    returns those entries' relative paths.
+    """
+    present = set(sources)
+    orphans = [rel_path for rel_path in manifest if rel_path not in present]
+    for rel_path in orphans:
+        output_path = output_path_for(out_dir, rel_path)
+        if os.path.exists(output_path):
+            os.remove(output_path)
+    return orphans
+
+
+def print_summary(results, skipped, removed, elapsed, jobs):
+    failures = [result for result in results if not result["ok"]]
+    compiled = len(results) - len(failures)
+    compile_time = sum(result["seconds"] for result in results)
+
+    print(f"{compiled} compiled, {skipped} up to date, {len(failures)} failed, {removed} removed "
+          f"in {elapsed:.2f}s wall ({compile_time:.2f}s compiling, -j {jobs})")
+
+    slowest = sorted(results, key=lambda result: -result["seconds"])[:5]
+    if slowest:
+        print("slowest:")
+        for result in slowest:
+            print(f"  {result['seconds'] * 1000:8.1f} ms  {result['path']}")
+
+    if failures:
+        print("failures:")
+        for result in failures:
+            print(f"  {result['path']} ({result['phase']}): {result['error']}")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="decafc build", description="Compile every .decaf file under a directory.")
+    parser.add_argument("src_dir")
+    parser.add_argument("out_dir")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--link", action="store_true", help="append defs.asm to every output")
+    parser.add_argument("--force", action="store_true", help="ignore the manifest and rebuild everything")
+    args = parser.parse_args(argv)
+
+    results = build(args.src_dir, args.out_dir, args.jobs, args.link, args.force)
+    sys.exit(1 if any(not result["ok"] for result in results) else 0)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
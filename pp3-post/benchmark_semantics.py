@@ -0,0 +1,66 @@
+"""
+Benchmark: serial vs. process-pool semantic checking.
+
+Builds a large Decaf program (the same generator as benchmark_visitor),
+then times check_semantics() with 1, 2, 4, ... workers up to the given
+maximum, checking that every run reports exactly the same errors.
+Finally edits one function body and times a full re-check against an
+IncrementalAnalyzer re-check.
+
+Usage: python benchmark_semantics.py [num_functions] [max_workers]
+"""
+import os
+import sys
+import time
+
+from scanner_re import tokenize
+from parser import parse
+from semantic_analyzer import check_semantics
+from incremental import IncrementalAnalyzer
+from benchmark_visitor import build_source
+
+
+def main():
+    num_functions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+
+    tokens = tokenize(build_source(num_functions))
+    ast_root = parse(tokens)
+    print(f"AST: {num_functions} functions, {len(tokens)} tokens, {os.cpu_count()} cpus")
+
+    start = time.perf_counter()
+    expected = check_semantics(ast_root, tokens)
+    serial = time.perf_counter() - start
+    print(f"workers  1: {serial * 1000:8.2f} ms")
+
+    workers = 2
+    while workers <= max_workers:
+        start = time.perf_counter()
+        errors = check_semantics(ast_root, tokens, workers=workers)
+        elapsed = time.perf_counter() - start
+        assert errors == expected, "parallel run reported different errors"
+        print(f"workers {workers:2}: {elapsed * 1000:8.2f} ms  ({serial / elapsed:.2f}x)")
+        workers *= 2
+
+    # One-line edit in the middle of the file, same number of lines
+    source = build_source(num_functions)
+    edited = source.replace(f"y = x - {num_functions // 2};", "y = x - 1;", 1)
+    analyzer = IncrementalAnalyzer()
+    analyzer.check(ast_root, tokens)
+
+    tokens = tokenize(edited)
+    ast_root = parse(tokens)
+    start = time.perf_counter()
+    expected = check_semantics(ast_root, tokens)
+    full = time.perf_counter() - start
+    start = time.perf_counter()
+    errors = analyzer.check(ast_root, tokens)
+    incremental = time.perf_counter() - start
+    assert errors == expected, "incremental run reported different errors"
+    print(f"after edit, full re-check : {full * 1000:8.2f} ms")
+    print(f"after edit, incremental   : {incremental * 1000:8.2f} ms  "
+          f"({analyzer.checked} checked, {analyzer.reused} reused)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Benchmark: kind detection by key probing vs. the shared dispatch tables.
+
+Builds a large Decaf program, parses it once, then routes every AST node
+to a handler
+  1. the old way  - an if-chain testing node keys in format_node order
+  2. the new way  - a make_dispatcher() handler table
+and finally times the real phases that now use the dispatch tables.
+
+Usage: python benchmark_visitor.py [num_functions] [repeats]
+"""
+import sys
+import time
+
+from scanner_re import tokenize
+from parser import parse
+from format_nodes import format_ast_string
+from semantic_analyzer import check_semantics
+from ast_visitor import NODE_KINDS, make_dispatcher, iter_children
+
+FUNCTION_TEMPLATE = """
+int f{i}(int a, int b) {{
+  int x;
+  int y;
+  bool done;
+  x = a + b * 2;
+  y = x - {i};
+  done = x < y && !(a == b) || y >= 10;
+  while (x > 0) {{
+    if (x % 2 == 0) x = x / 2; else x = x - 1;
+    y = y + x;
+  }}
+  for (x = 0; x < 10; x = x + 1) Print("value ", x, y);
+  return y;
+}}
+"""
+
+
+def build_source(num_functions):
+    parts = [FUNCTION_TEMPLATE.format(i=i) for i in range(num_functions)]
+    parts.append("void main() { Print(f0(1, 2)); }\n")
+    return "".join(parts)
+
+
+def _visit(payload, level):
+    return payload
+
+
+def dispatch_probing(node, level):
+    """The original if-chain: up to 24 key tests before the handler runs."""
+    if "Program" in node:
+        return _visit(node["Program"], level)
+    if "FnDecl" in node:
+        return _visit(node["FnDecl"], level)
+    if "VarDecl" in node:
+        return _visit(node["VarDecl"], level)
+    if "StmtBlock" in node:
+        return _visit(node["StmtBlock"], level)
+    if "AssignExpr" in node:
+        return _visit(node["AssignExpr"], level)
+    if "ReturnStmt" in node:
+        return _visit(node["ReturnStmt"], level)
+    if "ArithmeticExpr" in node:
+        return _visit(node["ArithmeticExpr"], level)
+    if "FieldAccess" in node:
+        return _visit(node["FieldAccess"], level)
+    if "Call" in node:
+        return _visit(node["Call"], level)
+    if "PrintStmt" in node:
+        return _visit(node["PrintStmt"], level)
+    if "StringConstant" in node:
+        return _visit(node["StringConstant"], level)
+    if "IntConstant" in node:
+        return _visit(node["IntConstant"], level)
+    if "DoubleConstant" in node:
+        return _visit(node["DoubleConstant"], level)
+    if "BoolConstant" in node:
+        return _visit(node["BoolConstant"], level)
+    if "ReadIntegerExpr" in node:
+        return _visit(node["ReadIntegerExpr"], level)
+    if "LogicalExpr" in node:
+        return _visit(node["LogicalExpr"], level)
+    if "EqualityExpr" in node:
+        return _visit(node["EqualityExpr"], level)
+    if "RelationalExpr" in node:
+        return _visit(node["RelationalExpr"], level)
+    if "WhileStmt" in node:
+        return _visit(node["WhileStmt"], level)
+    if "IfStmt" in node:
+        return _visit(node["IfStmt"], level)
+    if "ForStmt" in node:
+        return _visit(node["ForStmt"], level)
+    if "BreakStmt" in node:
+        return _visit(node["BreakStmt"], level)
+    if "ReadLine" in node:
+        return _visit(node["ReadLine"], level)
+    if "Empty" in node:
+        return _visit(node["Empty"], level)
+    return None
+
+
+dispatch_table = make_dispatcher("benchmark", {kind: _visit for kind in NODE_KINDS})
+
+
+def collect_nodes(node, nodes):
+    nodes.append(node)
+    for child in iter_children(node):
+        collect_nodes(child, nodes)
+    return nodes
+
+
+def visit_all(dispatch, nodes):
+    for node in nodes:
+        dispatch(node, 0)
+
+
+def best_of(repeats, fn, *args):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    num_functions = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    tokens = tokenize(build_source(num_functions))
+    ast_root = parse(tokens)
+    nodes = collect_nodes(ast_root, [])
+    print(f"AST: {num_functions} functions, {len(nodes)} nodes, {len(tokens)} tokens")
+
+    probe = best_of(repeats, visit_all, dispatch_probing, nodes)
+    table = best_of(repeats, visit_all, dispatch_table, nodes)
+    print(f"dispatch (key probing)  : {probe * 1000:8.2f} ms")
+    print(f"dispatch (handler table): {table * 1000:8.2f} ms  ({probe / table:.2f}x faster)")
+
+    # The if-chain cost grows with a kind's position in it; the table does not
+    by_kind = {}
+    for node in nodes:
+        by_kind.setdefault(next(iter(node)), []).append(node)
+    print("per kind (probing ms / table ms):")
+    for kind, group in sorted(by_kind.items(), key=lambda item: -len(item[1])):
+        if len(group) < 50:
+            continue
+        probe = best_of(repeats, visit_all, dispatch_probing, group)
+        table = best_of(repeats, visit_all, dispatch_table, group)
+        print(f"  {kind:<16} x{len(group):<6} {probe * 1000:7.2f} / {table * 1000:7.2f}  ({probe / table:.2f}x)")
+
+    print(f"format_ast_string       : {best_of(repeats, format_ast_string, ast_root) * 1000:8.2f} ms")
+    print(f"check_semantics         : {best_of(1, check_semantics, ast_root, tokens) * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# binding.py
+"""
+Resolution pass run after semantic analysis.
+
+Every variable declaration gets a Symbol with a unique id, a storage class
+(global, formal or local) and a slot number, and every FieldAccess that
+names a variable gets the Symbol it resolves to (payload["symbol"]).
+Code generation then reads addresses straight off the Symbol instead of
+looking names up in per-function dictionaries.
+
+Scoping follows the semantic analyzer: globals, then a function's formals,
+then the function body, with one more scope for each block nested in it.
+Every local declaration has its own slot, so a name redeclared in an inner
+block or reused in a sibling block never shares storage with another.
+"""
+from ast_visitor import node_kind, iter_children
+from symbol_table import SymbolTable
+
+GLOBAL = "global"
+FORMAL = "formal"
+LOCAL = "local"
+
+WORD_SIZE = 4
+FIRST_FORMAL_OFFSET = 4     # formals sit above the saved $fp: +4, +8, ...
+FIRST_LOCAL_OFFSET = -8     # below the saved $fp/$ra: -8, -12, ...
+
+END_BLOCK = object()        # bind_function's walk marker: leave a block's scope
+
+
+class Symbol:
+    """One declared variable and where it lives at run time."""
+
+    __slots__ = ("id", "name", "storage", "slot", "offset", "is_global")
+
+    def __init__(self, symbol_id, name, storage, slot):
+        self.id = symbol_id
+        self.name = name
+        self.storage = storage
+        self.slot = slot
+        self.is_global = storage == GLOBAL
+        if storage == GLOBAL:
+            self.offset = slot * WORD_SIZE                          # from $gp
+        elif storage == FORMAL:
+            self.offset = FIRST_FORMAL_OFFSET + slot * WORD_SIZE    # from $fp
+        else:
+            self.offset = FIRST_LOCAL_OFFSET - slot * WORD_SIZE     # from $fp
+
+    def __repr__(self):
+        return f"Symbol({self.id}, {self.name!r}, {self.storage}, slot {self.slot})"
+
+
+def declared_name(var_decl):
+    """Globals and formals wrap their name in an Identifier; locals do not."""
+    identifier = var_decl["identifier"]
+    if isinstance(identifier, dict) and "Identifier" in identifier:
+        return identifier["Identifier"]["name"]
+    return identifier
+
+
+def bind_program(ast_root):
+    """
+    Attaches Symbols to every VarDecl and variable FieldAccess in the program.
+    Each FnDecl also gets "local_slots", the number of local slots its frame
+    needs. Returns the list of all Symbols, indexed by id.
+    """
+    symbols = SymbolTable()
+    all_symbols = []
+
+    def new_symbol(var_decl, storage, slot):
+        symbol = Symbol(len(all_symbols), declared_name(var_decl), storage, slot)
+        all_symbols.append(symbol)
+        var_decl["symbol"] = symbol
+        symbols.declare(symbol.name, symbol)
+        return symbol
+
+    global_slot = 0
+    for decl in ast_root["Program"]:
+        if "VarDecl" in decl:
+            new_symbol(decl["VarDecl"], GLOBAL, global_slot)
+            global_slot += 1
+
+    for decl in ast_root["Program"]:
+        if "FnDecl" in decl:
+            bind_function(decl["FnDecl"], symbols, new_symbol)
+
+    return all_symbols
+
+
+def bind_function(fn_decl, symbols, new_symbol):
+    """Binds one function's formals and body."""
+    symbols.push_scope("params")
+    for slot, formal in enumerate(fn_decl["formals"]):
+        new_symbol(formal["VarDecl"], FORMAL, slot)
+
+    symbols.push_scope("body")
+    local_slots = 0
+
+    # Iterative pre-order walk; children are pushed reversed so declarations
+    # are numbered in source order. A nested block's scope is popped when the
+    # walk reaches the END_BLOCK marker pushed beneath its children.
+    body = fn_decl["body"]
+    stack = [body]
+    while stack:
+        node = stack.pop()
+        if node is END_BLOCK:
+            symbols.pop_scope()
+            continue
+        kind, payload = node_kind(node)
+        if kind == "VarDecl":
+            new_symbol(payload, LOCAL, local_slots)
+            local_slots += 1
+            continue
+        if kind == "FieldAccess":
+            symbol = symbols.lookup(payload["identifier"])
+            if not isinstance(symbol, Symbol):
+                raise KeyError(f"Unresolved variable '{payload['identifier']}' on line {payload['line_num']}")
+            payload["symbol"] = symbol
+            continue
+        if kind == "StmtBlock" and node is not body:
+            symbols.push_scope("block")
+            stack.append(END_BLOCK)
+        stack.extend(reversed(list(iter_children(node))))
+
+    fn_decl["local_slots"] = local_slots
+    symbols.pop_scope()
+    symbols.pop_scope()
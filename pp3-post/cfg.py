@@ -0,0 +1,151 @@
+# cfg.py
+"""
+Basic blocks and control-flow graphs over three-address code.
+
+build_cfg() splits a TacFunction's instruction list into basic blocks: a
+block starts at the first instruction, at every Label and after every
+Goto, IfZ or Return. Edges follow Goto/IfZ targets and fall-through; a
+block ending in Return (or falling off the end of the function) has no
+successors. Block 0 is the entry. linearize() turns the (possibly edited)
+blocks back into one instruction list, and tidy_jumps() cleans up the
+jumps and labels an edit leaves behind.
+"""
+from tac import Label, Goto, IfZ, Return
+
+
+class BasicBlock:
+    """A maximal straight-line run of instructions."""
+
+    __slots__ = ("index", "instrs", "succs", "preds")
+
+    def __init__(self, index, instrs):
+        self.index = index
+        self.instrs = instrs
+        self.succs = []         # [BasicBlock], branch target after fall-through
+        self.preds = []
+
+    @property
+    def label(self):
+        """Name of the block's leading Label, if it has one."""
+        if self.instrs and isinstance(self.instrs[0], Label):
+            return self.instrs[0].name
+        return None
+
+    @property
+    def terminator(self):
+        """The final Goto/IfZ/Return, or None if the block falls through."""
+        if self.instrs and isinstance(self.instrs[-1], (Goto, IfZ, Return)):
+            return self.instrs[-1]
+        return None
+
+    def __repr__(self):
+        return f"B{self.index}"
+
+
+class ControlFlowGraph:
+    def __init__(self, function, blocks):
+        self.function = function
+        self.blocks = blocks
+        self.entry = blocks[0]
+        self._by_label = {block.label: block for block in blocks if block.label is not None}
+
+    def block_for_label(self, label):
+        return self._by_label[label]
+
+    def reverse_postorder(self):
+        """Blocks reachable from the entry, in reverse postorder."""
+        order = []
+        visited = {self.entry.index}
+        # Iterative DFS; each stack entry is (block, index of next successor)
+        stack = [(self.entry, 0)]
+        while stack:
+            block, next_succ = stack.pop()
+            if next_succ < len(block.succs):
+                stack.append((block, next_succ + 1))
+                succ = block.succs[next_succ]
+                if succ.index not in visited:
+                    visited.add(succ.index)
+                    stack.append((succ, 0))
+            else:
+                order.append(block)
+        order.reverse()
+        return order
+
+    def reachable(self):
+        return {block.index for block in self.reverse_postorder()}
+
+    def exits(self):
+        """Blocks with no successors (returns and the fall-off end)."""
+        return [block for block in self.blocks if not block.succs]
+
+    def linearize(self):
+        """Instruction list of all blocks, in block order."""
+        return [instr for block in self.blocks for instr in block.instrs]
+
+
+def split_blocks(code):
+    """Partitions an instruction list into lists of instructions, one per block."""
+    blocks = []
+    current = []
+    for instr in code:
+        if isinstance(instr, Label) and current:
+            blocks.append(current)
+            current = []
+        current.append(instr)
+        if isinstance(instr, (Goto, IfZ, Return)):
+            blocks.append(current)
+            current = []
+    if current or not blocks:
+        blocks.append(current)
+    return blocks
+
+
+def build_cfg(function, code=None):
+    """CFG for function.code (or for `code`, an instruction list of that function)."""
+    blocks = [BasicBlock(index, instrs) for index, instrs in enumerate(split_blocks(function.code if code is None else code))]
+    cfg = ControlFlowGraph(function, blocks)
+
+    for block in blocks:
+        last = block.terminator
+        falls_through = not isinstance(last, (Goto, Return))
+        if falls_through and block.index + 1 < len(blocks):
+            add_edge(block, blocks[block.index + 1])
+        if isinstance(last, (Goto, IfZ)):
+            add_edge(block, cfg.block_for_label(last.label))
+    return cfg
+
+
+def tidy_jumps(code):
+    """
+    Drops Gotos to the very next instruction and then labels no jump
+    targets. Returns (new code, number of instructions dropped).
+    """
+    kept = [instr for position, instr in enumerate(code)
+            if not (isinstance(instr, Goto) and position + 1 < len(code)
+                    and isinstance(code[position + 1], Label) and code[position + 1].name == instr.label)]
+    targets = {instr.label for instr in kept if isinstance(instr, (Goto, IfZ))}
+    kept = [instr for instr in kept if not isinstance(instr, Label) or instr.name in targets]
+    return kept, len(code) - len(kept)
+
+
+def add_edge(source, target):
+    if target not in source.succs:
+        source.succs.append(target)
+        target.preds.append(source)
+
+
+def format_cfg(cfg, annotate=None):
+    """
+    Text listing of the blocks with their edges. annotate(block), if given,
+    returns an extra line for each block (e.g. its live-out set).
+    """
+    lines = []
+    for block in cfg.blocks:
+        succs = ", ".join(repr(succ) for succ in block.succs) or "exit"
+        preds = ", ".join(repr(pred) for pred in block.preds) or "-"
+        lines.append(f"{block!r}:  preds {preds}  succs {succs}")
+        if annotate is not None:
+            lines.append(f"    ; {annotate(block)}")
+        for instr in block.instrs:
+            lines.append(f"    {instr}")
+    return "\n".join(lines)
@@ -0,0 +1,174 @@
+"""
+Equivalence check for the peephole rules in peephole.py.
+
+Every rule is applied on its own to sample code it should fire on; the
+code before and after is then run by a small MIPS interpreter from many
+random register and memory states, and must end in the same state: the
+same memory, the same branch taken and the same registers. The scratch
+registers are not compared: wherever a sample ends (the comment starting
+the next TAC instruction, or a branch to a TAC label) they are dead.
+
+Usage: python check_peephole.py [trials]
+"""
+import random
+import sys
+
+from mips_backend import MipsInstr
+from peephole import RULES, SCRATCH, address_base, optimize
+from tac import wrap32
+
+REGISTERS = ("$t0", "$t1", "$t2", "$s0", "$v0", "$v1", "$a2", "$a3", "$fp", "$sp")
+
+
+def code(*lines):
+    """Sample code from assembly-like lines: "op a, b", "L:" or "# text"."""
+    instrs = []
+    for line in lines:
+        if line.startswith("#"):
+            instrs.append(MipsInstr("comment", (line[1:].strip(),)))
+        elif line.endswith(":"):
+            instrs.append(MipsInstr("label", (line[:-1],)))
+        else:
+            op, _, rest = line.partition(" ")
+            instrs.append(MipsInstr(op, [arg.strip() for arg in rest.split(",")] if rest else ()))
+    return instrs
+
+
+# rule name -> [sample code]; a trailing "# next" comment ends the TAC instruction
+SAMPLES = {
+    "store_load": [
+        code("addu $a2, $t0, $t1", "sw $a2, -12($fp)", "# x", "lw $a2, -12($fp)", "sw $a2, -16($fp)", "# next"),
+        code("sw $t0, -12($fp)", "# x", "lw $v1, -12($fp)", "addu $t1, $v1, $v1", "# next"),
+    ],
+    "store_store": [
+        code("sw $t0, 0($gp)", "# x", "sw $t1, 0($gp)", "# next"),
+    ],
+    "fold_move": [
+        code("li $a2, 7", "move $t0, $a2", "# next"),
+        code("lw $v1, -8($fp)", "move $s0, $v1", "# next"),
+        code("addu $a2, $t0, $t1", "move $t0, $a2", "# next"),
+    ],
+    "copy_propagate": [
+        code("move $a2, $v0", "sw $a2, -20($fp)", "# next"),
+        code("move $v1, $t0", "addu $t1, $v1, $t2", "# next"),
+        code("move $v1, $t0", "beqz $v1, L9", "# next"),
+    ],
+    "self_move": [
+        code("move $t0, $t0", "addu $t1, $t0, $t0", "# next"),
+    ],
+    "branch_to_next": [
+        code("b L1", "# x", "L1:", "li $t0, 1", "# next"),
+        code("beqz $t0, L1", "L0:", "L1:", "li $t1, 2", "# next"),
+    ],
+    "branch_chain": [
+        code("beqz $t0, L1", "li $t1, 1", "L1:", "b L2", "L3:", "li $t1, 3", "L2:", "li $t2, 5", "# next"),
+        code("b L1", "li $t0, 9", "L1:", "# x", "b L2", "li $t1, 4", "L2:", "# next"),
+    ],
+    "unreachable": [
+        code("b L5", "li $t0, 1", "sw $t0, 0($gp)", "L4:", "li $t1, 2", "# next"),
+        code("jr $ra", "# EndFunc", "move $sp, $fp", "lw $ra, -4($fp)", "jr $ra"),
+    ],
+}
+
+_ARITHMETIC = {
+    "addu": lambda a, b: a + b, "subu": lambda a, b: a - b, "mul": lambda a, b: a * b,
+    "and": lambda a, b: a & b, "or": lambda a, b: a | b, "xor": lambda a, b: a ^ b,
+    "slt": lambda a, b: int(a < b), "sle": lambda a, b: int(a <= b), "sgt": lambda a, b: int(a > b),
+    "sge": lambda a, b: int(a >= b), "seq": lambda a, b: int(a == b), "sne": lambda a, b: int(a != b),
+    "sll": lambda a, b: a << b, "sra": lambda a, b: a >> b,
+}
+_BRANCHES = {
+    "beqz": lambda a: a == 0, "bnez": lambda a: a != 0, "bltz": lambda a: a < 0, "bgez": lambda a: a >= 0,
+}
+
+
+def run(instrs, registers, memory):
+    """
+    Runs instrs from the top. Returns ("fall", None) at the end or
+    ("jump", target) when control leaves the sample; registers and memory
+    are updated in place.
+    """
+    labels = {instr.args[0]: index for index, instr in enumerate(instrs) if instr.op == "label"}
+
+    def value(arg):
+        if arg == "$zero":
+            return 0
+        return registers[arg] if arg.startswith("$") else int(arg)
+
+    def address(arg):
+        offset = int(arg[:arg.index("(")])
+        return registers[address_base(arg)] + offset
+
+    def branch(target):
+        return target in labels, labels.get(target)
+
+    pc = 0
+    for _ in range(1000):
+        if pc >= len(instrs):
+            return "fall", None
+        instr = instrs[pc]
+        pc += 1
+        op, args = instr.op, instr.args
+        if op in ("label", "comment", "directive"):
+            continue
+        if op == "li":
+            registers[args[0]] = wrap32(int(args[1]))
+        elif op == "move":
+            registers[args[0]] = value(args[1])
+        elif op == "lw":
+            registers[args[0]] = memory.setdefault(address(args[1]), random.randint(-99, 99))
+        elif op == "sw":
+            memory[address(args[1])] = value(args[0])
+        elif op in _ARITHMETIC:
+            registers[args[0]] = wrap32(_ARITHMETIC[op](value(args[1]), value(args[2])))
+        elif op in ("b", "j") or (op in _BRANCHES and _BRANCHES[op](value(args[0]))):
+            inside, target = branch(args[-1])
+            if not inside:
+                return "jump", args[-1]
+            pc = target
+        elif op in _BRANCHES:
+            continue
+        elif op == "jr":
+            return "jump", args[0]
+        else:
+            raise ValueError(f"check_peephole cannot run {op}")
+    raise RuntimeError("sample did not terminate")
+
+
+def equivalent(before, after, trials):
+    for _ in range(trials):
+        seed = random.getrandbits(32)
+        outcomes = []
+        for instrs in (before, after):
+            random.seed(seed)
+            registers = {register: random.randint(-50, 50) for register in REGISTERS}
+            registers["$fp"], registers["$sp"], registers["$gp"], registers["$ra"] = 4000, 3000, 1000, 7
+            memory = {}
+            outcomes.append((run(instrs, registers, memory), registers, memory))
+        (result, registers, memory), (other_result, other_registers, other_memory) = outcomes
+        if result != other_result or memory != other_memory:
+            return False
+        if any(registers[name] != other_registers[name] for name in registers if name not in SCRATCH):
+            return False
+    return True
+
+
+def main():
+    trials = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    failures = 0
+    for name, rule in RULES:
+        for sample in SAMPLES.get(name, ()):
+            fired = {}
+            optimized = optimize(sample, fired, rules=((name, rule),))
+            ok = fired.get(name, 0) > 0 and equivalent(sample, optimized, trials)
+            failures += not ok
+            status = "ok  " if ok else "FAIL"
+            print(f"{status} {name:15} {len(sample)} -> {len(optimized)} instructions, fired {fired.get(name, 0)}")
+    missing = [name for name, _ in RULES if name not in SAMPLES]
+    for name in missing:
+        print(f"FAIL {name:15} has no sample")
+    sys.exit(1 if failures or missing else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Runs the sample programs under SPIM with every backend and -O level.
+
+Every samples/*.decaf whose .out holds SPIM output (it starts with the
+"Loaded: ..." line) is compiled with the direct backend and with the tac
+backend at each optimizer.OPT_LEVELS level, linked with the runtime and
+run; what the program prints must match the .out. Programs the direct
+backend cannot compile are skipped for it.
+
+Usage: python check_programs.py [--spim PATH] [file.decaf ...]
+"""
+import argparse
+import glob
+import os
+import subprocess
+import sys
+import tempfile
+
+from compiler import compile, link_runtime
+from helper_functions import read_source_file
+from optimizer import OPT_LEVELS, passes_for_level
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+EXCEPTION_FILE = os.path.join(HERE, "spim", "exceptions.s")
+
+
+def expected_output(decaf_path):
+    """What the program should print, or None if its .out is not a SPIM run."""
+    out_path = decaf_path[:-len(".decaf")] + ".out"
+    if not os.path.exists(out_path):
+        return None
+    with open(out_path, "r") as out_file:
+        text = out_file.read()
+    if not text.startswith("Loaded:"):
+        return None
+    return text.partition("\n")[2]
+
+
+def run_spim(spim, asm_text):
+    with tempfile.NamedTemporaryFile("w", suffix=".s", delete=False) as asm_file:
+        asm_file.write(asm_text)
+    try:
+        result = subprocess.run([spim, "-exception_file", EXCEPTION_FILE, "-file", asm_file.name],
+                                capture_output=True, text=True, timeout=30)
+    finally:
+        os.unlink(asm_file.name)
+    # SPIM's first line is its own "Loaded: ..." banner
+    return result.stdout.partition("\n")[2]
+
+
+def configurations():
+    yield "direct", "direct", ()
+    for level in sorted(OPT_LEVELS):
+        yield f"tac -O {level}", "tac", passes_for_level(level)
+
+
+def check(path, spim):
+    """Returns the number of failing configurations for one program."""
+    expected = expected_output(path)
+    source = read_source_file(path)
+    failures = 0
+    for name, backend, passes in configurations():
+        try:
+            result = compile(source, backend=backend, optimize=passes)
+        except Exception as error:     # the direct backend does not cover every construct
+            if backend != "direct":
+                raise
+            print(f"skip {os.path.basename(path):24} {name:10} ({type(error).__name__})")
+            continue
+        if not result.ok:
+            status = "skip" if backend == "direct" else "FAIL"
+            failures += status == "FAIL"
+            print(f"{status} {os.path.basename(path):24} {name:10} ({result.output.strip().splitlines()[-1]})")
+            continue
+        actual = run_spim(spim, link_runtime(result.output))
+        ok = actual == expected
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {os.path.basename(path):24} {name}")
+        if not ok:
+            print(f"     expected {expected!r}\n     got      {actual!r}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the sample programs under SPIM at every -O level.")
+    parser.add_argument("--spim", default=os.environ.get("SPIM", "spim"), help="SPIM executable (default: $SPIM or spim)")
+    parser.add_argument("files", nargs="*", help="Programs to run (default: samples/*.decaf with a SPIM .out)")
+    args = parser.parse_args()
+
+    paths = args.files or sorted(glob.glob(os.path.join(HERE, "samples", "*.decaf")))
+    paths = [path for path in paths if expected_output(path) is not None]
+    failures = sum(check(path, args.spim) for path in paths)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
 # code_generation.py
-from helper_functions import calculate_frame_size, allocate_temp, get_print_function_for_type, get_var_type, format_relop_comment, format_offset, allocate_label, emit_store
+from helper_functions import calculate_frame_size, allocate_temp, get_print_function_for_type, get_annotated_type, format_relop_comment, format_offset, allocate_label, emit_store, variable_location
+from ast_visitor import make_dispatcher
 
-def generate_code(ast_root):
+def generate_code(ast_root, counters=None):
+    """
+    Emits MIPS for the whole program. If counters is a dict, the number of
+    temps and labels allocated is stored in it.
+    """
     lines = []
 
     # Step 0: Check for main
@@ -9,16 +14,7 @@ def generate_code(ast_root):
                for node in ast_root["Program"]):
         return "*** Error.\n*** Linker: function 'main' not defined"
 
-    # Step 1: Scan and remember global variables
-    global_locations = {}
-    global_offset = 0
-    for node in ast_root["Program"]:
-        if "VarDecl" in node:
-            var_decl = node["VarDecl"]
-            var_name = var_decl["identifier"]["Identifier"]["name"]
-            global_locations[var_name] = global_offset
-            global_offset += 4
-
+    # Step 1: Globals, formals and locals already have slots (binding.py)
 
     # Step 2: Emit preamble for text section (NO .data)
     lines.append("\t# standard Decaf preamble ")
@@ -32,9 +28,12 @@ def generate_code(ast_root):
     for node in ast_root["Program"]:
         if "FnDecl" in node:
             fn_decl = node["FnDecl"]
-            fn_lines, temp_counter, label_counter = emit_function(fn_decl, temp_counter, label_counter, global_locations)
+            fn_lines, temp_counter, label_counter = emit_function(fn_decl, temp_counter, label_counter)
             lines.extend(fn_lines)
 
+    if counters is not None:
+        counters["temps"] = temp_counter
+        counters["labels"] = label_counter
     return "\n".join(lines) + "\n"
 
 def emit_prologue(fn_name, frame_size):
@@ -96,41 +95,22 @@ def emit_push_param(lines, offset, var_name=None, is_global=False):
     
     lines.append("\t  sw $t0, 4($sp)\t# copy param value to stack")
 
-def emit_function(fn_decl, temp_counter, label_counter, global_locations):
+def emit_function(fn_decl, temp_counter, label_counter):
     fn_name = fn_decl["identifier"]["Identifier"]["name"]
 
     # Create context for this function
     context = {
-        "var_locations": {},
-        "var_types": {},
         "temp_locations": {},
         "constant_temps": set(),
         "string_table": {},
         "string_counter": 1,
         "temp_counter": temp_counter,
-        "offset": -8,  # locals grow downward
+        # Temps grow downward below the local slots binding.py assigned
+        "offset": -8 - 4 * fn_decl["local_slots"],
         "lines": [],
         "label_counter": label_counter,
-        "globals": set(global_locations.keys()),  # ✅ all global names
-        "global_locations": global_locations,     # ✅ all global offsets
     }
 
-    # --- Handle function parameters ---
-    formal_offset = 4
-    for formal in fn_decl.get("formals", []):
-        if "VarDecl" in formal:
-            formal_name = formal["VarDecl"]["identifier"]["Identifier"]["name"]
-            formal_type = formal["VarDecl"]["type"]["Type"]
-
-            context["var_locations"][formal_name] = formal_offset
-            context["var_types"][formal_name] = formal_type
-
-            # ✅ Remove formal name from globals if present
-            context["globals"].discard(formal_name)
-
-            formal_offset += 4  # next parameter at +4 bytes higher
-
-
     # --- Walk and emit all body statements ---
     body = fn_decl.get("body", {})
     if "StmtBlock" in body:
@@ -149,58 +129,22 @@ def emit_function(fn_decl, temp_counter, label_counter, global_locations):
     return lines, context["temp_counter"], context["label_counter"]
 
 def emit_statement(stmt, context):
-  
-    if "VarDecl" in stmt:
-        emit_vardecl(stmt["VarDecl"], context)
-
-    elif "AssignExpr" in stmt:
-        emit_assign_expression(stmt["AssignExpr"], context)
-
-    elif "PrintStmt" in stmt:
-        emit_print_statement(stmt["PrintStmt"], context)
-
-    elif "ReturnStmt" in stmt:
-        emit_return_statement(stmt["ReturnStmt"], context)
-
-    elif "IfStmt" in stmt:
-        emit_if_statement(stmt["IfStmt"], context)
-
-    elif "ForStmt" in stmt:
-        emit_for_statement(stmt["ForStmt"], context)
-
-    elif "WhileStmt" in stmt:
-        emit_while_statement(stmt["WhileStmt"], context)
-       
-    elif "BreakStmt" in stmt:
-        emit_break_statement(context)
-        
-    elif "ContinueStmt" in stmt:
-        emit_continue_statement(context)
-        
-    elif "StmtBlock" in stmt:
-        for sub_stmt in stmt["StmtBlock"]:
-            emit_statement(sub_stmt, context)
-    
-    elif "Call" in stmt:
-        #print(stmt["Call"])
-        emit_function_call(stmt["Call"], context=context)
+    """
+    Emits code for one statement by dispatching on its kind.
+    The handler table is STATEMENT_EMITTERS at the bottom of this module;
+    unknown kinds are reported by ast_visitor.report_unknown_node.
+    """
+    _dispatch_statement(stmt, context)
 
-    else:
-        print(f"WARNING: Unhandled statement: {stmt}")
+def emit_statement_block(stmt_list, context):
+    for sub_stmt in stmt_list:
+        emit_statement(sub_stmt, context)
 
 def emit_vardecl(vardecl_node, context):
-    lines = context["lines"]
-    var_name = vardecl_node["identifier"]
-    var_type = vardecl_node["type"]
-    #print(f"DEBUG: Declaring variable '{var_name}' of type '{var_type}' inside {context.get('current_function', '???')}")
-
-    # Assign space in frame
-    offset = context["offset"]
-    context["offset"] -= 4
-    context["var_locations"][var_name] = offset
-
-    # 🔥 Save type information
-    context["var_types"][var_name] = var_type
+    """
+    Local declarations emit no code: binding.py already gave each one a
+    frame slot, and the frame is sized for all of them up front.
+    """
 
 def emit_assign_expression(assign_node, context):
     """
@@ -208,7 +152,8 @@ def emit_assign_expression(assign_node, context):
     Handles IntConstant, StringConstant, Call, ArithmeticExpr.
     """
     lines = context["lines"]
-    target = assign_node["target"]["FieldAccess"]["identifier"]
+    target_access = assign_node["target"]["FieldAccess"]
+    target = target_access["identifier"]
     value = assign_node["value"]
 
     if "IntConstant" in value:
@@ -222,7 +167,7 @@ def emit_assign_expression(assign_node, context):
 
         lines.append(f"\t# {target} = {tmp_name}")
         lines.append(f"\t  lw $t2, {tmp_offset}($fp)\t# fill {tmp_name} to $t2 from $fp{format_offset(tmp_offset)}")
-        emit_store(target, "$t2", context, lines)
+        emit_store(target_access, "$t2", lines)
 
     elif "StringConstant" in value:
         emit_assign_string_constant(assign_node, context)
@@ -287,22 +232,21 @@ def emit_assign_expression(assign_node, context):
 
         lines.append(f"\t# {target} = {tmp_result_name}")
         lines.append(f"\t  lw $t2, {tmp_result_offset}($fp)\t# fill {tmp_result_name} to $t2 from $fp{format_offset(tmp_result_offset)}")
-        emit_store(target, "$t2", context, lines)
+        emit_store(target_access, "$t2", lines)
 
     elif "FieldAccess" in value:
         source_var = value["FieldAccess"]["identifier"]
+        source_offset, source_is_global = variable_location(value["FieldAccess"])
 
         lines.append(f"\t# {target} = {source_var}")
-        if source_var in context.get("globals", set()):
-            gp_offset = context["global_locations"].get(source_var, 0)
-            comment_offset = f"+{gp_offset}" if gp_offset >= 0 else f"{gp_offset}"
-            lines.append(f"\t  lw $t2, {gp_offset}($gp)\t# fill {source_var} to $t2 from $gp{comment_offset}")
+        if source_is_global:
+            comment_offset = f"+{source_offset}" if source_offset >= 0 else f"{source_offset}"
+            lines.append(f"\t  lw $t2, {source_offset}($gp)\t# fill {source_var} to $t2 from $gp{comment_offset}")
         else:
-            source_offset = context["var_locations"].get(source_var, -4)
             comment_offset = f"+{source_offset}" if source_offset >= 0 else f"{source_offset}"
             lines.append(f"\t  lw $t2, {source_offset}($fp)\t# fill {source_var} to $t2 from $fp{comment_offset}")
 
-        emit_store(target, "$t2", context, lines)
+        emit_store(target_access, "$t2", lines)
 
 
     else:
@@ -311,7 +255,8 @@ def emit_assign_expression(assign_node, context):
 def emit_assign_string_constant(assign_expr, context):
     lines = context["lines"]
     string_val = assign_expr["value"]["StringConstant"]["value"].strip('"')
-    dest_var = assign_expr["target"]["FieldAccess"]["identifier"]
+    dest_access = assign_expr["target"]["FieldAccess"]
+    dest_var = dest_access["identifier"]
 
     # --- Step 1: Get or create a label in the string table
     string_table = context["string_table"]
@@ -324,7 +269,6 @@ def emit_assign_string_constant(assign_expr, context):
 
     # --- Step 2: Allocate a temp (_tmpN)
     tmp_name, tmp_offset = allocate_temp(context)
-    dest_offset = context["var_locations"][dest_var]
 
     # --- Step 3: Emit MIPS
     lines.append(f"\t# {tmp_name} = \"{string_val}\"")
@@ -336,12 +280,13 @@ def emit_assign_string_constant(assign_expr, context):
 
     lines.append(f"\t# {dest_var} = {tmp_name}")
     lines.append(f"\t  lw $t2, {tmp_offset}($fp)\t# fill {tmp_name} to $t2 from $fp{tmp_offset}")
-    lines.append(f"\t  sw $t2, {dest_offset}($fp)\t# spill {dest_var} from $t2 to $fp{dest_offset}")
+    emit_store(dest_access, "$t2", lines)
 
 def emit_assign_call(assign_expr, context):
     lines = context["lines"]
     call = assign_expr["value"]["Call"]
-    dest_var = assign_expr["target"]["FieldAccess"]["identifier"]
+    dest_access = assign_expr["target"]["FieldAccess"]
+    dest_var = dest_access["identifier"]
 
     actuals = call.get("actuals", [])
     tmp_args = []
@@ -380,10 +325,9 @@ def emit_assign_call(assign_expr, context):
         lines.append(f"\t  add $sp, $sp, {len(actuals) * 4}\t# pop params off stack")
 
     # Step 5: Assign to target variable
-    dest_offset = context["var_locations"][dest_var]
     lines.append(f"\t# {dest_var} = {tmp_name}")
     lines.append(f"\t  lw $t2, {tmp_offset}($fp)\t# fill {tmp_name} to $t2 from $fp{tmp_offset}")
-    lines.append(f"\t  sw $t2, {dest_offset}($fp)\t# spill {dest_var} from $t2 to $fp{dest_offset}")
+    emit_store(dest_access, "$t2", lines)
 
 def emit_function_call(call_node, tmp_name=None, tmp_offset=None, context=None, allocate_inner_constants=True):
     lines = context["lines"]
@@ -439,13 +383,8 @@ def emit_argument(arg, context, tmp_name=None, tmp_offset=None, allocate_inner_c
 
     if "FieldAccess" in arg:
         var = arg["FieldAccess"]["identifier"]
-
-        if var in context.get("globals", set()):
-            var_offset = context["global_locations"].get(var, 0)
-            return var, var_offset, True  # ✅ Global
-        else:
-            var_offset = context["var_locations"].get(var, -4)
-            return var, var_offset, False  # ✅ Local
+        var_offset, is_global = variable_location(arg["FieldAccess"])
+        return var, var_offset, is_global
 
     elif "IntConstant" in arg:
         value = int(arg["IntConstant"]["value"])
@@ -476,7 +415,8 @@ def emit_argument(arg, context, tmp_name=None, tmp_offset=None, allocate_inner_c
         right_val = int(arith["right"]["IntConstant"]["value"])
         op = arith["operator"]
 
-        left_offset = context["var_locations"].get(left, -4)
+        left_offset, left_is_global = variable_location(arith["left"]["FieldAccess"])
+        left_base = "$gp" if left_is_global else "$fp"
 
         tmp_right_name, tmp_right_offset = allocate_temp(context)
         context["constant_temps"].add(tmp_right_name)
@@ -488,7 +428,7 @@ def emit_argument(arg, context, tmp_name=None, tmp_offset=None, allocate_inner_c
         result_tmp_name, result_tmp_offset = allocate_temp(context)
 
         lines.append(f"\t# {result_tmp_name} = {left} {op} {tmp_right_name}")
-        lines.append(f"\t  lw $t0, {left_offset}($fp)\t# fill {left} to $t0 from $fp{format_offset(left_offset)}")
+        lines.append(f"\t  lw $t0, {left_offset}({left_base})\t# fill {left} to $t0 from {left_base}{format_offset(left_offset)}")
         lines.append(f"\t  lw $t1, {tmp_right_offset}($fp)\t# fill {tmp_right_name} to $t1 from $fp{format_offset(tmp_right_offset)}")
 
         if op == "+":
@@ -518,33 +458,31 @@ def emit_argument(arg, context, tmp_name=None, tmp_offset=None, allocate_inner_c
         tmp_offset = context["temp_locations"][tmp_logic]
         return tmp_logic, tmp_offset, False  # Always frame pointer
 
+    elif "EqualityExpr" in arg:
+        tmp_eq = emit_equality_expression(arg, context)
+        tmp_offset = context["temp_locations"][tmp_eq]
+        return tmp_eq, tmp_offset, False  # Always frame pointer
+
     else:
         print(f"WARNING: Complex function call argument not handled: {arg}")
         return None, None, False
 
 def emit_print_statement(print_stmt, context):
+    """
+    Emits one _Print* call per argument. The runtime routine is picked from
+    the type the semantic analyzer recorded on the argument.
+    """
     lines = context["lines"]
 
-    type_to_print_fn = {
-        "int": "_PrintInt",
-        "string": "_PrintString",
-        "bool": "_PrintBool",
-        "double": "_PrintDouble",
-    }
-
     for arg in print_stmt["args"]:
         if "FieldAccess" in arg:
             var_name = arg["FieldAccess"]["identifier"]
-            offset = context["var_locations"].get(var_name)
+            offset, is_global = variable_location(arg["FieldAccess"])
 
-            if offset is None:
-                raise KeyError(f"Variable '{var_name}' not found in var_locations")
-
-            var_type = get_var_type(arg["FieldAccess"], context)
-            print_fn = type_to_print_fn.get(var_type, "_PrintInt")
+            print_fn = get_print_function_for_type(get_annotated_type(arg))
 
             #lines.append(f"\t# PushParam {var_name}")
-            emit_push_param(lines, offset, var_name)
+            emit_push_param(lines, offset, var_name, is_global)
 
             lines.append(f"\t# LCall {print_fn}")
             lines.append(f"\t  jal {print_fn}        # jump to function")
@@ -603,19 +541,32 @@ def emit_print_statement(print_stmt, context):
                 tmp_name, tmp_offset = allocate_temp(context)
 
             tmp_name, tmp_offset = emit_function_call(call_node, tmp_name, tmp_offset, context)
+            print_fn = get_print_function_for_type(get_annotated_type(arg))
 
             #lines.append(f"\t# PushParam {tmp_name}")
             emit_push_param(lines, tmp_offset, tmp_name)
 
-            lines.append(f"\t# LCall _PrintInt")
-            lines.append(f"\t  jal _PrintInt         # jump to function")
+            lines.append(f"\t# LCall {print_fn}")
+            lines.append(f"\t  jal {print_fn}         # jump to function")
 
             lines.append(f"\t# PopParams 4")
             lines.append(f"\t  add $sp, $sp, 4\t# pop params off stack")
 
-
         else:
-            print(f"WARNING: Complex PrintStmt argument not handled: {arg}")
+            # Any other expression: evaluate it into a temp, then print by type
+            tmp_name, tmp_offset, is_global = emit_argument(arg, context)
+            if tmp_name is None:
+                print(f"WARNING: Complex PrintStmt argument not handled: {arg}")
+                continue
+            print_fn = get_print_function_for_type(get_annotated_type(arg))
+
+            emit_push_param(lines, tmp_offset, tmp_name, is_global)
+
+            lines.append(f"\t# LCall {print_fn}")
+            lines.append(f"\t  jal {print_fn}        # jump to function")
+
+            lines.append(f"\t# PopParams 4")
+            lines.append(f"\t  add $sp, $sp, 4\t# pop params off stack")
 
 def emit_relop_expression(expr, context):
     """
@@ -635,12 +586,7 @@ def emit_relop_expression(expr, context):
     # --- Load left operand ---
     if "FieldAccess" in left:
         left_var = left["FieldAccess"]["identifier"]
-        if left_var in context.get("globals", set()):
-            left_offset = context["global_locations"].get(left_var, 0)
-            left_is_global = True
-        else:
-            left_offset = context["var_locations"].get(left_var, 4)
-            left_is_global = False
+        left_offset, left_is_global = variable_location(left["FieldAccess"])
 
     elif "IntConstant" in left or "BoolConstant" in left:
         val = int(left.get("IntConstant", left.get("BoolConstant"))["value"])
@@ -663,12 +609,7 @@ def emit_relop_expression(expr, context):
     # --- Load right operand ---
     if "FieldAccess" in right:
         right_var = right["FieldAccess"]["identifier"]
-        if right_var in context.get("globals", set()):
-            right_offset = context["global_locations"].get(right_var, 0)
-            right_is_global = True
-        else:
-            right_offset = context["var_locations"].get(right_var, 8)
-            right_is_global = False
+        right_offset, right_is_global = variable_location(right["FieldAccess"])
 
     elif "IntConstant" in right or "BoolConstant" in right:
         val = int(right.get("IntConstant", right.get("BoolConstant"))["value"])
@@ -838,12 +779,7 @@ def emit_equality_expression(expr, context):
     # --- Load left operand ---
     if "FieldAccess" in left:
         left_var = left["FieldAccess"]["identifier"]
-        if left_var in context.get("globals", set()):
-            left_offset = context["global_locations"].get(left_var, 0)
-            left_is_global = True
-        else:
-            left_offset = context["var_locations"].get(left_var, -4)
-            left_is_global = False
+        left_offset, left_is_global = variable_location(left["FieldAccess"])
     elif "IntConstant" in left or "BoolConstant" in left:
         val = int(left.get("IntConstant", left.get("BoolConstant"))["value"])
         tmp_left, left_offset = allocate_temp(context)
@@ -860,12 +796,7 @@ def emit_equality_expression(expr, context):
     # --- Load right operand ---
     if "FieldAccess" in right:
         right_var = right["FieldAccess"]["identifier"]
-        if right_var in context.get("globals", set()):
-            right_offset = context["global_locations"].get(right_var, 0)
-            right_is_global = True
-        else:
-            right_offset = context["var_locations"].get(right_var, -4)
-            right_is_global = False
+        right_offset, right_is_global = variable_location(right["FieldAccess"])
     elif "IntConstant" in right or "BoolConstant" in right:
         val = int(right.get("IntConstant", right.get("BoolConstant"))["value"])
         tmp_right, right_offset = allocate_temp(context)
@@ -894,6 +825,11 @@ def emit_equality_expression(expr, context):
     else:
         lines.append(f"\t  lw $t1, {right_offset}($fp)\t# fill {right_var} to $t1 from $fp{format_offset(right_offset)}")
 
+    # --- Strings compare by content through the runtime ---
+    if get_annotated_type(left) == "string":
+        emit_string_equality(tmp_name, tmp_offset, left_var, right_var, operator, context)
+        return tmp_name
+
     # --- Emit equality instruction ---
     if operator == "==":
         lines.append(f"\t  seq $t2, $t0, $t1")
@@ -908,6 +844,32 @@ def emit_equality_expression(expr, context):
 
     return tmp_name
 
+def emit_string_equality(tmp_name, tmp_offset, left_var, right_var, operator, context):
+    """
+    Finishes a string == / != whose operands are already in $t0 and $t1:
+    calls _StringEqual and spills the (possibly negated) result.
+    """
+    lines = context["lines"]
+
+    lines.append(f"\t# PushParam {right_var}")
+    lines.append("\t  subu $sp, $sp, 4\t# decrement sp to make space for param")
+    lines.append("\t  sw $t1, 4($sp)\t# copy param value to stack")
+    lines.append(f"\t# PushParam {left_var}")
+    lines.append("\t  subu $sp, $sp, 4\t# decrement sp to make space for param")
+    lines.append("\t  sw $t0, 4($sp)\t# copy param value to stack")
+    lines.append("\t# LCall _StringEqual")
+    lines.append("\t  jal _StringEqual\t    # jump to function")
+    lines.append("\t# PopParams 8")
+    lines.append("\t  add $sp, $sp, 8\t# pop params off stack")
+
+    if operator == "==":
+        lines.append("\t  move $t2, $v0\t    # copy function return value from $v0")
+    else:
+        lines.append("\t  seq $t2, $v0, $zero\t# negate _StringEqual result for !=")
+
+    lines.append(f"\t  sw $t2, {tmp_offset}($fp)\t# spill {tmp_name} from $t2 to $fp{format_offset(tmp_offset)}")
+    context["temp_locations"][tmp_name] = tmp_offset
+
 def emit_logical_operand(operand, context):
     """
     Helper to emit left or right operand inside logical expressions.
@@ -927,12 +889,8 @@ def emit_logical_operand(operand, context):
 
     elif "FieldAccess" in operand:
         var = operand["FieldAccess"]["identifier"]
-        if var in context.get("globals", set()):
-            offset = context["global_locations"].get(var, 0)
-            return var, offset, True
-        else:
-            offset = context["var_locations"].get(var, -4)
-            return var, offset, False
+        offset, is_global = variable_location(operand["FieldAccess"])
+        return var, offset, is_global
 
     elif "BoolConstant" in operand:
         val = 1 if operand["BoolConstant"]["value"] == "true" else 0
@@ -975,17 +933,18 @@ def emit_load_operand(operand, dest_reg, context, lines=None):
 
     if "FieldAccess" in operand:
         var_name = operand["FieldAccess"]["identifier"]
+        var_offset, is_global = variable_location(operand["FieldAccess"])
 
-        if var_name in context.get("globals", set()):
+        if is_global:
             # Global variable: load from $gp + offset
-            gp_offset = context["global_locations"].get(var_name, 0)
+            gp_offset = var_offset
             if lines is not None and dest_reg is not None:
                 comment_offset = f"+{gp_offset}" if gp_offset >= 0 else f"{gp_offset}"
                 lines.append(f"\t  lw {dest_reg}, {gp_offset}($gp)\t# fill {var_name} to {dest_reg} from $gp{comment_offset}")
             return var_name, gp_offset
         else:
             # Local variable: load from $fp + offset
-            offset = context["var_locations"].get(var_name, -4)
+            offset = var_offset
             if lines is not None and dest_reg is not None:
                 comment_offset = f"+{offset}" if offset >= 0 else f"{offset}"
                 lines.append(f"\t  lw {dest_reg}, {offset}($fp)\t# fill {var_name} to {dest_reg} from $fp{comment_offset}")
@@ -1020,6 +979,7 @@ def emit_if_statement(if_node, context):
     else_stmt = if_node.get("else")
 
     # --- 1. Evaluate the condition ---
+    tmp_base = "$fp"
     if "RelationalExpr" in test_expr:
         tmp_cond = emit_relop_expression(test_expr, context)
         tmp_offset = context["temp_locations"][tmp_cond]
@@ -1030,9 +990,9 @@ def emit_if_statement(if_node, context):
         tmp_cond = emit_logical_expression(test_expr, context)
         tmp_offset = context["temp_locations"][tmp_cond]
     elif "FieldAccess" in test_expr:
-        var = test_expr["FieldAccess"]["identifier"]
-        tmp_cond = var
-        tmp_offset = context["var_locations"].get(var, -4)
+        tmp_cond = test_expr["FieldAccess"]["identifier"]
+        tmp_offset, is_global = variable_location(test_expr["FieldAccess"])
+        tmp_base = "$gp" if is_global else "$fp"
 
     else:
         raise ValueError(f"Unsupported if test expression: {test_expr}")
@@ -1042,7 +1002,7 @@ def emit_if_statement(if_node, context):
 
     # --- 3. Conditional branch ---
     lines.append(f"\t# IfZ {tmp_cond} Goto {label_true}")
-    lines.append(f"\t  lw $t0, {tmp_offset}($fp)\t# fill {tmp_cond} to $t0 from $fp{format_offset(tmp_offset)}")
+    lines.append(f"\t  lw $t0, {tmp_offset}({tmp_base})\t# fill {tmp_cond} to $t0 from {tmp_base}{format_offset(tmp_offset)}")
     lines.append(f"\t  beqz $t0, {label_true}\t# branch if {tmp_cond} is zero")
 
     # --- 4. THEN block ---
@@ -1080,6 +1040,7 @@ def emit_for_statement(for_node, context):
 
     # --- 4. Emit test (conditional jump out)
     if test:
+        tmp_base = "$fp"
         if "RelationalExpr" in test:
             tmp_cond = emit_relop_expression(test, context)
             tmp_offset = context["temp_locations"][tmp_cond]
@@ -1090,14 +1051,14 @@ def emit_for_statement(for_node, context):
             tmp_cond = emit_logical_expression(test, context)
             tmp_offset = context["temp_locations"][tmp_cond]
         elif "FieldAccess" in test:
-            var = test["FieldAccess"]["identifier"]
-            tmp_cond = var
-            tmp_offset = context["var_locations"].get(var, -4)
+            tmp_cond = test["FieldAccess"]["identifier"]
+            tmp_offset, is_global = variable_location(test["FieldAccess"])
+            tmp_base = "$gp" if is_global else "$fp"
         else:
             raise ValueError(f"Unsupported for loop test expression: {test}")
 
         lines.append(f"\t# IfZ {tmp_cond} Goto {label_false}")
-        lines.append(f"\t  lw $t0, {tmp_offset}($fp)\t# fill {tmp_cond} to $t0 from $fp{format_offset(tmp_offset)}")
+        lines.append(f"\t  lw $t0, {tmp_offset}({tmp_base})\t# fill {tmp_cond} to $t0 from {tmp_base}{format_offset(tmp_offset)}")
         lines.append(f"\t  beqz $t0, {label_false}\t# branch if {tmp_cond} is zero")
 
     old_break_label = context.get("break_label")
@@ -1142,6 +1103,7 @@ def emit_while_statement(while_node, context):
 
     # --- 3. Emit test (conditional branch)
     if test:
+        tmp_base = "$fp"
         if "RelationalExpr" in test:
             tmp_cond = emit_relop_expression(test, context)
             tmp_offset = context["temp_locations"][tmp_cond]
@@ -1152,14 +1114,14 @@ def emit_while_statement(while_node, context):
             tmp_cond = emit_logical_expression(test, context)
             tmp_offset = context["temp_locations"][tmp_cond]
         elif "FieldAccess" in test:
-            var = test["FieldAccess"]["identifier"]
-            tmp_cond = var
-            tmp_offset = context["var_locations"].get(var, -4)
+            tmp_cond = test["FieldAccess"]["identifier"]
+            tmp_offset, is_global = variable_location(test["FieldAccess"])
+            tmp_base = "$gp" if is_global else "$fp"
         else:
             raise ValueError(f"Unsupported while test expression: {test}")
 
         lines.append(f"\t# IfZ {tmp_cond} Goto {label_false}")
-        lines.append(f"\t  lw $t0, {tmp_offset}($fp)\t# fill {tmp_cond} to $t0 from $fp{format_offset(tmp_offset)}")
+        lines.append(f"\t  lw $t0, {tmp_offset}({tmp_base})\t# fill {tmp_cond} to $t0 from {tmp_base}{format_offset(tmp_offset)}")
         lines.append(f"\t  beqz $t0, {label_false}\t# branch if {tmp_cond} is zero")
 
 
@@ -1257,19 +1219,17 @@ def emit_return_statement(return_stmt, context):
         lines.append(f"\t# {result_tmp} = {left_var} {op} {right_var}")
 
         # === Step 4: Load left operand ===
-        if left_var in context.get("globals", set()):
-            left_gp_offset = context["global_locations"].get(left_var, 0)
-            comment_offset = f"+{left_gp_offset}" if left_gp_offset >= 0 else f"{left_gp_offset}"
-            lines.append(f"\t  lw $t0, {left_gp_offset}($gp)\t# fill {left_var} to $t0 from $gp{comment_offset}")
+        if "FieldAccess" in left and left["FieldAccess"]["symbol"].is_global:
+            comment_offset = f"+{left_offset}" if left_offset >= 0 else f"{left_offset}"
+            lines.append(f"\t  lw $t0, {left_offset}($gp)\t# fill {left_var} to $t0 from $gp{comment_offset}")
         else:
             comment_offset = f"+{left_offset}" if left_offset >= 0 else f"{left_offset}"
             lines.append(f"\t  lw $t0, {left_offset}($fp)\t# fill {left_var} to $t0 from $fp{comment_offset}")
 
         # === Step 5: Load right operand ===
-        if right_var in context.get("globals", set()):
-            right_gp_offset = context["global_locations"].get(right_var, 0)
-            comment_offset = f"+{right_gp_offset}" if right_gp_offset >= 0 else f"{right_gp_offset}"
-            lines.append(f"\t  lw $t1, {right_gp_offset}($gp)\t# fill {right_var} to $t1 from $gp{comment_offset}")
+        if "FieldAccess" in right and right["FieldAccess"]["symbol"].is_global:
+            comment_offset = f"+{right_offset}" if right_offset >= 0 else f"{right_offset}"
+            lines.append(f"\t  lw $t1, {right_offset}($gp)\t# fill {right_var} to $t1 from $gp{comment_offset}")
         else:
             comment_offset = f"+{right_offset}" if right_offset >= 0 else f"{right_offset}"
             lines.append(f"\t  lw $t1, {right_offset}($fp)\t# fill {right_var} to $t1 from $fp{comment_offset}")
@@ -1297,3 +1257,18 @@ def emit_return_statement(return_stmt, context):
         lines.extend(emit_epilogue_lines(add_end_comment=False))
         return
 
+STATEMENT_EMITTERS = {
+    "VarDecl": emit_vardecl,
+    "AssignExpr": emit_assign_expression,
+    "PrintStmt": emit_print_statement,
+    "ReturnStmt": emit_return_statement,
+    "IfStmt": emit_if_statement,
+    "ForStmt": emit_for_statement,
+    "WhileStmt": emit_while_statement,
+    "BreakStmt": lambda node, context: emit_break_statement(context),
+    "ContinueStmt": lambda node, context: emit_continue_statement(context),
+    "StmtBlock": emit_statement_block,
+    "Call": lambda node, context: emit_function_call(node, context=context),
+}
+
+_dispatch_statement = make_dispatcher("code_generation", STATEMENT_EMITTERS)
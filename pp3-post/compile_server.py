@@ -0,0 +1,260 @@
+# compile_server.py
+"""
+Asyncio compile service backed by a process pool.
+
+Accepts any number of concurrent clients over TCP (localhost) or a Unix
+socket. The protocol is JSON lines; every request gets exactly one reply
+carrying the same "id", and replies on one connection may arrive out of
+order.
+
+    {"id": 1, "source": "...", "stop_after": "codegen", "link_runtime": false}
+        -> {"id": 1, "ok": true, "phase": "codegen", "output": "...", "latency_ms": 3.2}
+    {"id": 2, "op": "stats"}
+        -> {"id": 2, "queue_depth": 0, "in_pool": 0, "completed": 10, "timeouts": 0,
+            "latency_ms": {"p50": 2.1, "p90": 4.0, "p99": 9.8}}
+
+Compiles run in a bounded ProcessPoolExecutor. At most --max-pending
+requests are admitted at once; past that the server stops reading from
+the connection until a slot frees up, so clients feel backpressure
+instead of the queue growing without bound. Each request is given
+--timeout seconds; a timed-out compile is answered with an error, but
+its worker finishes in the background and the request holds its slot
+until then, so slow compiles cannot pile up in the pool.
+
+Usage:
+    python compile_server.py [--host 127.0.0.1] [--port 7878]
+    python compile_server.py --unix /tmp/decaf.sock
+    options: [--workers N] [--max-pending N] [--timeout SECONDS]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from compiler import compile, link_runtime, PHASES
+from decafd import remove_stale_socket
+
+# Longest request line accepted; asyncio's 64 KiB default is too small for
+# whole source files
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+
+
+def run_compile_job(source, stop_after, link):
+    """Runs in a pool worker; returns only the picklable parts of the result."""
+    result = compile(source, stop_after=stop_after)
+    output = result.output
+    if link and result.ok and result.phase == "codegen":
+        output = link_runtime(output)
+    return {"ok": result.ok, "phase": result.phase, "output": output, "errors": result.errors}
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return round(sorted_values[index], 3)
+
+
+def request_error(request):
+    """Why a compile request cannot be run, or None."""
+    if not isinstance(request.get("source"), str):
+        return "request has no 'source' string"
+    if request.get("stop_after", "codegen") not in PHASES:
+        return f"stop_after must be one of {', '.join(PHASES)}"
+    return None
+
+
+async def read_request_line(reader):
+    """
+    Returns the next line from reader, b"" at end of input, or None when the
+    line was longer than the reader's limit; such a line is read to its end
+    and discarded, so the connection stays usable.
+    """
+    too_long = False
+    while True:
+        try:
+            line = await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as error:
+            line = error.partial        # last line without a newline, or b"" at EOF
+        except asyncio.LimitOverrunError as error:
+            await reader.readexactly(error.consumed)
+            too_long = True
+            continue
+        return None if too_long else line
+
+
+class CompileServer:
+    def __init__(self, workers=None, max_pending=64, timeout=10.0, latency_window=1000):
+        # Workers are started on demand while the pool's own threads run;
+        # forking then can copy a held queue lock into the child and hang it
+        self.pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+        self.timeout = timeout
+        self.slots = asyncio.Semaphore(max_pending)
+        self.queue_depth = 0        # admitted, waiting for a worker or running
+        self.in_pool = 0            # handed to the process pool and not finished
+        self.completed = 0
+        self.timeouts = 0
+        self.latencies = deque(maxlen=latency_window)   # recent request latencies (ms)
+
+    def stats(self):
+        ordered = sorted(self.latencies)
+        return {
+            "queue_depth": self.queue_depth,
+            "in_pool": self.in_pool,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "latency_ms": {
+                "p50": percentile(ordered, 0.50),
+                "p90": percentile(ordered, 0.90),
+                "p99": percentile(ordered, 0.99),
+            },
+        }
+
+    async def handle_connection(self, reader, writer):
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        async def reply(message):
+            async with write_lock:
+                writer.write(json.dumps(message).encode() + b"\n")
+                await writer.drain()
+
+        try:
+            while True:
+                line = await read_request_line(reader)
+                if line is None:
+                    await reply({"id": None, "ok": False,
+                                 "error": f"bad request: line longer than {MAX_REQUEST_BYTES} bytes"})
+                    continue
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError as error:
+                    await reply({"id": None, "ok": False, "error": f"bad request: {error}"})
+                    continue
+                if not isinstance(request, dict):
+                    await reply({"id": None, "ok": False, "error": "bad request: not a JSON object"})
+                    continue
+
+                if request.get("op") == "stats":
+                    await reply(dict(self.stats(), id=request.get("id")))
+                    continue
+
+                # Backpressure: stop reading this connection until a slot frees up
+                await self.slots.acquire()
+                self.queue_depth += 1
+                task = asyncio.create_task(self.serve_request(request, reply))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            # Let every admitted request finish (and release its slot) even if
+            # the connection failed; replies to a closed connection are dropped
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+    async def serve_request(self, request, reply):
+        start = time.perf_counter()
+        request_id = request.get("id")
+        job = None
+        try:
+            error = request_error(request)
+            if error is not None:
+                response = {"ok": False, "error": error}
+            else:
+                try:
+                    job = self.submit(request)
+                except Exception as error:     # e.g. BrokenProcessPool
+                    response = {"ok": False, "error": f"{type(error).__name__}: {error}"}
+                else:
+                    response = await self.wait_for_job(job)
+        finally:
+            # A submitted job gives its slot back when the worker is done (job_done)
+            if job is None:
+                self.release_slot()
+
+        latency = (time.perf_counter() - start) * 1000
+        self.latencies.append(latency)
+        self.completed += 1
+        response["id"] = request_id
+        response["latency_ms"] = round(latency, 3)
+        await reply(response)
+
+    def submit(self, request):
+        """
+        Hands a compile to the process pool. The request keeps its slot
+        until the worker has finished with it, even if the reply already
+        went out as a timeout, so timed-out compiles still count against
+        --max-pending.
+        """
+        loop = asyncio.get_running_loop()
+        job = self.pool.submit(run_compile_job, request["source"], request.get("stop_after", "codegen"),
+                               bool(request.get("link_runtime")))
+        self.in_pool += 1
+        # Done callbacks run on the pool's management thread
+        job.add_done_callback(lambda _: loop.call_soon_threadsafe(self.job_done))
+        return job
+
+    def job_done(self):
+        self.in_pool -= 1
+        self.release_slot()
+
+    def release_slot(self):
+        self.queue_depth -= 1
+        self.slots.release()
+
+    async def wait_for_job(self, job):
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(job), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return {"ok": False, "error": f"compile timed out after {self.timeout}s"}
+        except Exception as error:
+            return {"ok": False, "error": f"{type(error).__name__}: {error}"}
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def serve(args):
+    server = CompileServer(args.workers, args.max_pending, args.timeout)
+    if args.unix:
+        remove_stale_socket(args.unix)
+        listener = await asyncio.start_unix_server(server.handle_connection, path=args.unix, limit=MAX_REQUEST_BYTES)
+        where = args.unix
+    else:
+        listener = await asyncio.start_server(server.handle_connection, args.host, args.port, limit=MAX_REQUEST_BYTES)
+        where = f"{args.host}:{args.port}"
+
+    print(f"compile_server listening on {where}")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Asyncio Decaf compile service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7878)
+    parser.add_argument("--unix", help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=None, help="compile processes (default: CPU count)")
+    parser.add_argument("--max-pending", type=int, default=64, help="requests admitted before reads pause")
+    parser.add_argument("--timeout", type=float, default=10.0, help="per-request timeout in seconds")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# compile_stats.py
+"""
+Per-phase instrumentation for compile() (main.py --stats).
+
+A CompileStats passed to compile() records, for every phase it runs
+(tokenize, parse, check_semantics, bind, generate_code, link), the wall
+time, the CPU time and the peak memory tracemalloc saw above the phase's
+starting point, plus object counts: tokens, AST nodes, temps, labels and
+emitted lines. Timings taken with memory tracing on are inflated by
+tracemalloc itself; pass trace_memory=False for clean times.
+"""
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from ast_visitor import iter_children
+
+
+def count_ast_nodes(ast_root):
+    """Number of AST nodes reachable from the root (iter_children's view)."""
+    count = 0
+    stack = [ast_root]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(iter_children(node))
+    return count
+
+
+class CompileStats:
+    """Measurements for one compilation."""
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.phases = []        # [{"phase", "wall_ms", "cpu_ms", "peak_kib"}] in run order
+        self.counts = {}
+
+    @contextmanager
+    def phase(self, name):
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            record = {
+                "phase": name,
+                "wall_ms": round((time.perf_counter() - wall_start) * 1000, 3),
+                "cpu_ms": round((time.process_time() - cpu_start) * 1000, 3),
+                "peak_kib": None,
+            }
+            if self.trace_memory:
+                record["peak_kib"] = round((tracemalloc.get_traced_memory()[1] - base) / 1024, 1)
+                if started_tracing:
+                    tracemalloc.stop()
+            self.phases.append(record)
+
+    def as_dict(self):
+        return {"phases": self.phases, "counts": self.counts}
+
+    def to_json(self):
+        return json.dumps(self.as_dict())
+
+    def format_table(self):
+        lines = [f"{'phase':<16}{'wall ms':>10}{'cpu ms':>10}{'peak KiB':>10}"]
+        for record in self.phases:
+            peak = "-" if record["peak_kib"] is None else f"{record['peak_kib']:.1f}"
+            lines.append(f"{record['phase']:<16}{record['wall_ms']:>10.3f}{record['cpu_ms']:>10.3f}{peak:>10}")
+        lines.append(f"{'total':<16}{sum(r['wall_ms'] for r in self.phases):>10.3f}"
+                     f"{sum(r['cpu_ms'] for r in self.phases):>10.3f}")
+        lines.append("")
+        for name, value in self.counts.items():
+            lines.append(f"{name:<16}{value:>10}")
+        return "\n".join(lines)
@@ -0,0 +1,125 @@
+# compiler.py
+"""
+Single entry point for the whole pipeline.
+
+compile() runs scanner -> parser -> semantic analysis -> binding -> code
+generation on one source string and returns a CompileResult. Every phase keeps its state
+in objects created for that call (token list, AST, semantic context,
+codegen context), so independent compilations can run concurrently from
+threads or an asyncio executor.
+"""
+import os
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+
+from scanner_re import tokenize
+from parser import parse
+from format_nodes import format_ast_string
+from semantic_analyzer import check_semantics
+from binding import bind_program
+from code_generation import generate_code
+from lowering import lower_program
+from mips_backend import generate_mips
+from optimizer import check_passes, optimize_program
+from compile_stats import count_ast_nodes
+
+# Phases compile() can stop after, in pipeline order
+PHASES = ("parse", "semantic", "codegen")
+
+# "direct" emits MIPS straight from the AST (code_generation.py); "tac"
+# lowers to three-address code first (lowering.py, mips_backend.py)
+BACKENDS = ("direct", "tac")
+
+RUNTIME_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "defs.asm")
+
+
+@dataclass
+class CompileResult:
+    """Outcome of one compilation."""
+    ok: bool
+    output: str                 # MIPS code, or the error text the CLI prints
+    phase: str                  # last phase that ran: parse, semantic or codegen
+    errors: list = field(default_factory=list)
+    tokens: list = None
+    ast: dict = None
+
+
+def _no_phase(name):
+    return nullcontext()
+
+
+def compile(source, workers=None, analyzer=None, stop_after="codegen", stats=None, backend="direct", optimize=()):
+    """
+    Compiles Decaf source text and returns a CompileResult.
+    Nothing is printed and no module-level state is touched.
+    workers > 1 checks function bodies in a process pool of at most one
+    worker per available CPU; an IncrementalAnalyzer passed as analyzer reuses its cached diagnostics.
+    stop_after="parse" returns the formatted AST, "semantic" returns an
+    empty output once the program checks cleanly. A CompileStats passed
+    as stats gets per-phase timings and object counts; the profilers in
+    profiling.py plug in the same way. backend is one of BACKENDS;
+    optimize names the optimizations (optimizer.py) the tac backend runs.
+    """
+    if stop_after not in PHASES:
+        raise ValueError(f"stop_after must be one of {', '.join(PHASES)}")
+    if backend not in BACKENDS:
+        raise ValueError(f"backend must be one of {', '.join(BACKENDS)}")
+    optimize = check_passes(optimize)
+    if optimize and backend != "tac":
+        raise ValueError("optimizations need the tac backend")
+    phase = stats.phase if stats is not None else _no_phase
+
+    with phase("tokenize"):
+        tokens = tokenize(source)
+    with phase("parse"):
+        ast_output = parse(tokens)
+    if stats is not None:
+        stats.counts["tokens"] = len(tokens)
+        if not isinstance(ast_output, str):
+            stats.counts["ast_nodes"] = count_ast_nodes(ast_output)
+
+    # The parser reports a syntax error as a ready-to-print string
+    if isinstance(ast_output, str):
+        return CompileResult(False, ast_output, "parse", [ast_output.strip()], tokens)
+    if stop_after == "parse":
+        return CompileResult(True, format_ast_string(ast_output), "parse", [], tokens, ast_output)
+
+    with phase("check_semantics"):
+        if analyzer is not None:
+            semantic_errors = analyzer.check(ast_output, tokens)
+        else:
+            semantic_errors = check_semantics(ast_output, tokens, workers=workers)
+    if semantic_errors:
+        output = "\n".join(semantic_errors) + "\n"
+        return CompileResult(False, output, "semantic", semantic_errors, tokens, ast_output)
+    if stop_after == "semantic":
+        return CompileResult(True, "", "semantic", [], tokens, ast_output)
+
+    with phase("bind"):
+        bind_program(ast_output)
+    counters = stats.counts if stats is not None else None
+    if backend == "tac":
+        with phase("lower"):
+            functions = lower_program(ast_output, counters)
+        if optimize:
+            with phase("optimize"):
+                optimize_program(functions, optimize, counters)
+        with phase("generate_code"):
+            output = generate_mips(functions, optimize, counters)
+    else:
+        with phase("generate_code"):
+            output = generate_code(ast_output, counters)
+    if stats is not None:
+        stats.counts["emitted_lines"] = output.count("\n")
+    ok = not output.lstrip().startswith("*** Error")
+    errors = [] if ok else [output.strip()]
+    return CompileResult(ok, output, "codegen", errors, tokens, ast_output)
+
+
+def link_runtime(asm_text, runtime_path=RUNTIME_PATH):
+    """
+    Appends the Decaf runtime (defs.asm) to compiled MIPS code, giving one
+    file SPIM can load.
+    """
+    with open(runtime_path, "r") as runtime_file:
+        return asm_text + "\n\n" + runtime_file.read()
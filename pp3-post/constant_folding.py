@@ -0,0 +1,116 @@
+# constant_folding.py
+"""
+Constant folding and block-local constant propagation over TAC.
+
+evaluate() computes an integer operator on two constants exactly as the
+MIPS code mips_backend.py emits would: results wrap at 32 bits, / and %
+truncate toward zero (the remainder takes the dividend's sign), the
+comparisons give 0/1 and && / || are the bitwise and/or of their 0/1
+operands. Division by zero and the overflowing -2147483648 / -1 are left
+for run time, as are float operators.
+
+fold_constants() walks each basic block remembering which variables hold a
+known constant, substitutes those constants into later operands, replaces
+foldable BinOps with Assigns and resolves IfZ on a constant into a Goto or
+nothing. A call forgets what it knew about globals.
+"""
+from binding import Symbol
+from cfg import split_blocks
+from tac import wrap32, Assign, BinOp, IfZ, Goto, PushParam, LCall, Return
+
+INT_MIN = -0x80000000
+
+
+def _divide(left, right):
+    quotient = abs(left) // abs(right)
+    return quotient if (left < 0) == (right < 0) else -quotient
+
+
+_EVALUATORS = {
+    "+": lambda left, right: wrap32(left + right),
+    "-": lambda left, right: wrap32(left - right),
+    "*": lambda left, right: wrap32(left * right),
+    "/": lambda left, right: wrap32(_divide(left, right)),
+    "%": lambda left, right: wrap32(left - _divide(left, right) * right),
+    "<": lambda left, right: int(left < right),
+    "<=": lambda left, right: int(left <= right),
+    ">": lambda left, right: int(left > right),
+    ">=": lambda left, right: int(left >= right),
+    "==": lambda left, right: int(left == right),
+    "!=": lambda left, right: int(left != right),
+    "&&": lambda left, right: left & right,
+    "||": lambda left, right: left | right,
+}
+
+
+def evaluate(op, left, right):
+    """Value of `left op right` for constant operands, or None if it must run."""
+    evaluator = _EVALUATORS.get(op)
+    if evaluator is None:
+        return None
+    if op in ("/", "%") and (right == 0 or (left == INT_MIN and right == -1)):
+        return None
+    return evaluator(wrap32(left), wrap32(right))
+
+
+def fold_constants(function):
+    """Folds and propagates constants within each basic block. Returns the change count."""
+    code = []
+    changes = 0
+    for block in split_blocks(function.code):
+        block_code, block_changes = fold_block(block)
+        code.extend(block_code)
+        changes += block_changes
+    function.code = code
+    return changes
+
+
+def fold_block(instrs, known=None):
+    """
+    Folds one block's instructions, starting from known ({variable:
+    constant} on entry, empty if None). Returns (new instructions, change count).
+    """
+    known = {} if known is None else known      # variable -> constant it holds
+    out = []
+    changes = 0
+
+    def value(operand):
+        nonlocal changes
+        if operand in known:
+            changes += 1
+            return known[operand]
+        return operand
+
+    for instr in instrs:
+        if isinstance(instr, Assign):
+            instr.src = value(instr.src)
+        elif isinstance(instr, BinOp):
+            instr.left = value(instr.left)
+            instr.right = value(instr.right)
+            if isinstance(instr.left, int) and isinstance(instr.right, int):
+                result = evaluate(instr.op, instr.left, instr.right)
+                if result is not None:
+                    instr = Assign(instr.dst, result)
+                    changes += 1
+        elif isinstance(instr, PushParam):
+            instr.arg = value(instr.arg)
+        elif isinstance(instr, Return) and instr.value is not None:
+            instr.value = value(instr.value)
+        elif isinstance(instr, IfZ):
+            instr.cond = value(instr.cond)
+            if isinstance(instr.cond, int):
+                changes += 1
+                if instr.cond != 0:
+                    continue
+                instr = Goto(instr.label)
+
+        for variable in instr.defines():
+            known.pop(variable, None)
+        if isinstance(instr, Assign) and isinstance(instr.src, int):
+            known[instr.dst] = instr.src
+        elif isinstance(instr, LCall):
+            # The callee may assign any global
+            for variable in [variable for variable in known if isinstance(variable, Symbol) and variable.is_global]:
+                del known[variable]
+        out.append(instr)
+    return out, changes
@@ -0,0 +1,387 @@
+# counted_loops.py
+"""
+Counted loops: induction-variable strength reduction and unrolling over TAC.
+
+A counted loop (find_counted_loop()) is a natural loop (loops.py) whose
+blocks are laid out in one run from the header to a latch ending in the
+bottom test lowering.py emits, `u = x op bound; IfZ u Goto header`. x is
+a basic induction variable i, or the temp i's new value was computed in.
+i is a temp or local assigned once in the loop, by `i = i + step` (or
+through a temp: `t = i + step; i = t`) in the latch, ahead of the test.
+The bound is a constant or a variable the loop never assigns. When i
+enters the loop as a constant (its one definition outside the loop
+dominates the header) and the bound is a constant, the trip count is
+known.
+
+reduce_induction_variables() replaces each `t = i * k` in a counted loop,
+k a constant other than a power of two (a single shift already), by a new
+derived induction variable d: d is set to i * k in the preheader and
+stepped by step * k right after i is. A temp t read only later in the
+same iteration is replaced by d outright, anything else becomes `t = d`.
+
+unroll_loops() rewrites counted loops with a known trip count. When all
+the trips fit in the size budget (UNROLL_BUDGET instructions of loop
+body), the loop becomes that many copies of its body without tests.
+Otherwise, when UNROLL_FACTOR copies fit (fewer when they do not, down to
+two), an unrolled loop runs that many iterations per trip with one test,
+while whole groups remain, and the original loop after it runs the
+remaining iterations. Labels in the copies are the originals with a
+"_<copy>" suffix, so they stay unique in the program, and temps used only
+within an iteration get new temps in every copy.
+"""
+from binding import Symbol
+from cfg import build_cfg
+from dataflow import Dominators, Liveness, ReachingDefinitions
+from loops import find_loops, preheader_position, replace_operands, temp_factory
+from strength_reduction import log2_exact
+from tac import wrap32, Temp, Assign, LoadString, BinOp, Label, Goto, IfZ, PushParam, PopParams, LCall, Return
+
+# Most instructions an unrolled loop body may have
+UNROLL_BUDGET = 128
+# Copies of the body per trip of a partly unrolled loop
+UNROLL_FACTOR = 4
+
+NEGATED_COMPARISONS = {"<": ">=", "<=": ">", ">": "<=", ">=": "<", "==": "!=", "!=": "=="}
+SWAPPED_COMPARISONS = {"<": ">", "<=": ">=", ">": "<", ">=": "<=", "==": "==", "!=": "!="}
+
+
+class CountedLoop:
+    """A counted loop: its natural loop plus what the induction variable does."""
+
+    __slots__ = ("loop", "latch", "variable", "step", "step_position", "tested", "op", "bound",
+                 "initial", "trips")
+
+    def __init__(self, loop, latch, variable, step, step_position, tested, op, bound, initial, trips):
+        self.loop = loop
+        self.latch = latch                  # block ending in the bottom test
+        self.variable = variable            # basic induction variable i
+        self.step = step                    # constant added to i each iteration
+        self.step_position = step_position  # index in latch.instrs of the instruction assigning i
+        self.tested = tested                # operand compared: i, or the temp holding i + step
+        self.op = op                        # the loop repeats while `tested op bound`
+        self.bound = bound
+        self.initial = initial              # i on entry when constant, else None
+        self.trips = trips                  # iterations per entry, or None if not constant
+
+    def __repr__(self):
+        return f"CountedLoop({self.variable} += {self.step} while {self.op} {self.bound}, trips {self.trips})"
+
+
+def find_counted_loop(cfg, loop, reaching, dominators):
+    """The CountedLoop for loop, or None when it is not one."""
+    header = loop.header
+    latch = cfg.blocks[max(loop.blocks)]
+    if header.label is None or sorted(loop.blocks) != list(range(header.index, latch.index + 1)):
+        return None
+    if len(latch.instrs) < 2:
+        return None
+    test, branch = latch.instrs[-2:]
+    if not (isinstance(branch, IfZ) and branch.label == header.label and isinstance(test, BinOp)
+            and test.dst is branch.cond and test.op in NEGATED_COMPARISONS):
+        return None
+    # Only the bottom test may jump back to the header, and only it may read u
+    references = 0
+    for block in cfg.blocks:
+        for instr in block.instrs:
+            references += isinstance(instr, (Goto, IfZ)) and instr.label == header.label
+            references += test.dst in instr.uses()
+    if references != 2:
+        return None
+
+    sites = [site for site in reaching.sites if site[0] in loop.blocks]
+    for position in range(len(latch.instrs) - 2):
+        found = basic_step(latch.instrs, position)
+        if found is None:
+            continue
+        variable, step, new_value = found
+        if isinstance(variable, Symbol) and variable.is_global:
+            continue
+        if [site for site in sites if site[2] is variable] != [(latch.index, position, variable)]:
+            continue
+        if test.left in (variable, new_value) and invariant_bound(test.right, sites):
+            tested, bound, op = test.left, test.right, NEGATED_COMPARISONS[test.op]
+        elif test.right in (variable, new_value) and invariant_bound(test.left, sites):
+            tested, bound, op = test.right, test.left, SWAPPED_COMPARISONS[NEGATED_COMPARISONS[test.op]]
+        else:
+            continue
+        if tested is new_value and new_value is not variable and any(
+                new_value in instr.defines() for instr in latch.instrs[position + 1:-2]):
+            continue
+        initial = entry_constant(cfg, loop, reaching, dominators, variable)
+        trips = None
+        if initial is not None and isinstance(bound, int):
+            trips = trip_count(initial, step, op, bound)
+        return CountedLoop(loop, latch, variable, step, position, tested, op, bound, initial, trips)
+    return None
+
+
+def basic_step(instrs, position):
+    """(i, step, operand holding i's new value) if instrs[position] steps i, else None."""
+    instr = instrs[position]
+    if isinstance(instr, BinOp):
+        increment = as_increment(instr, instr.dst)
+        return None if increment is None else (instr.dst, increment, instr.dst)
+    if isinstance(instr, Assign) and isinstance(instr.src, Temp) and position > 0:
+        previous = instrs[position - 1]
+        if isinstance(previous, BinOp) and previous.dst is instr.src:
+            increment = as_increment(previous, instr.dst)
+            return None if increment is None else (instr.dst, increment, instr.src)
+    return None
+
+
+def as_increment(instr, variable):
+    """step if instr computes variable + step or variable - step (step a nonzero constant), else None."""
+    if instr.op == "+" and instr.left is variable and isinstance(instr.right, int):
+        step = instr.right
+    elif instr.op == "+" and instr.right is variable and isinstance(instr.left, int):
+        step = instr.left
+    elif instr.op == "-" and instr.left is variable and isinstance(instr.right, int):
+        step = -instr.right
+    else:
+        return None
+    return step or None
+
+
+def invariant_bound(operand, sites):
+    """True if operand is a constant or a variable with no definition site in the loop (calls count for globals)."""
+    return isinstance(operand, int) or not any(site[2] is operand for site in sites)
+
+
+def entry_constant(cfg, loop, reaching, dominators, variable):
+    """
+    The constant variable holds whenever the loop is entered, or None. A
+    formal or global already has a value on entry to the function without
+    any definition site, so the one definition reaching the loop from
+    outside counts only when it dominates the header: every way in passes
+    through it.
+    """
+    header = loop.header
+    sites = [site for site in reaching.definitions(reaching.reach_in.get(header.index, 0), variable)
+             if site[0] not in loop.blocks]
+    if len(sites) != 1:
+        return None
+    block_index, position, _ = sites[0]
+    if not dominators.dominates(block_index, header):
+        return None
+    instr = cfg.blocks[block_index].instrs[position]
+    if isinstance(instr, Assign) and isinstance(instr.src, int):
+        return instr.src
+    return None
+
+
+def trip_count(initial, step, op, bound):
+    """
+    Iterations of a bottom-tested loop entered with i == initial that adds
+    step to i and repeats while `i op bound`; None when i would wrap
+    around or the loop would not end.
+    """
+    if op in ("<", ">"):
+        bound, op = (bound - 1, "<=") if op == "<" else (bound + 1, ">=")
+    if op == "<=" and step > 0:
+        extra = max(0, (bound - initial) // step)
+    elif op == ">=" and step < 0:
+        extra = max(0, (initial - bound) // -step)
+    elif op == "!=" and (bound - initial) % step == 0 and (bound - initial) // step >= 1:
+        extra = (bound - initial) // step - 1
+    else:
+        return None
+    trips = extra + 1
+    if wrap32(initial + trips * step) != initial + trips * step:
+        return None
+    return trips
+
+
+def counted_loops(function, handled):
+    """
+    Yields (cfg, CountedLoop) for each counted loop whose header label is
+    not in handled, innermost first; the CFG is rebuilt after each one.
+    """
+    while True:
+        cfg = build_cfg(function)
+        reaching = ReachingDefinitions(cfg)
+        dominators = Dominators(cfg)
+        for loop in find_loops(cfg, dominators):
+            if loop.header.label in handled:
+                continue
+            handled.add(loop.header.label)
+            counted = find_counted_loop(cfg, loop, reaching, dominators)
+            if counted is not None:
+                yield cfg, counted
+                break
+        else:
+            return
+
+
+# --- Induction-variable strength reduction ---
+
+def reduce_induction_variables(function):
+    """Replaces multiplies of induction variables by constants with additions. Returns the count replaced."""
+    new_temp = temp_factory(function)
+    replaced = 0
+    for cfg, counted in counted_loops(function, set()):
+        position = preheader_position(cfg, counted.loop)
+        if position is None:
+            continue
+        replaced += reduce_loop(cfg, counted, position, new_temp)
+        function.code = cfg.linearize()
+    return replaced
+
+
+def reduce_loop(cfg, counted, position, new_temp):
+    variable, step, latch = counted.variable, counted.step, counted.latch
+    derived = {}        # constant k -> derived induction variable holding i * k
+    replaced = 0
+    for block in cfg.blocks:
+        if block.index not in counted.loop.blocks:
+            continue
+        for index, instr in enumerate(block.instrs):
+            factor = induction_factor(instr, variable)
+            # A power of two is a single shift already (the "strength" backend option)
+            if not factor or log2_exact(abs(factor)) is not None:
+                continue
+            if factor not in derived:
+                derived[factor] = new_temp()
+            limit = counted.step_position if block is latch else len(block.instrs)
+            if read_only_in(cfg, instr.dst, block, index, limit):
+                # Read d directly; removed below, after the latch edit needs the positions
+                for later in block.instrs[index + 1:]:
+                    if later is not None:
+                        replace_operands(later, {instr.dst: derived[factor]})
+                block.instrs[index] = None
+            else:
+                block.instrs[index] = Assign(instr.dst, derived[factor])
+            replaced += 1
+    if not derived:
+        return 0
+    updates = [BinOp(temp, "+", temp, wrap32(step * factor)) for factor, temp in derived.items()]
+    latch.instrs[counted.step_position + 1:counted.step_position + 1] = updates
+    for block in cfg.blocks:
+        if block.index in counted.loop.blocks:
+            block.instrs = [instr for instr in block.instrs if instr is not None]
+    # After the latch edit: the header may be the latch
+    cfg.blocks[position].instrs[:0] = [BinOp(temp, "*", variable, factor) for factor, temp in derived.items()]
+    return replaced
+
+
+def induction_factor(instr, variable):
+    """k if instr is `t = variable * k` for a constant k, else None."""
+    if not isinstance(instr, BinOp) or instr.op != "*":
+        return None
+    if instr.left is variable and isinstance(instr.right, int):
+        return instr.right
+    if instr.right is variable and isinstance(instr.left, int):
+        return instr.left
+    return None
+
+
+def read_only_in(cfg, temp, block, index, limit):
+    """
+    True if temp is a Temp that block.instrs[index] alone assigns and that
+    is read nowhere but in block.instrs[index + 1:limit + 1].
+    """
+    if not isinstance(temp, Temp):
+        return False
+    for other in cfg.blocks:
+        for position, instr in enumerate(other.instrs):
+            if instr is None or (other is block and position == index):
+                continue
+            if temp in instr.defines():
+                return False
+            if temp in instr.uses() and not (other is block and index < position <= limit):
+                return False
+    return True
+
+
+# --- Unrolling ---
+
+def unroll_loops(function, budget=UNROLL_BUDGET, factor=UNROLL_FACTOR):
+    """Unrolls counted loops with a constant trip count. Returns the number of loops unrolled."""
+    new_temp = temp_factory(function)
+    unrolled = 0
+    handled = set()
+    for cfg, counted in counted_loops(function, handled):
+        if counted.trips is None:
+            continue
+        code = unroll_loop(cfg, counted, budget, factor, new_temp, handled)
+        if code is not None:
+            function.code = code
+            unrolled += 1
+    return unrolled
+
+
+def unroll_loop(cfg, counted, budget, factor, new_temp, handled):
+    """The function's code with counted unrolled, or None when it does not fit the budget."""
+    loop, trips = counted.loop, counted.trips
+    members = [block for block in cfg.blocks if block.index in loop.blocks]
+    body = [instr for block in members for instr in block.instrs][:-2]     # without the bottom test
+    size = sum(not isinstance(instr, Label) for instr in body)
+    if trips * size <= budget:
+        copies, groups = trips, 0
+    else:
+        copies = min(factor, budget // max(size, 1))
+        groups = trips // copies if copies >= 2 else 0
+        if groups == 0:
+            return None
+
+    liveness = Liveness(cfg)
+    bits = liveness.index.bits
+    outside = liveness.live_in.get(loop.header.index, 0)
+    for block in members:
+        for succ in block.succs:
+            if succ.index not in loop.blocks:
+                outside |= liveness.live_in.get(succ.index, 0)
+    local_temps = {operand for instr in body for operand in instr.defines()
+                   if isinstance(operand, Temp) and not outside >> bits[operand] & 1}
+
+    inside = {instr.name for instr in body if isinstance(instr, Label)}
+    unrolled = []
+    for copy in range(1, copies + 1):
+        temps = {temp: new_temp() for temp in local_temps} if copy > 1 else {}
+        unrolled.extend(copy_instr(instr, temps, lambda label: f"{label}_{copy}" if label in inside else label)
+                        for instr in body)
+    if groups:
+        # Repeat until i reaches its value after the last whole group
+        final = wrap32(counted.initial + groups * copies * counted.step)
+        again = new_temp()
+        unrolled.append(BinOp(again, ">=" if counted.step > 0 else "<=", temps.get(counted.tested, counted.tested), final))
+        unrolled.append(IfZ(again, f"{loop.header.label}_1"))
+        if groups * copies < trips:
+            # The original loop runs what is left
+            unrolled.extend(instr for block in members for instr in block.instrs)
+    handled.update(instr.name for instr in unrolled if isinstance(instr, Label))
+
+    code = []
+    for block in cfg.blocks:
+        if block.index == loop.header.index:
+            code.extend(unrolled)
+        elif block.index not in loop.blocks:
+            code.extend(block.instrs)
+    return code
+
+
+def copy_instr(instr, temps, relabel):
+    """A copy of instr with temps renamed through temps and labels through relabel."""
+    def rename(operand):
+        return temps.get(operand, operand)
+
+    if isinstance(instr, Assign):
+        return Assign(rename(instr.dst), rename(instr.src))
+    if isinstance(instr, LoadString):
+        return LoadString(rename(instr.dst), instr.text)
+    if isinstance(instr, BinOp):
+        return BinOp(rename(instr.dst), instr.op, rename(instr.left), rename(instr.right))
+    if isinstance(instr, Label):
+        return Label(relabel(instr.name))
+    if isinstance(instr, Goto):
+        return Goto(relabel(instr.label))
+    if isinstance(instr, IfZ):
+        return IfZ(rename(instr.cond), relabel(instr.label))
+    if isinstance(instr, PushParam):
+        return PushParam(rename(instr.arg))
+    if isinstance(instr, PopParams):
+        return PopParams(instr.size)
+    if isinstance(instr, LCall):
+        return LCall(instr.label, None if instr.dst is None else rename(instr.dst))
+    if isinstance(instr, Return):
+        return Return(None if instr.value is None else rename(instr.value))
+    raise TypeError(f"cannot copy {instr!r}")
@@ -0,0 +1,312 @@
+# dataflow.py
+"""
+Iterative dataflow analysis over a ControlFlowGraph (cfg.py).
+
+Facts are bitsets held in Python ints, so meet and transfer are single
+integer operations whatever the number of facts. A problem supplies its
+direction, its meet (union or intersection), the value at the boundary
+(entry for forward problems, exits for backward ones) and a per-block
+transfer function; solve() runs a worklist until nothing changes and
+returns the IN and OUT bitset of every block.
+
+Problems with a classic gen/kill transfer (OUT = GEN | (IN & ~KILL)) only
+need to provide gen and kill bitsets; see GenKillProblem. Dominators,
+liveness and reaching definitions are built on the framework below.
+"""
+from collections import deque
+
+from binding import Symbol
+from tac import Temp, LCall, Return
+
+FORWARD = "forward"
+BACKWARD = "backward"
+UNION = "union"
+INTERSECTION = "intersection"
+
+
+class DataflowProblem:
+    """Base class. Subclasses set direction/meet and implement the hooks."""
+
+    direction = FORWARD
+    meet = UNION
+
+    def universe(self, cfg):
+        """Bitset of every fact; the starting value for intersection problems."""
+        raise NotImplementedError
+
+    def boundary(self, cfg):
+        """Value flowing into the entry (forward) or out of the exits (backward)."""
+        return 0
+
+    def transfer(self, block, value):
+        """Value after the block given the value before it (in flow order)."""
+        raise NotImplementedError
+
+
+class GenKillProblem(DataflowProblem):
+    """OUT = GEN | (IN & ~KILL) with per-block gen and kill bitsets."""
+
+    def __init__(self, gen, kill):
+        self.gen = gen          # {block index: bitset}
+        self.kill = kill
+
+    def transfer(self, block, value):
+        return self.gen[block.index] | (value & ~self.kill[block.index])
+
+
+def solve(cfg, problem):
+    """
+    Solves problem over the blocks reachable from the entry. Returns
+    (in_sets, out_sets), dicts keyed by block index; IN/OUT are in program
+    order, so for a backward problem IN is the value at the block's start.
+    """
+    order = cfg.reverse_postorder()
+    forward = problem.direction == FORWARD
+    if not forward:
+        order.reverse()
+    reachable = {block.index for block in order}
+
+    intersect = problem.meet == INTERSECTION
+    interior = problem.universe(cfg) if intersect else 0
+    boundary = problem.boundary(cfg)
+
+    # before[b] is the value entering b in flow order, after[b] the value leaving it
+    before = {}
+    after = {block.index: interior for block in order}
+
+    worklist = deque(order)
+    queued = set(reachable)
+    while worklist:
+        block = worklist.popleft()
+        queued.discard(block.index)
+
+        sources = block.preds if forward else block.succs
+        sources = [source for source in sources if source.index in reachable]
+        if forward and block is cfg.entry:
+            value = boundary
+            for source in sources:
+                value = (value & after[source.index]) if intersect else (value | after[source.index])
+        elif not sources:
+            value = boundary
+        else:
+            value = after[sources[0].index]
+            for source in sources[1:]:
+                value = (value & after[source.index]) if intersect else (value | after[source.index])
+        before[block.index] = value
+
+        new_after = problem.transfer(block, value)
+        if new_after != after[block.index]:
+            after[block.index] = new_after
+            for target in (block.succs if forward else block.preds):
+                if target.index in reachable and target.index not in queued:
+                    queued.add(target.index)
+                    worklist.append(target)
+
+    if forward:
+        return before, after
+    return after, before
+
+
+def iter_bits(bitset):
+    """Indices of the set bits, lowest first."""
+    while bitset:
+        low = bitset & -bitset
+        yield low.bit_length() - 1
+        bitset ^= low
+
+
+# --- Dominators ---
+
+class DominatorProblem(DataflowProblem):
+    """Forward, intersection: OUT(b) = IN(b) | {b}; bit i is block i."""
+
+    direction = FORWARD
+    meet = INTERSECTION
+
+    def universe(self, cfg):
+        return (1 << len(cfg.blocks)) - 1
+
+    def boundary(self, cfg):
+        return 0
+
+    def transfer(self, block, value):
+        return value | (1 << block.index)
+
+
+class Dominators:
+    """Dominator sets and the immediate-dominator tree of a CFG."""
+
+    def __init__(self, cfg):
+        _, out_sets = solve(cfg, DominatorProblem())
+        self.cfg = cfg
+        self.sets = out_sets                # {block index: bitset of its dominators}
+        self.idom = {}
+        for index, dominators in out_sets.items():
+            strict = dominators & ~(1 << index)
+            # The immediate dominator is the strict dominator with the most dominators
+            best = None
+            for candidate in iter_bits(strict):
+                if best is None or bin(out_sets[candidate]).count("1") > bin(out_sets[best]).count("1"):
+                    best = candidate
+            self.idom[index] = best
+
+    def dominates(self, a, b):
+        """True if block a dominates block b (blocks or indices)."""
+        a = getattr(a, "index", a)
+        b = getattr(b, "index", b)
+        return b in self.sets and bool(self.sets[b] >> a & 1)
+
+
+# --- Liveness ---
+
+class VariableIndex:
+    """Assigns bit positions to the variables (Temps and Symbols) of a function."""
+
+    def __init__(self):
+        self.bits = {}
+        self.variables = []
+
+    def bit(self, variable):
+        position = self.bits.get(variable)
+        if position is None:
+            position = self.bits[variable] = len(self.variables)
+            self.variables.append(variable)
+        return position
+
+    def mask(self, variables):
+        value = 0
+        for variable in variables:
+            if isinstance(variable, (Temp, Symbol)):
+                value |= 1 << self.bit(variable)
+        return value
+
+    def decode(self, bitset):
+        return [self.variables[position] for position in iter_bits(bitset)]
+
+
+def instruction_uses(instr, globals_mask, index):
+    """Bitset read by instr. Calls and returns may read every global."""
+    value = index.mask(instr.uses())
+    if isinstance(instr, (LCall, Return)):
+        value |= globals_mask
+    return value
+
+
+class LivenessProblem(GenKillProblem):
+    """Backward, union; facts are variables."""
+
+    direction = BACKWARD
+    meet = UNION
+
+    def __init__(self, cfg, index):
+        self.index = index
+        self.globals_mask = index.mask(global_symbols(cfg))
+        gen, kill = {}, {}
+        for block in cfg.blocks:
+            block_gen = block_kill = 0
+            for instr in reversed(block.instrs):
+                defined = index.mask(instr.defines())
+                block_gen = (block_gen & ~defined) | instruction_uses(instr, self.globals_mask, index)
+                block_kill |= defined
+            gen[block.index], kill[block.index] = block_gen, block_kill
+        super().__init__(gen, kill)
+
+    def boundary(self, cfg):
+        # Globals outlive the function
+        return self.globals_mask
+
+
+def global_symbols(cfg):
+    found = []
+    for block in cfg.blocks:
+        for instr in block.instrs:
+            for operand in instr.defines() + tuple(instr.uses()):
+                if isinstance(operand, Symbol) and operand.is_global:
+                    found.append(operand)
+    return found
+
+
+class Liveness:
+    """Live-in/live-out bitsets per block, plus per-instruction live-out on demand."""
+
+    def __init__(self, cfg, index=None):
+        self.cfg = cfg
+        self.index = index if index is not None else VariableIndex()
+        problem = LivenessProblem(cfg, self.index)
+        self.globals_mask = problem.globals_mask
+        self.live_in, self.live_out = solve(cfg, problem)
+
+    def live_after(self, block):
+        """Live-out bitset of each instruction of block, in instruction order."""
+        live = self.live_out.get(block.index, self.globals_mask)
+        result = [0] * len(block.instrs)
+        for position in range(len(block.instrs) - 1, -1, -1):
+            result[position] = live
+            instr = block.instrs[position]
+            live = (live & ~self.index.mask(instr.defines())) | instruction_uses(instr, self.globals_mask, self.index)
+        return result
+
+    def names(self, bitset):
+        return sorted(variable.name for variable in self.index.decode(bitset))
+
+
+# --- Reaching definitions ---
+
+class ReachingDefinitionsProblem(GenKillProblem):
+    """Forward, union; facts are definition sites."""
+
+    direction = FORWARD
+    meet = UNION
+
+
+class ReachingDefinitions:
+    """
+    Definition sites reaching each block. A site is (block index, position,
+    variable); a call is a site for every global, as the callee may assign
+    it. Variables never defined in the function (formals, globals on
+    entry) simply have no site.
+    """
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.sites = []             # bit -> (block index, position, variable)
+        self.masks = {}             # variable -> bitset of its sites
+        self.block_sites = {}       # block index -> its sites' bits, in order
+        globals_ = list(dict.fromkeys(global_symbols(cfg)))
+        for block in cfg.blocks:
+            self.block_sites[block.index] = []
+            for position, instr in enumerate(block.instrs):
+                defined = list(instr.defines())
+                if isinstance(instr, LCall):
+                    defined.extend(globals_)
+                for variable in defined:
+                    bit = len(self.sites)
+                    self.sites.append((block.index, position, variable))
+                    self.masks[variable] = self.masks.get(variable, 0) | 1 << bit
+                    self.block_sites[block.index].append(bit)
+        gen, kill = {}, {}
+        for block in cfg.blocks:
+            block_gen = block_kill = 0
+            for bit in self.block_sites[block.index]:
+                mask = self.masks[self.sites[bit][2]]
+                block_gen = (block_gen & ~mask) | 1 << bit
+                block_kill |= mask
+            gen[block.index], kill[block.index] = block_gen, block_kill
+        self.reach_in, self.reach_out = solve(cfg, ReachingDefinitionsProblem(gen, kill))
+
+    def reaching_before(self, block):
+        """Bitset of the sites reaching each instruction of block, in instruction order."""
+        reaching = self.reach_in.get(block.index, 0)
+        sites = iter(self.block_sites[block.index])
+        bit = next(sites, None)
+        result = []
+        for position in range(len(block.instrs)):
+            result.append(reaching)
+            while bit is not None and self.sites[bit][1] == position:
+                reaching = (reaching & ~self.masks[self.sites[bit][2]]) | 1 << bit
+                bit = next(sites, None)
+        return result
+
+    def definitions(self, bitset, variable):
+        """The sites of variable in bitset."""
+        return [self.sites[bit] for bit in iter_bits(bitset & self.masks.get(variable, 0))]
@@ -0,0 +1,61 @@
+# dead_code.py
+"""
+Dead code and dead store elimination over TAC.
+
+remove_unreachable() deletes the basic blocks no path from the entry
+reaches, such as code after a return or a break, then tidies the jumps
+and labels left behind (cfg.tidy_jumps).
+
+eliminate_dead_stores() deletes assignments whose variable is not live
+afterwards (dataflow.Liveness): temps that are never read, like the
+value of an expression statement, and variables overwritten before being
+read. A call whose result is dead keeps the call but drops the result.
+Globals stay live at calls and returns, so their stores are kept. A
+division or remainder by anything but a nonzero constant is kept too, as
+it may trap. Removing one store can kill the values it read, so the pass
+repeats until nothing changes.
+"""
+from cfg import build_cfg, tidy_jumps
+from dataflow import Liveness
+from tac import Assign, BinOp, LoadString, LCall
+
+
+def remove_unreachable(function):
+    """Deletes unreachable blocks. Returns the number of instructions removed."""
+    cfg = build_cfg(function)
+    reachable = cfg.reachable()
+    code = [instr for block in cfg.blocks if block.index in reachable for instr in block.instrs]
+    removed = len(function.code) - len(code)
+    function.code, dropped = tidy_jumps(code)
+    return removed + dropped
+
+
+def may_trap(instr):
+    return isinstance(instr, BinOp) and instr.op in ("/", "%") and (not isinstance(instr.right, int) or instr.right == 0)
+
+
+def eliminate_dead_stores(function):
+    """Deletes dead assignments until none is left. Returns the number removed."""
+    removed = 0
+    while True:
+        cfg = build_cfg(function)
+        liveness = Liveness(cfg)
+        bits = liveness.index.bits
+        code = []
+        changes = 0
+        for block in cfg.blocks:
+            live_after = liveness.live_after(block) if block.index in liveness.live_out else None
+            for position, instr in enumerate(block.instrs):
+                dead = (live_after is not None and instr.dst is not None
+                        and not live_after[position] >> bits[instr.dst] & 1)
+                if dead and isinstance(instr, LCall):
+                    instr.dst = None
+                    changes += 1
+                elif dead and isinstance(instr, (Assign, LoadString, BinOp)) and not may_trap(instr):
+                    changes += 1
+                    continue
+                code.append(instr)
+        function.code = code
+        removed += changes
+        if not changes:
+            return removed
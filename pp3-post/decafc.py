@@ -0,0 +1,89 @@
+# decafc.py
+"""
+decafc - thin command-line client for the decafd compile daemon.
+
+Sends a .decaf file to a running decafd over its Unix socket and prints
+the result, exactly as `python main.py file.decaf` would. Only the
+standard library is imported here, so start-up stays cheap; if no daemon
+is listening the file is compiled in-process instead.
+
+Usage:
+    python decafc.py file.decaf
+    python decafc.py --stats
+    python decafc.py --shutdown
+    python decafc.py build SRC_DIR OUT_DIR [-j N] [--link]   (see batch_build.py)
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+
+
+def default_socket_path():
+    """$DECAFD_SOCKET, or a per-user socket in the temp directory."""
+    user = os.getuid() if hasattr(os, "getuid") else os.environ.get("USERNAME", "user")
+    return os.environ.get("DECAFD_SOCKET", os.path.join(tempfile.gettempdir(), f"decafd-{user}.sock"))
+
+
+def request(socket_path, message):
+    """Sends one JSON request and returns the decoded reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(socket_path)
+        conn.sendall(json.dumps(message).encode() + b"\n")
+        with conn.makefile("rb") as replies:
+            return json.loads(replies.readline())
+
+
+def compile_file(path, socket_path):
+    """
+    Compiles one file through the daemon, falling back to an in-process
+    compile when the daemon is not running. Returns the output text.
+    """
+    with open(path, "r") as source_file:
+        source = source_file.read()
+
+    try:
+        reply = request(socket_path, {"op": "compile", "path": os.path.abspath(path), "source": source})
+    except (FileNotFoundError, ConnectionRefusedError):
+        from compiler import compile
+        return compile(source).output
+
+    if "output" not in reply:
+        raise RuntimeError(f"decafd: {reply.get('error', reply)}")
+    return reply["output"]
+
+
+def main():
+    if sys.argv[1:2] == ["build"]:
+        from batch_build import main as build_main
+        build_main(sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(description="Compile a Decaf file through the decafd daemon.")
+    parser.add_argument("file", nargs="?", help="Path to the Decaf (.decaf) source file")
+    parser.add_argument("--socket", default=default_socket_path(), help="decafd socket path")
+    parser.add_argument("--stats", action="store_true", help="print daemon cache statistics")
+    parser.add_argument("--shutdown", action="store_true", help="stop the daemon")
+    args = parser.parse_args()
+
+    if args.stats or args.shutdown:
+        try:
+            reply = request(args.socket, {"op": "stats" if args.stats else "shutdown"})
+        except (FileNotFoundError, ConnectionRefusedError):
+            print(f"Error: no daemon listening on '{args.socket}'.")
+            sys.exit(1)
+        print(json.dumps(reply))
+        return
+    if args.file is None:
+        parser.error("a .decaf file is required")
+    if not os.path.exists(args.file):
+        print(f"Error: File '{args.file}' not found.")
+        sys.exit(1)
+
+    print(compile_file(args.file, args.socket))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# decafd.py
+"""
+decafd - persistent compile daemon.
+
+Keeps the compiler modules imported and serves compile requests over a
+local Unix socket, so a compile costs milliseconds instead of a Python
+start plus imports. Each source path gets an in-memory cache: an
+unchanged file is answered from the stored result, and an edited one is
+re-checked through its IncrementalAnalyzer.
+
+Protocol: one JSON object per line in each direction.
+    {"op": "compile", "path": "/abs/file.decaf", "source": "..."}
+        -> {"ok": true, "output": "...", "phase": "codegen", "cached": false, "elapsed_ms": 1.9}
+    {"op": "stats"}     -> {"files": 3, "requests": 10, "hits": 6}
+    {"op": "shutdown"}  -> {"ok": true}
+
+Usage: python decafd.py [--socket PATH]
+Client: python decafc.py file.decaf
+"""
+import argparse
+import hashlib
+import json
+import os
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import time
+
+from compiler import compile
+from incremental import IncrementalAnalyzer
+from decafc import default_socket_path
+
+
+class FileCache:
+    """What the daemon remembers about one source path."""
+
+    def __init__(self):
+        self.lock = threading.Lock()        # one compile per path at a time
+        self.source_hash = None
+        self.response = None                # last compile response for source_hash
+        self.analyzer = IncrementalAnalyzer()
+
+
+class CompileService:
+    """Request handling, independent of the socket layer."""
+
+    def __init__(self):
+        self._files = {}                    # path -> FileCache
+        self._files_lock = threading.Lock()
+        self.requests = 0
+        self.hits = 0
+
+    def _cache_for(self, path):
+        with self._files_lock:
+            cache = self._files.get(path)
+            if cache is None:
+                cache = self._files[path] = FileCache()
+            return cache
+
+    def handle(self, request):
+        op = request.get("op")
+        if op == "compile":
+            return self.compile(request.get("path") or "<stdin>", request["source"])
+        if op == "stats":
+            return {"files": len(self._files), "requests": self.requests, "hits": self.hits}
+        return {"ok": False, "error": f"unknown op '{op}'"}
+
+    def compile(self, path, source):
+        start = time.perf_counter()
+        source_hash = hashlib.sha256(source.encode()).hexdigest()
+        cache = self._cache_for(path)
+
+        with cache.lock:
+            hit = cache.source_hash == source_hash
+            if hit:
+                response = dict(cache.response, cached=True)
+            else:
+                result = compile(source, analyzer=cache.analyzer)
+                response = {"ok": result.ok, "output": result.output, "phase": result.phase, "cached": False}
+                cache.source_hash, cache.response = source_hash, response
+
+        with self._files_lock:
+            self.requests += 1
+            self.hits += hit
+
+        response["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        return response
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """Reads JSON lines from one client connection until it closes."""
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if request.get("op") == "shutdown":
+                    self._reply({"ok": True})
+                    # shutdown() waits for serve_forever(), so it needs its own thread
+                    threading.Thread(target=self.server.shutdown, daemon=True).start()
+                    return
+                response = self.server.service.handle(request)
+            except Exception as error:
+                response = {"ok": False, "error": f"{type(error).__name__}: {error}"}
+            self._reply(response)
+
+    def _reply(self, response):
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+        self.wfile.flush()
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path):
+        self.service = CompileService()
+        super().__init__(socket_path, RequestHandler)
+
+
+def remove_stale_socket(socket_path):
+    """
+    Removes a socket left behind by a server that is no longer running, so
+    bind() can succeed. Exits with an error if another server still accepts
+    connections on it, or if the path is not a socket at all. Also used by
+    compile_server.py --unix.
+    """
+    try:
+        mode = os.stat(socket_path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        print(f"Error: '{socket_path}' exists and is not a socket.")
+        sys.exit(1)
+
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except ConnectionRefusedError:
+        # Nobody is listening: left over from a run that did not clean up
+        os.unlink(socket_path)
+        return
+    except OSError as error:
+        print(f"Error: cannot check socket '{socket_path}': {error}")
+        sys.exit(1)
+    finally:
+        probe.close()
+    print(f"Error: a server is already listening on '{socket_path}'.")
+    sys.exit(1)
+
+
+def serve(socket_path):
+    remove_stale_socket(socket_path)
+
+    server = DaemonServer(socket_path)
+    print(f"decafd listening on {socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persistent Decaf compile daemon.")
+    parser.add_argument("--socket", default=default_socket_path(), help="Unix socket path to listen on")
+    args = parser.parse_args()
+    serve(args.socket)
+
+
+if __name__ == "__main__":
+    main()
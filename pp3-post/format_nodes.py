@@ -1,4 +1,5 @@
 from helper_functions import add_line, insert_label_into_first_line
+from ast_visitor import make_dispatcher
 
 def format_ast_string(ast_dict):
     #print(ast_dict)
@@ -10,51 +11,8 @@ def format_ast_string(ast_dict):
     return "\n".join(lines) 
 
 def format_node(node, level):
-    if "Program" in node:
-        return format_program(node["Program"], level)
-    if "FnDecl" in node:
-        return format_function_declaration(node["FnDecl"], level)
-    if "VarDecl" in node:
-        return format_var_decl(node["VarDecl"], level)
-    if "StmtBlock" in node:
-        return format_statement_block(node["StmtBlock"], level)
-    if "AssignExpr" in node:
-        return format_assign_expr(node["AssignExpr"], level)
-    if "ReturnStmt" in node:
-        return format_return_statement(node["ReturnStmt"], level)
-    if "ArithmeticExpr" in node:
-        return format_arithmetic_expr(node["ArithmeticExpr"], level)
-    if "FieldAccess" in node:
-        return format_field_access(node["FieldAccess"], level)
-    if "Call" in node:
-        return format_call(node["Call"], level)
-    if "PrintStmt" in node:
-        return format_print_statement(node["PrintStmt"], level)
-    if "StringConstant" in node:
-        return format_string_constant(node["StringConstant"], level)
-    if "IntConstant" in node:
-        return format_int_constant(node["IntConstant"], level)
-    if "DoubleConstant" in node:
-        return format_double_constant(node["DoubleConstant"], level)
-    if "BoolConstant" in node:
-        return format_bool_constant(node["BoolConstant"], level)
-    if "ReadIntegerExpr" in node:
-        return format_read_integer_expr(node["ReadIntegerExpr"], level)
-    if "LogicalExpr" in node:
-        return format_logical_expr(node["LogicalExpr"], level)
-    if "EqualityExpr" in node:
-        return format_equality_expr(node["EqualityExpr"], level)
-    if "RelationalExpr" in node:
-        return format_relational_expr(node["RelationalExpr"], level)
-    if "WhileStmt" in node:
-        return format_while_statement(node["WhileStmt"], level)
-    if "IfStmt" in node:
-        return format_if_statement(node["IfStmt"], level)
-    if "ForStmt" in node:
-        return format_for_statement(node["ForStmt"], level)
-    if "BreakStmt" in node:
-        return format_break_statement(node["BreakStmt"], level)
-    return []
+    """Formats any AST node by dispatching on its kind (see FORMAT_HANDLERS)."""
+    return _dispatch_format(node, level)
 
 def format_program(program_list, level):
     lines = []
@@ -214,8 +172,9 @@ def format_call(call, level, line_num=None, suppress_header=False):
                 add_line(lines, line_num, level + 1, f"(actuals) {node_type}:")
                 lines.extend(format_call(arg[node_type], level + 2, suppress_header=True))
             else:
-                add_line(lines, line_num, level + 1, f"(actuals) {node_type}:")
-                lines.extend(format_node(arg[node_type], level + 2))
+                arg_lines = format_node(arg, level + 1)
+                insert_label_into_first_line(arg_lines, "(actuals)", level + 1)
+                lines.extend(arg_lines)
     return lines
 
 def format_int_constant(node, level):
@@ -254,6 +213,12 @@ def format_read_integer_expr(node, level):
     add_line(lines, line_num, level, "ReadIntegerExpr:")
     return lines
 
+def format_read_line_expr(node, level):
+    lines = []
+    line_num = node.get("line_num", "")
+    add_line(lines, line_num, level, "ReadLineExpr:")
+    return lines
+
 def format_logical_expr(node, level, label=True):
     lines = []
     line_num = node.get("line_num", "")
@@ -372,3 +337,36 @@ def format_break_statement(node, level):
     line_num = node.get("line_num", "")
     add_line(lines, line_num, level, "BreakStmt:")
     return lines
+
+def format_empty(node, level):
+    # Empty for-loop clauses and bare returns print nothing of their own
+    return []
+
+FORMAT_HANDLERS = {
+    "Program": format_program,
+    "FnDecl": format_function_declaration,
+    "VarDecl": format_var_decl,
+    "StmtBlock": format_statement_block,
+    "AssignExpr": format_assign_expr,
+    "ReturnStmt": format_return_statement,
+    "ArithmeticExpr": format_arithmetic_expr,
+    "FieldAccess": format_field_access,
+    "Call": format_call,
+    "PrintStmt": format_print_statement,
+    "StringConstant": format_string_constant,
+    "IntConstant": format_int_constant,
+    "DoubleConstant": format_double_constant,
+    "BoolConstant": format_bool_constant,
+    "ReadIntegerExpr": format_read_integer_expr,
+    "ReadLine": format_read_line_expr,
+    "LogicalExpr": format_logical_expr,
+    "EqualityExpr": format_equality_expr,
+    "RelationalExpr": format_relational_expr,
+    "WhileStmt": format_while_statement,
+    "IfStmt": format_if_statement,
+    "ForStmt": format_for_statement,
+    "BreakStmt": format_break_statement,
+    "Empty": format_empty,
+}
+
+_dispatch_format = make_dispatcher("format_nodes", FORMAT_HANDLERS)
@@ -1,3 +1,5 @@
+from ast_visitor import node_kind, describe_node
+
 def make_pointer_line(start_col, end_col, underline=False):
     """Generate a line of spaces and carets under the offending column range."""
     if underline:
@@ -162,54 +164,6 @@ def insert_label_into_first_line(lines, label, base_level):
 
 # Semantic Analysis Helper Functions
 
-def initialize_scope_system():
-    """
-    Resets the scope system and initializes the global scope.
-    """
-    global scope_stack, scope_names
-    scope_stack = [{}]
-    scope_names = ["global"]
-
-def push_scope(scope_label):
-    """
-    Pushes a new scope onto the stack.
-    Returns the current label for convenience.
-    """
-    scope_stack.append({})
-    scope_names.append(scope_label)
-    return scope_label
-
-def pop_scope():
-    """
-    Pops the current scope from the stack.
-    """
-    if scope_stack:
-        scope_stack.pop()
-        scope_names.pop()
-
-def declare(scope_label, name, entry):
-    """
-    Adds a name to the current scope dictionary.
-    """
-    current_scope = scope_stack[-1]
-    current_scope[name] = entry
-
-def is_declared_in_scope(scope_label, name):
-    """
-    Checks only the top (current) scope for the given name.
-    """
-    return name in scope_stack[-1]
-
-def lookup(name):
-    """
-    Searches all scopes from innermost to outermost.
-    Returns the first match found, or None.
-    """
-    for scope in reversed(scope_stack):
-        if name in scope:
-            return scope[name]
-    return None
-
 def semantic_error(tokens, token, message, underline=False):
     """
     Formats a semantic error message with line number and caret pointer.
@@ -295,18 +249,15 @@ def get_print_function_for_type(var_type):
     }
     return type_map.get(var_type, "_PrintInt")  # fallback to _PrintInt
 
-def get_var_type(field_access, context):
+def get_annotated_type(expr):
     """
-    Given a FieldAccess node and context, return the variable's declared type.
+    Returns the type the semantic analyzer recorded on an expression node
+    (payload["expr_type"]).
     """
-    var_name = field_access["identifier"]
-    var_types = context.get("var_types", {})
-
-    var_type = var_types.get(var_name)
-    if var_type is None:
-        raise KeyError(f"Type for variable '{var_name}' not found in var_types")
-
-    return var_type
+    _, payload = node_kind(expr)
+    if isinstance(payload, dict) and "expr_type" in payload:
+        return payload["expr_type"]
+    raise KeyError(f"No analyzer type recorded on {describe_node(expr)} node")
 
 def format_relop_comment(tmp_name, left_var, operator, right_var):
     """
@@ -341,17 +292,23 @@ def allocate_label(context):
     context["label_counter"] += 2
     return label_true, label_false
 
-def emit_store(var_name, from_reg, context, lines):
+def variable_location(field_access):
+    """
+    Returns (offset, is_global) for a FieldAccess or VarDecl payload, from the
+    Symbol binding.py attached to it. Globals are addressed from $gp, formals
+    and locals from $fp.
+    """
+    symbol = field_access["symbol"]
+    return symbol.offset, symbol.is_global
+
+def emit_store(field_access, from_reg, lines):
     """
     Emits a store instruction for a variable (global or local), handling $gp and $fp properly.
     """
-    if var_name in context.get("globals", set()):
-        # Global: use recorded offset from $gp
-        gp_offset = context["global_locations"].get(var_name, 0)
-        comment_offset = f"+{gp_offset}" if gp_offset >= 0 else f"{gp_offset}"
-        lines.append(f"\t  sw {from_reg}, {gp_offset}($gp)\t# spill {var_name} from {from_reg} to $gp{comment_offset}")
+    symbol = field_access["symbol"]
+    offset = symbol.offset
+    comment_offset = f"+{offset}" if offset >= 0 else f"{offset}"
+    if symbol.is_global:
+        lines.append(f"\t  sw {from_reg}, {offset}($gp)\t# spill {symbol.name} from {from_reg} to $gp{comment_offset}")
     else:
-        # Local: use frame pointer offset
-        fp_offset = context["var_locations"].get(var_name, -4)
-        comment_offset = f"+{fp_offset}" if fp_offset >= 0 else f"{fp_offset}"
-        lines.append(f"\t  sw {from_reg}, {fp_offset}($fp)\t# spill {var_name} from {from_reg} to $fp{comment_offset}")
+        lines.append(f"\t  sw {from_reg}, {offset}($fp)\t# spill {symbol.name} from {from_reg} to $fp{comment_offset}")
@@ -0,0 +1,269 @@
+# incremental.py
+"""
+Incremental semantic analysis.
+
+check_semantics() checks every function body on every call. An
+IncrementalAnalyzer keeps, for each function it has checked, the
+diagnostics it produced and the global declarations it depended on
+(globals it read, callees whose signatures it checked, and names that
+did not resolve). On the next call a function is only checked again if
+its own tokens changed or one of those dependencies changed signature;
+everything else reuses its cached diagnostics, and its FnDecl in the new
+AST is replaced by the annotated subtree cached from the earlier check.
+Identical tokens parse to an identical subtree, so nothing in a reused
+function is walked again.
+"""
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+
+from helper_functions import get_declared_type
+from semantic_analyzer import (
+    make_semantic_context,
+    declare_globals,
+    check_function_declaration,
+)
+
+
+# Tokens compared per slice while looking for the changed region
+CHUNK = 4096
+
+
+class FunctionRecord:
+    """Cached result of checking one function body."""
+
+    __slots__ = ("errors", "dependencies", "fn_decl")
+
+    def __init__(self, errors, dependencies, fn_decl):
+        self.errors = errors                # diagnostics, in source order
+        self.dependencies = dependencies    # global name -> signature when checked
+        self.fn_decl = fn_decl              # the checked FnDecl, expr_type annotations and all
+
+
+class Fingerprint:
+    """
+    A function's token slice, hashed once. Plain tuples recompute their
+    hash on every dict operation, which would cost a full pass over the
+    file's tokens each time the cache is consulted.
+    """
+
+    __slots__ = ("tokens", "_hash")
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self._hash = hash(tokens)
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        return self._hash == other._hash and self.tokens == other.tokens
+
+
+def declaration_signature(entry):
+    """
+    The part of a global declaration other functions can observe:
+    a function's return and formal types, a variable's type, or None
+    when the name is not declared.
+    """
+    if entry is None:
+        return None
+    if isinstance(entry, dict) and "formals" in entry:
+        formal_types = tuple(get_declared_type(formal["VarDecl"]) for formal in entry["formals"])
+        return ("function", get_declared_type(entry), formal_types)
+    return ("variable", get_declared_type(entry))
+
+
+def function_spans(declarations, token_lines):
+    """
+    Yields (index, low, high) for every function in source order: its
+    position in the declaration list and its token slice tokens[low:high],
+    from the function's first line up to the line where the next
+    declaration starts. Tokens carry their line numbers, so the diagnostics
+    cached under a slice stay valid for exactly as long as the slice matches.
+    """
+    last_line = token_lines[-1] if token_lines else 0
+    for index, decl in enumerate(declarations):
+        if "FnDecl" not in decl:
+            continue
+        if index + 1 < len(declarations):
+            end_line = next(iter(declarations[index + 1].values()))["line_num"]
+        else:
+            end_line = last_line
+        low = bisect_left(token_lines, decl["FnDecl"]["line_num"])
+        high = bisect_right(token_lines, end_line)
+        yield index, low, high
+
+
+def common_prefix_length(old, new):
+    """Number of leading tokens old and new share, compared a chunk at a time."""
+    limit = min(len(old), len(new))
+    low = 0
+    while low < limit:
+        high = min(limit, low + CHUNK)
+        if old[low:high] != new[low:high]:
+            break
+        low = high
+    while low < limit and old[low] == new[low]:
+        low += 1
+    return low
+
+
+def common_suffix_length(old, new, limit):
+    """Number of trailing tokens old and new share, at most limit."""
+    old_end, new_end = len(old), len(new)
+    count = 0
+    while count < limit:
+        step = min(limit, count + CHUNK) - count
+        if old[old_end - count - step:old_end - count] != new[new_end - count - step:new_end - count]:
+            break
+        count += step
+    while count < limit and old[old_end - count - 1] == new[new_end - count - 1]:
+        count += 1
+    return count
+
+
+class IncrementalAnalyzer:
+    """
+    Semantic checker that remembers per-function results between calls.
+    Use one instance per source file; check() returns the same error list
+    check_semantics() would. Reused functions share their FnDecl subtree
+    with the AST of the earlier call, so check one version of a file at a
+    time (decafd holds a per-path lock) and do not hold on to old ASTs.
+
+    Each call compares the new tokens with the previous call's to find the
+    changed region: everything between their common prefix and common
+    suffix. A function outside it reuses its record without its tokens
+    being hashed. When the region lies inside one function body, so every
+    global declaration is unchanged, the previous global scope and its
+    diagnostics are reused and declare_globals() is skipped.
+
+    Limits: tokens carry their line numbers, so an edit that adds or
+    removes lines changes every token after it. Unless it is in the last
+    declaration, such an edit declares the globals again and fingerprints
+    every function below it, as a check without a cache would. Finding the
+    prefix and suffix always reads the whole token list.
+    """
+
+    def __init__(self):
+        self._records = {}      # fingerprint -> FunctionRecord
+        self._spans = {}        # (low, high) of the last call -> (fingerprint, FunctionRecord)
+        self._tokens = None     # tokens of the last call
+        self._globals = None    # (SymbolTable, declaration errors, declaration count) of the last call
+        self.checked = 0        # functions checked by the last call
+        self.reused = 0         # functions served from the cache by the last call
+        self.globals_reused = False     # whether the last call skipped declare_globals()
+
+    def check(self, ast_root, tokens):
+        declarations = ast_root["Program"]
+        token_lines = list(map(itemgetter(1), tokens))
+        spans = list(function_spans(declarations, token_lines))
+
+        old_tokens = self._tokens if self._tokens is not None else []
+        prefix = common_prefix_length(old_tokens, tokens)
+        suffix = common_suffix_length(old_tokens, tokens, min(len(old_tokens), len(tokens)) - prefix)
+        shift = len(tokens) - len(old_tokens)
+        changed_end = len(tokens) - suffix      # new tokens[prefix:changed_end] differ
+
+        # The cached table is checked against again below; drop it until
+        # this call finishes in case the check raises half way
+        cached_globals, self._globals = self._globals, None
+        self.globals_reused = self._globals_unchanged(cached_globals, declarations, spans, tokens,
+                                                      token_lines, prefix, changed_end)
+        if self.globals_reused:
+            symbols, global_errors, _ = cached_globals
+            context = make_semantic_context(tokens, symbols)
+            context["errors"].extend(global_errors)
+        else:
+            context = make_semantic_context(tokens)
+            declare_globals(ast_root, context)
+        errors = context["errors"]
+        symbols = context["symbols"]
+        global_errors = list(errors)
+
+        signatures = {}
+
+        def signature_of(name):
+            if name not in signatures:
+                signatures[name] = declaration_signature(symbols.lookup(name))
+            return signatures[name]
+
+        records, new_spans = {}, {}
+        self.checked = self.reused = 0
+        for index, low, high in spans:
+            decl = declarations[index]
+            if high <= prefix:
+                cached = self._spans.get((low, high))
+            elif low >= changed_end:
+                cached = self._spans.get((low - shift, high - shift))
+            else:
+                cached = None
+            fingerprint, record = cached if cached is not None else (None, None)
+            if fingerprint is None:
+                fingerprint = Fingerprint(tuple(tokens[low:high]))
+                record = self._records.get(fingerprint)
+            if record is not None and all(
+                signature_of(name) == signature
+                for name, signature in record.dependencies.items()
+            ):
+                # Same tokens, same subtree: take the annotated one as it is
+                decl["FnDecl"] = record.fn_decl
+                self.reused += 1
+            else:
+                record = self._check_function(decl["FnDecl"], context, signature_of)
+                self.checked += 1
+            records[fingerprint] = record
+            new_spans[(low, high)] = (fingerprint, record)
+            errors.extend(record.errors)
+
+        # Only keep what the current version of the file can reuse
+        self._records = records
+        self._spans = new_spans
+        self._tokens = tokens
+        self._globals = (symbols, global_errors, len(declarations))
+        return errors
+
+    def _globals_unchanged(self, cached_globals, declarations, spans, tokens, token_lines, prefix, changed_end):
+        """
+        Whether the changed region, in both the old and new tokens, lies
+        between one function's opening brace and the first token on the
+        line of the declaration after it. Every declaration before that
+        function, its header, and every declaration after it are then
+        token for token what the last call declared.
+        """
+        if cached_globals is None or cached_globals[2] != len(declarations):
+            return False
+        if prefix == changed_end == len(tokens) == len(self._tokens):
+            return True
+        for index, low, high in spans:
+            if low >= prefix:
+                return False
+            brace = next((position for position in range(low, high) if tokens[position][0] == "{"), None)
+            if brace is None or brace >= prefix:
+                continue
+            if index + 1 < len(declarations):
+                next_line = next(iter(declarations[index + 1].values()))["line_num"]
+                next_start = bisect_left(token_lines, next_line)
+            else:
+                next_start = len(tokens)
+            # The next declaration is then in the common suffix, at
+            # next_start - shift in the old tokens, past the old region too
+            if changed_end <= next_start:
+                return True
+        return False
+
+    def _check_function(self, fn_decl, context, signature_of):
+        """Checks one body, recording its diagnostics and global reads."""
+        symbols = context["symbols"]
+        program_errors = context["errors"]
+        context["errors"] = []
+        symbols.global_reads = set()
+        try:
+            check_function_declaration(fn_decl, context)
+            reads = symbols.global_reads
+        finally:
+            symbols.global_reads = None
+            function_errors = context["errors"]
+            context["errors"] = program_errors
+
+        dependencies = {name: signature_of(name) for name in reads}
+        return FunctionRecord(function_errors, dependencies, fn_decl)
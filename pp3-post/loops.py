@@ -0,0 +1,211 @@
+# loops.py
+"""
+Natural loops and loop-invariant code motion over TAC.
+
+A back edge is an edge whose target, the loop header, dominates its source
+(dataflow.Dominators). The loop of a header is the header plus every block
+that reaches one of its back edges without passing through the header.
+
+hoist_invariants() moves computations whose value cannot change while a
+loop runs into its preheader: code put right before the header's label,
+run once each time the loop is entered. lowering.py emits loops inverted
+(guard, body, test at the bottom), so the body runs whenever the preheader
+does. An operand is invariant when it is a constant, when all its reaching
+definitions (dataflow.ReachingDefinitions) are outside the loop, or when
+its one reaching definition is an instruction already chosen for
+hoisting. A copy, string load or BinOp with invariant operands is hoisted
+when also:
+  - its destination is a temp or local, assigned nowhere else in the loop
+    and not live on entry to the header, so every read in the loop sees it;
+  - it cannot trap (a division by anything but a nonzero constant); and
+  - its block dominates every exit of the loop, or its destination is
+    dead wherever the loop exits to.
+A global the loop reads but never assigns, and that no call in the loop
+can assign, is loaded into a temp once in the preheader instead.
+
+Innermost loops go first, and the analysis is redone after each loop that
+changed, so code hoisted into an inner loop's preheader can move further
+out of the outer loop.
+"""
+from binding import Symbol
+from cfg import build_cfg
+from dataflow import Dominators, Liveness, ReachingDefinitions
+from dead_code import may_trap
+from tac import Temp, Assign, BinOp, LoadString, Goto, IfZ, PushParam, LCall, Return
+
+
+def is_global(operand):
+    return isinstance(operand, Symbol) and operand.is_global
+
+
+class Loop:
+    """A natural loop: header block and the set of its blocks' indices."""
+
+    __slots__ = ("header", "blocks")
+
+    def __init__(self, header, blocks):
+        self.header = header
+        self.blocks = blocks
+
+    def exits(self, cfg):
+        """(block inside, successor outside) for each edge leaving the loop."""
+        return [(block, succ) for block in cfg.blocks if block.index in self.blocks
+                for succ in block.succs if succ.index not in self.blocks]
+
+    def __repr__(self):
+        return f"Loop({self.header!r}, {sorted(self.blocks)})"
+
+
+def find_loops(cfg, dominators=None):
+    """Natural loops of cfg, innermost (smallest) first."""
+    dominators = dominators if dominators is not None else Dominators(cfg)
+    bodies = {}
+    for block in cfg.reverse_postorder():
+        for succ in block.succs:
+            if dominators.dominates(succ, block):
+                body = bodies.setdefault(succ.index, {succ.index})
+                stack = [block]
+                while stack:
+                    member = stack.pop()
+                    if member.index not in body:
+                        body.add(member.index)
+                        stack.extend(member.preds)
+    loops = [Loop(cfg.blocks[header], body) for header, body in bodies.items()]
+    loops.sort(key=lambda loop: len(loop.blocks))
+    return loops
+
+
+def temp_factory(function):
+    """A function returning a new Temp, numbered past every temp function uses, per call."""
+    next_id = [max((temp.id for temp in function.temps()), default=-1) + 1]
+
+    def new_temp():
+        temp = Temp(next_id[0])
+        next_id[0] += 1
+        return temp
+    return new_temp
+
+
+def preheader_position(cfg, loop):
+    """
+    Index of the block the preheader code goes in front of (the header),
+    or None when the loop is entered other than by falling into the header.
+    """
+    header = loop.header
+    outside = [pred for pred in header.preds if pred.index not in loop.blocks]
+    if header is cfg.entry:
+        return header.index if not outside else None
+    before = cfg.blocks[header.index - 1]
+    if before.index in loop.blocks or any(pred is not before for pred in outside):
+        return None
+    last = before.terminator
+    if isinstance(last, (Goto, IfZ)) and last.label == header.label:
+        return None
+    return header.index
+
+
+def hoist_invariants(function):
+    """Hoists loop-invariant code into loop preheaders. Returns the number of instructions moved."""
+    new_temp = temp_factory(function)
+    moved = 0
+    done = set()        # headers already handled, by label
+    while True:
+        cfg = build_cfg(function)
+        dominators = Dominators(cfg)
+        for loop in find_loops(cfg, dominators):
+            if loop.header.label in done:
+                continue
+            done.add(loop.header.label)
+            hoisted = hoist_loop(cfg, loop, dominators, new_temp)
+            if hoisted:
+                function.code = cfg.linearize()
+                moved += hoisted
+                break
+        else:
+            return moved
+
+
+def hoist_loop(cfg, loop, dominators, new_temp):
+    """Moves the loop's invariant code into a preheader in cfg's blocks. Returns the count moved."""
+    position = preheader_position(cfg, loop)
+    if position is None:
+        return 0
+    reaching = ReachingDefinitions(cfg)
+    liveness = Liveness(cfg)
+    bits = liveness.index.bits
+    members = [block for block in cfg.blocks if block.index in loop.blocks]
+    before = {block.index: reaching.reaching_before(block) for block in members}
+    exits = loop.exits(cfg)
+
+    assigned = {}       # variable -> definition sites inside the loop
+    for block_index, site_position, variable in reaching.sites:
+        if block_index in loop.blocks:
+            assigned[variable] = assigned.get(variable, 0) + 1
+
+    chosen = {}         # (block index, position) -> instr, in hoisting order
+
+    def invariant(operand, block, index):
+        if isinstance(operand, int):
+            return True
+        sites = reaching.definitions(before[block.index][index], operand)
+        if all(site[0] not in loop.blocks for site in sites):
+            return True
+        return len(sites) == 1 and sites[0][:2] in chosen
+
+    def live(variable, bitset):
+        return variable in bits and bitset >> bits[variable] & 1
+
+    def hoistable(instr, block, index):
+        if not isinstance(instr, (Assign, BinOp, LoadString)) or may_trap(instr):
+            return False
+        dst = instr.dst
+        if is_global(dst) or assigned.get(dst) != 1 or live(dst, liveness.live_in[loop.header.index]):
+            return False
+        if not all(invariant(operand, block, index) for operand in instr.uses()):
+            return False
+        return (all(dominators.dominates(block, source) for source, _ in exits)
+                or not any(live(dst, liveness.live_in.get(target.index, 0)) for _, target in exits))
+
+    changed = True
+    while changed:
+        changed = False
+        for block in members:
+            for index, instr in enumerate(block.instrs):
+                if (block.index, index) not in chosen and hoistable(instr, block, index):
+                    chosen[(block.index, index)] = instr
+                    changed = True
+
+    preheader = list(chosen.values())
+    for block in members:
+        block.instrs = [instr for index, instr in enumerate(block.instrs) if (block.index, index) not in chosen]
+
+    # Globals read in the loop that nothing in it can change
+    calls = any(isinstance(instr, LCall) for block in members for instr in block.instrs)
+    loaded = {}
+    if not calls:
+        for block in members:
+            for instr in block.instrs:
+                for operand in instr.uses():
+                    if is_global(operand) and operand not in assigned and operand not in loaded:
+                        loaded[operand] = new_temp()
+                        preheader.append(Assign(loaded[operand], operand))
+                replace_operands(instr, loaded)
+
+    # Preheader code runs before the header's label, not as part of the loop
+    cfg.blocks[position].instrs[:0] = preheader
+    return len(chosen) + len(loaded)
+
+
+def replace_operands(instr, replacements):
+    """Rewrites instr's operands through replacements ({old: new}) in place."""
+    if isinstance(instr, Assign):
+        instr.src = replacements.get(instr.src, instr.src)
+    elif isinstance(instr, BinOp):
+        instr.left = replacements.get(instr.left, instr.left)
+        instr.right = replacements.get(instr.right, instr.right)
+    elif isinstance(instr, IfZ):
+        instr.cond = replacements.get(instr.cond, instr.cond)
+    elif isinstance(instr, PushParam):
+        instr.arg = replacements.get(instr.arg, instr.arg)
+    elif isinstance(instr, Return) and instr.value is not None:
+        instr.value = replacements.get(instr.value, instr.value)
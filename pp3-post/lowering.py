@@ -0,0 +1,420 @@
+# lowering.py
+"""
+Lowers the bound, type-annotated AST to three-address code (tac.py).
+
+Runs after semantic analysis and binding.py: variables are addressed
+through the Symbol on each FieldAccess, and the analyzer's expr_type
+annotations pick the print routine, string vs integer equality and
+integer vs float arithmetic. Expressions nest freely; each one lowers to
+an operand (a Temp, a Symbol or an int constant).
+"""
+import struct
+
+from ast_visitor import make_dispatcher, node_kind
+from binding import Symbol
+from helper_functions import get_annotated_type, get_print_function_for_type
+from tac import wrap32, Temp, Assign, LoadString, BinOp, Label, Goto, IfZ, PushParam, PopParams, LCall, Return, TacFunction
+
+WORD_SIZE = 4
+# Operator whose result is the negation of each integer comparison's
+NEGATED_COMPARISONS = {"<": ">=", "<=": ">", ">": "<=", ">=": "<", "==": "!=", "!=": "=="}
+
+
+def lower_program(ast_root, counters=None):
+    """
+    Returns one TacFunction per FnDecl, in source order. Temp and label
+    numbers are unique across the program. If counters is a dict, the
+    number of temps and labels allocated is stored in it.
+    """
+    context = {"temp_counter": 0, "label_counter": 0}
+    functions = [lower_function(decl["FnDecl"], context)
+                 for decl in ast_root["Program"] if "FnDecl" in decl]
+
+    if counters is not None:
+        counters["temps"] = context["temp_counter"]
+        counters["labels"] = context["label_counter"]
+    return functions
+
+
+def function_label(name):
+    return "main" if name == "main" else f"_{name}"
+
+
+def lower_function(fn_decl, program_context):
+    name = fn_decl["identifier"]["Identifier"]["name"]
+    formals = [formal["VarDecl"]["symbol"] for formal in fn_decl["formals"]]
+    function = TacFunction(name, function_label(name), formals, fn_decl["local_slots"])
+
+    # Counters are shared with the rest of the program; per-function state
+    # lives alongside them for the duration of this function
+    context = program_context
+    context["code"] = function.code
+    context["break_label"] = None
+
+    body = fn_decl.get("body", {})
+    for stmt in body.get("StmtBlock", []):
+        lower_statement(stmt, context)
+
+    del context["code"], context["break_label"]
+    return function
+
+
+def new_temp(context):
+    temp = Temp(context["temp_counter"])
+    context["temp_counter"] += 1
+    return temp
+
+
+def new_label(context):
+    label = f"_L{context['label_counter']}"
+    context["label_counter"] += 1
+    return label
+
+
+def emit(context, instr):
+    context["code"].append(instr)
+
+
+# --- Statements ---
+
+def lower_statement(stmt, context):
+    _dispatch_statement(stmt, context)
+
+
+def lower_block(stmt_list, context):
+    for stmt in stmt_list:
+        lower_statement(stmt, context)
+
+
+def lower_vardecl(var_decl, context):
+    """Locals already have frame slots (binding.py); nothing to emit."""
+
+
+def lower_assign(assign, context):
+    target = assign["target"]["FieldAccess"]["symbol"]
+    value = lower_expression(assign["value"], context)
+    emit(context, Assign(target, value))
+    return target
+
+
+def lower_print(print_stmt, context):
+    for arg in print_stmt["args"]:
+        value = lower_expression(arg, context)
+        emit(context, PushParam(value))
+        emit(context, LCall(get_print_function_for_type(get_annotated_type(arg))))
+        emit(context, PopParams(WORD_SIZE))
+
+
+def lower_return(return_stmt, context):
+    expr = return_stmt["expr"]
+    if "Empty" in expr:
+        emit(context, Return())
+    else:
+        emit(context, Return(lower_expression(expr, context)))
+
+
+def lower_condition(test, false_label, context):
+    """
+    Branches to false_label when test is false and falls through when it
+    is true. && and || short-circuit straight to the targets, and ! swaps
+    them, so no 0/1 value is built for them.
+    """
+    kind, payload = node_kind(test)
+    if kind == "LogicalExpr" and payload["operator"] == "&&":
+        lower_condition(payload["left"], false_label, context)
+        lower_condition(payload["right"], false_label, context)
+    elif kind == "LogicalExpr" and payload["operator"] == "||":
+        true_label = new_label(context)
+        lower_true_condition(payload["left"], true_label, context)
+        lower_condition(payload["right"], false_label, context)
+        emit(context, Label(true_label))
+    elif kind == "LogicalExpr":
+        lower_true_condition(payload["right"], false_label, context)
+    elif kind == "BoolConstant":
+        if payload["value"] != "true":
+            emit(context, Goto(false_label))
+    else:
+        emit(context, IfZ(lower_expression(test, context), false_label))
+
+
+def lower_true_condition(test, true_label, context):
+    """Branches to true_label when test is true and falls through when it is false."""
+    kind, payload = node_kind(test)
+    if kind == "LogicalExpr" and payload["operator"] == "&&":
+        false_label = new_label(context)
+        lower_condition(payload["left"], false_label, context)
+        lower_true_condition(payload["right"], true_label, context)
+        emit(context, Label(false_label))
+    elif kind == "LogicalExpr" and payload["operator"] == "||":
+        lower_true_condition(payload["left"], true_label, context)
+        lower_true_condition(payload["right"], true_label, context)
+    elif kind == "LogicalExpr":
+        lower_condition(payload["right"], true_label, context)
+    elif kind == "BoolConstant":
+        if payload["value"] == "true":
+            emit(context, Goto(true_label))
+    elif kind in ("RelationalExpr", "EqualityExpr") and get_annotated_type(payload["left"]) in ("int", "bool"):
+        # a < b is true exactly when a >= b is zero (not so for floats: NaN)
+        emit(context, IfZ(lower_binary(payload, NEGATED_COMPARISONS[payload["operator"]], context), true_label))
+    else:
+        negated = new_temp(context)
+        emit(context, BinOp(negated, "==", lower_expression(test, context), 0))
+        emit(context, IfZ(negated, true_label))
+
+
+def lower_if(if_node, context):
+    else_label = new_label(context)
+    lower_condition(if_node["test"], else_label, context)
+    lower_statement(if_node["then"], context)
+
+    if if_node.get("else"):
+        end_label = new_label(context)
+        emit(context, Goto(end_label))
+        emit(context, Label(else_label))
+        lower_statement(if_node["else"], context)
+        emit(context, Label(end_label))
+    else:
+        emit(context, Label(else_label))
+
+
+def lower_loop(test, body, step, context):
+    """
+    Shared shape of while and for loops, inverted: a guard skips the loop
+    when the test fails up front, and the test at the bottom branches back
+    to the top while it holds, so each iteration takes one branch instead
+    of a test and a jump back. The step (if any) runs before the bottom
+    test; break jumps past the loop.
+    """
+    top_label = new_label(context)
+    end_label = new_label(context)
+    has_test = test is not None and "Empty" not in test
+
+    if has_test:
+        lower_condition(test, end_label, context)
+    emit(context, Label(top_label))
+
+    outer_break, context["break_label"] = context["break_label"], end_label
+    lower_statement(body, context)
+    context["break_label"] = outer_break
+
+    if step is not None and "Empty" not in step:
+        lower_statement(step, context)
+    if has_test:
+        lower_true_condition(test, top_label, context)
+    else:
+        emit(context, Goto(top_label))
+    emit(context, Label(end_label))
+
+
+def lower_while(while_node, context):
+    lower_loop(while_node["test"], while_node["body"], None, context)
+
+
+def lower_for(for_node, context):
+    init = for_node.get("init")
+    if init is not None and "Empty" not in init:
+        lower_statement(init, context)
+    lower_loop(for_node.get("test"), for_node["body"], for_node.get("step"), context)
+
+
+def lower_break(break_stmt, context):
+    if context["break_label"] is None:
+        raise ValueError(f"'break' outside a loop on line {break_stmt['line_num']}")
+    emit(context, Goto(context["break_label"]))
+
+
+# --- Expressions ---
+
+def lower_expression(expr, context):
+    """Lowers an expression and returns the operand holding its value."""
+    return _dispatch_expression(expr, context)
+
+
+def contains_call(expr):
+    """True if evaluating expr may run a function (and so change globals)."""
+    kind, payload = node_kind(expr)
+    if kind in ("Call", "ReadIntegerExpr", "ReadLine"):
+        return True
+    if kind in ("ArithmeticExpr", "RelationalExpr", "EqualityExpr", "LogicalExpr"):
+        return (payload.get("left") is not None and contains_call(payload["left"])) or contains_call(payload["right"])
+    if kind == "AssignExpr":
+        return contains_call(payload["value"])
+    return False
+
+
+def stable_operand(operand, later_exprs, context):
+    """
+    A global read now must not observe writes made by calls evaluated
+    after it; copy it to a temp when any later expression contains a call.
+    """
+    if isinstance(operand, Symbol) and operand.is_global and any(contains_call(e) for e in later_exprs):
+        temp = new_temp(context)
+        emit(context, Assign(temp, operand))
+        return temp
+    return operand
+
+
+def int_constant_value(lexeme):
+    if lexeme[:2] in ("0x", "0X"):
+        return wrap32(int(lexeme, 16))
+    return wrap32(int(lexeme))
+
+
+def lower_int_constant(node, context):
+    return int_constant_value(node["value"])
+
+
+def lower_bool_constant(node, context):
+    return 1 if node["value"] == "true" else 0
+
+
+def lower_double_constant(node, context):
+    """Doubles are carried as the bits of a single-precision float."""
+    return struct.unpack("<i", struct.pack("<f", float(node["value"])))[0]
+
+
+def lower_string_constant(node, context):
+    temp = new_temp(context)
+    emit(context, LoadString(temp, node["value"]))
+    return temp
+
+
+def lower_field_access(node, context):
+    return node["symbol"]
+
+
+def lower_binary(node, op, context):
+    left = lower_expression(node["left"], context)
+    left = stable_operand(left, [node["right"]], context)
+    right = lower_expression(node["right"], context)
+    temp = new_temp(context)
+    emit(context, BinOp(temp, op, left, right))
+    return temp
+
+
+def lower_arithmetic(node, context):
+    op = node["operator"]
+    if get_annotated_type(node["left"]) == "double":
+        op = "f" + op
+    return lower_binary(node, op, context)
+
+
+def lower_relational(node, context):
+    op = node["operator"]
+    if get_annotated_type(node["left"]) == "double":
+        op = "f" + op
+    return lower_binary(node, op, context)
+
+
+def lower_equality(node, context):
+    left_type = get_annotated_type(node["left"])
+    if left_type == "string":
+        return lower_string_equality(node, context)
+    op = node["operator"]
+    if left_type == "double":
+        op = "f" + op
+    return lower_binary(node, op, context)
+
+
+def lower_string_equality(node, context):
+    left = lower_expression(node["left"], context)
+    left = stable_operand(left, [node["right"]], context)
+    right = lower_expression(node["right"], context)
+
+    equal = new_temp(context)
+    emit(context, PushParam(right))
+    emit(context, PushParam(left))
+    emit(context, LCall("_StringEqual", equal))
+    emit(context, PopParams(2 * WORD_SIZE))
+    if node["operator"] == "==":
+        return equal
+
+    temp = new_temp(context)
+    emit(context, BinOp(temp, "==", equal, 0))
+    return temp
+
+
+def lower_logical(node, context):
+    """
+    !x is x == 0. a && b and a || b evaluate b only when a does not decide
+    the result: the result takes a's value and is overwritten by b's.
+    """
+    if node["operator"] == "!":
+        operand = lower_expression(node["right"], context)
+        temp = new_temp(context)
+        emit(context, BinOp(temp, "==", operand, 0))
+        return temp
+
+    result = new_temp(context)
+    end_label = new_label(context)
+    emit(context, Assign(result, lower_expression(node["left"], context)))
+    if node["operator"] == "&&":
+        emit(context, IfZ(result, end_label))
+    else:
+        right_label = new_label(context)
+        emit(context, IfZ(result, right_label))
+        emit(context, Goto(end_label))
+        emit(context, Label(right_label))
+    emit(context, Assign(result, lower_expression(node["right"], context)))
+    emit(context, Label(end_label))
+    return result
+
+
+def lower_call(call, context):
+    actuals = call.get("actuals", [])
+
+    # Arguments are evaluated left to right, then pushed last-first so the
+    # first argument ends up nearest the callee's $fp
+    args = []
+    for index, actual in enumerate(actuals):
+        value = lower_expression(actual, context)
+        args.append(stable_operand(value, actuals[index + 1:], context))
+
+    for arg in reversed(args):
+        emit(context, PushParam(arg))
+    result = new_temp(context)
+    emit(context, LCall(function_label(call["identifier"]), result))
+    if args:
+        emit(context, PopParams(WORD_SIZE * len(args)))
+    return result
+
+
+def lower_runtime_call(label):
+    def lower(node, context):
+        result = new_temp(context)
+        emit(context, LCall(label, result))
+        return result
+    return lower
+
+
+EXPRESSION_LOWERINGS = {
+    "IntConstant": lower_int_constant,
+    "BoolConstant": lower_bool_constant,
+    "DoubleConstant": lower_double_constant,
+    "StringConstant": lower_string_constant,
+    "FieldAccess": lower_field_access,
+    "ArithmeticExpr": lower_arithmetic,
+    "RelationalExpr": lower_relational,
+    "EqualityExpr": lower_equality,
+    "LogicalExpr": lower_logical,
+    "Call": lower_call,
+    "ReadIntegerExpr": lower_runtime_call("_ReadInteger"),
+    "ReadLine": lower_runtime_call("_ReadLine"),
+    "AssignExpr": lower_assign,
+}
+
+# Any expression can stand as a statement; its value is simply dropped
+STATEMENT_LOWERINGS = dict(EXPRESSION_LOWERINGS)
+STATEMENT_LOWERINGS.update({
+    "VarDecl": lower_vardecl,
+    "PrintStmt": lower_print,
+    "ReturnStmt": lower_return,
+    "IfStmt": lower_if,
+    "WhileStmt": lower_while,
+    "ForStmt": lower_for,
+    "BreakStmt": lower_break,
+    "StmtBlock": lower_block,
+})
+
+_dispatch_expression = make_dispatcher("lowering", EXPRESSION_LOWERINGS)
+_dispatch_statement = make_dispatcher("lowering", STATEMENT_LOWERINGS)
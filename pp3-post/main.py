@@ -1,11 +1,11 @@
-from scanner_re import tokenize
-from parser import parse
 from helper_functions import read_source_file
-from semantic_analyzer import check_semantics
 from format_nodes import format_ast_string
-from code_generation import generate_code
+from compiler import compile, link_runtime, BACKENDS
+from optimizer import OPT_LEVELS, passes_for_level
+from compile_stats import CompileStats
+from profiling import CProfileProfiler, SamplingProfiler
 import sys
-from contextlib import redirect_stdout
+from contextlib import redirect_stdout, nullcontext
 import pprint
 import argparse
 import os
@@ -40,19 +40,11 @@ def run_and_concat():
     combined_path = r"pp3-post\final.s"  # for SPIM
 
     source_code = read_source_file(file_path)
-    tokens = tokenize(source_code)
-    ast_output = parse(tokens)
+    result = compile(source_code)
 
-    if isinstance(ast_output, str):
-        output = ast_output
-    else:
-        pprint.pprint(ast_output)
-        semantic_errors = check_semantics(ast_output, tokens)
-
-        if semantic_errors:
-            output = "\n".join(semantic_errors) + "\n"
-        else:
-            output = generate_code(ast_output)
+    if result.ast is not None:
+        pprint.pprint(result.ast)
+    output = result.output
 
     # Save compiler-only output
     with open(output_path, "w") as f:
@@ -65,30 +57,91 @@ def run_and_concat():
     print(f"Saved output to: {output_path}")
     print(f"Saved QtSPIM-ready file to: {combined_path}")
 
+def profile_compile(source_code, args):
+    """
+    Runs compile() args.repeat times under the chosen profiler, writes its
+    files and prints the hottest functions.
+    """
+    if args.profile == 'sample':
+        profiler = SamplingProfiler(args.sample_interval / 1000)
+        with profiler.running():
+            for _ in range(args.repeat):
+                compile(source_code, stats=profiler, backend=args.backend, optimize=args.optimize)
+    else:
+        profiler = CProfileProfiler()
+        for _ in range(args.repeat):
+            compile(source_code, stats=profiler, backend=args.backend, optimize=args.optimize)
+
+    prefix = args.profile_out or os.path.splitext(args.file)[0]
+    for path in profiler.write(prefix):
+        print(f"Saved {profiler.mode} profile to: {path}")
+    print(profiler.report())
+
 def main():
     parser = argparse.ArgumentParser(description='Compile a Decaf source file into MIPS assembly.')
     parser.add_argument('file', type=str, help='Path to the Decaf (.decaf) source file')
+    parser.add_argument('--backend', choices=BACKENDS,
+                        help='direct: MIPS straight from the AST; tac: through three-address code '
+                             '(default: direct, or tac with -O)')
+    parser.add_argument('-O', dest='level', type=int, default=0, choices=sorted(OPT_LEVELS),
+                        help='Optimization level for the tac backend')
+    parser.add_argument('--unroll-factor', type=int, metavar='N',
+                        help='Loop bodies per trip of a partly unrolled loop (with -O 2; default 4)')
+    parser.add_argument('--unroll-budget', type=int, metavar='N',
+                        help='Most instructions an unrolled loop body may have (with -O 2; default 128)')
+    parser.add_argument('--link', action='store_true', help='Append the runtime (defs.asm) to the output')
+    parser.add_argument('--stats', nargs='?', const='table', choices=['table', 'json'],
+                        help='Print per-phase time, memory and counts to stderr')
+    parser.add_argument('--profile', nargs='?', const='cprofile', choices=['cprofile', 'sample'],
+                        help='Profile the compile; writes PREFIX.pstats (cprofile) and PREFIX.folded')
+    parser.add_argument('--profile-out', metavar='PREFIX',
+                        help='Output path prefix for --profile (default: the source path without .decaf)')
+    parser.add_argument('--sample-interval', type=float, default=1.0, metavar='MS',
+                        help='Sampling period for --profile sample')
+    parser.add_argument('--repeat', type=int, default=1, help='Compile N times (for steadier profiles)')
     args = parser.parse_args()
+    if args.stats and args.profile:
+        parser.error('--stats and --profile cannot be combined')
+    args.optimize = passes_for_level(args.level)
+    for setting, value in (('unroll-factor', args.unroll_factor), ('unroll-budget', args.unroll_budget)):
+        if value is None:
+            continue
+        if 'unroll' not in args.optimize:
+            parser.error(f'--{setting} needs -O 2')
+        if value < 1:
+            parser.error(f'--{setting} must be a positive integer')
+        args.optimize += (f'{setting}={value}',)
+    if args.backend is None:
+        args.backend = 'tac' if args.optimize else 'direct'
+    elif args.optimize and args.backend != 'tac':
+        parser.error('-O needs --backend tac')
 
     file_path = args.file
     output_path = r"pp3-post\program.s"
     combined_path = r"pp3-post\final.s"  # for SPIM
 
     source_code = read_source_file(file_path)
-    tokens = tokenize(source_code)
-    ast_output = parse(tokens)
+    if args.profile:
+        profile_compile(source_code, args)
+        return
 
-    if isinstance(ast_output, str):
-        output = ast_output
-    else:
-        semantic_errors = check_semantics(ast_output, tokens)
+    stats = CompileStats() if args.stats else None
+    result = compile(source_code, stats=stats, backend=args.backend, optimize=args.optimize)
 
-        if semantic_errors:
-            output = "\n".join(semantic_errors) + "\n"
-        else:
-            output = generate_code(ast_output)
+    output = result.output
+    if args.link and result.ok:
+        with (stats.phase("link") if stats else nullcontext()):
+            output = link_runtime(output)
+        if stats:
+            stats.counts["linked_lines"] = output.count("\n")
 
     print(output)
+    if stats:
+        print(stats.to_json() if args.stats == 'json' else stats.format_table(), file=sys.stderr)
 
 if __name__ == "__main__":
-    run_and_concat()
\ No newline at end of file
+    # No arguments: the original fixed-path driver
+    if len(sys.argv) > 1:
+        main()
+    else:
+        run_and_concat()
\ No newline at end of file
@@ -0,0 +1,524 @@
+# mips_backend.py
+"""
+MIPS backend for the three-address code in tac.py.
+
+Output is built as a list of MipsInstr (opcode, operands, comment) and only
+turned into text at the end by format_asm(), so later passes can work on
+the instruction list. Without register allocation every variable
+stays in its home location (declared variables where binding.py put them,
+each temp in its own frame slot below the locals) and is loaded into a
+scratch register at each use; with the "regalloc" option the allocation
+from regalloc.py keeps temps, formals and locals in registers. Each TAC
+instruction is preceded by a "# ..." comment showing it.
+
+Integer + and - use addu/subu, so arithmetic wraps at 32 bits instead of
+trapping on overflow. Doubles are single-precision floats moved through
+coprocessor 1 ($f0, $f2, $f4).
+"""
+from binding import Symbol
+from regalloc import allocate_registers
+from strength_reduction import log2_exact, magic_signed
+from tac import Temp, Assign, LoadString, BinOp, Label, Goto, IfZ, PushParam, PopParams, LCall, Return
+
+WORD_SIZE = 4
+INT_MIN = -0x80000000
+
+INTEGER_OPCODES = {
+    "+": "addu", "-": "subu", "*": "mul", "/": "div", "%": "rem",
+    "<": "slt", "<=": "sle", ">": "sgt", ">=": "sge", "==": "seq", "!=": "sne",
+    "&&": "and", "||": "or",
+}
+FLOAT_OPCODES = {"f+": "add.s", "f-": "sub.s", "f*": "mul.s", "f/": "div.s"}
+# Branches taken when an integer comparison is false, against a register
+# and against zero
+BRANCH_IF_FALSE = {"<": "bge", "<=": "bgt", ">": "ble", ">=": "blt", "==": "bne", "!=": "beq"}
+BRANCH_IF_FALSE_ZERO = {"<": "bgez", "<=": "bgtz", ">": "blez", ">=": "bltz", "==": "bnez", "!=": "beqz"}
+# Float comparisons: (c.cond.s opcode, swap operands, negate result)
+FLOAT_COMPARES = {
+    "f<": ("c.lt.s", False, False), "f<=": ("c.le.s", False, False),
+    "f>": ("c.lt.s", True, False), "f>=": ("c.le.s", True, False),
+    "f==": ("c.eq.s", False, False), "f!=": ("c.eq.s", False, True),
+}
+
+
+class MipsInstr:
+    """
+    One line of assembly. op is a machine/pseudo opcode, or one of the
+    layout kinds "label", "comment" and "directive" (operands hold the
+    label name, the comment text or the directive line).
+    """
+
+    __slots__ = ("op", "args", "comment")
+
+    def __init__(self, op, args=(), comment=None):
+        self.op = op
+        self.args = tuple(args)
+        self.comment = comment
+
+    def __repr__(self):
+        return f"MipsInstr({self.op!r}, {self.args!r})"
+
+
+def format_instr(instr):
+    if instr.op == "label":
+        return f"  {instr.args[0]}:"
+    if instr.op == "comment":
+        return f"\t# {instr.args[0]}"
+    if instr.op == "directive":
+        return f"\t  {instr.args[0]}"
+    text = f"\t  {instr.op} {', '.join(instr.args)}" if instr.args else f"\t  {instr.op}"
+    return f"{text}\t# {instr.comment}" if instr.comment else text
+
+
+def format_asm(instrs):
+    return "\n".join(format_instr(instr) for instr in instrs) + "\n"
+
+
+def preamble():
+    return [
+        MipsInstr("comment", ("standard Decaf preamble",)),
+        MipsInstr("directive", (".text",)),
+        MipsInstr("directive", (".align 2",)),
+        MipsInstr("directive", (".globl main",)),
+    ]
+
+
+def has_main(functions):
+    return any(function.name == "main" for function in functions)
+
+
+def generate_mips(functions, options=(), counters=None):
+    """
+    TAC functions -> MIPS program text. options is a collection of backend
+    optimizations:
+        "regalloc"  keep temps and non-global variables in registers (regalloc.py)
+        "strength"  shifts and magic-number multiplies for constant *, / and %,
+                    addiu for + and - of small constants
+        "fuse"      branch on a comparison directly instead of on its 0/1 value
+        "peephole"  run peephole.py over the instructions
+    counters, if given, gets a "peephole_<rule>" count for each rule that fired.
+    """
+    if not has_main(functions):
+        return "*** Error.\n*** Linker: function 'main' not defined"
+    instrs = emit_program(functions, options)
+    if "peephole" in options:
+        # peephole.py builds on this module
+        from peephole import optimize
+        fired = {}
+        instrs = optimize(instrs, fired)
+        if counters is not None:
+            for name, count in fired.items():
+                counters[f"peephole_{name}"] = counters.get(f"peephole_{name}", 0) + count
+    return format_asm(instrs)
+
+
+def emit_program(functions, options=()):
+    """TAC functions -> list of MipsInstr, preamble included."""
+    instrs = preamble()
+    strings = {}        # literal text -> label, shared by the whole program
+    for function in functions:
+        allocation = allocate_registers(function) if "regalloc" in options else None
+        instrs.extend(emit_function(function, strings, allocation, options))
+    return instrs
+
+
+def frame_layout(function, allocation):
+    """
+    Frame slots below the locals binding.py placed at -8, -12, ...: a home
+    for every temp without a register, then save slots for the registers
+    the function preserves. Returns ({temp id: offset}, {register: offset},
+    frame size in bytes).
+    """
+    registers = allocation.registers if allocation else {}
+    cursor = -8 - WORD_SIZE * function.local_slots
+
+    temp_offsets = {}
+    for temp in function.temps():
+        if temp not in registers:
+            temp_offsets[temp.id] = cursor
+            cursor -= WORD_SIZE
+
+    save_offsets = {}
+    if allocation:
+        saved = set()
+        for call_saves in allocation.saved_across.values():
+            saved.update(call_saves)
+        for register in allocation.callee_saved + sorted(saved):
+            save_offsets[register] = cursor
+            cursor -= WORD_SIZE
+
+    return temp_offsets, save_offsets, -cursor - 8
+
+
+def emit_prologue(function, frame_size, context):
+    instrs = [
+        MipsInstr("label", (function.label,)),
+        MipsInstr("comment", (f"BeginFunc {frame_size}",)),
+        MipsInstr("subu", ("$sp", "$sp", "8"), "decrement sp to make space to save ra, fp"),
+        MipsInstr("sw", ("$fp", "8($sp)"), "save fp"),
+        MipsInstr("sw", ("$ra", "4($sp)"), "save ra"),
+        MipsInstr("addiu", ("$fp", "$sp", "8"), "set up new fp"),
+        MipsInstr("subu", ("$sp", "$sp", str(frame_size)), "decrement sp to make space for locals/temps"),
+    ]
+    allocation = context["allocation"]
+    if allocation:
+        for register in allocation.callee_saved:
+            instrs.append(MipsInstr("sw", (register, f"{context['save_offsets'][register]}($fp)"), f"save {register}"))
+        for formal, register in allocation.formal_loads:
+            instrs.append(MipsInstr("lw", (register, f"{formal.offset}($fp)"), f"load {formal.name} to {register}"))
+    return instrs
+
+
+def emit_epilogue(context=None):
+    instrs = []
+    allocation = context["allocation"] if context else None
+    if allocation:
+        for register in allocation.callee_saved:
+            instrs.append(MipsInstr("lw", (register, f"{context['save_offsets'][register]}($fp)"), f"restore {register}"))
+    instrs.extend([
+        MipsInstr("move", ("$sp", "$fp"), "pop callee frame off stack"),
+        MipsInstr("lw", ("$ra", "-4($fp)"), "restore saved ra"),
+        MipsInstr("lw", ("$fp", "0($fp)"), "restore saved fp"),
+        MipsInstr("jr", ("$ra",), "return from function"),
+    ])
+    return instrs
+
+
+def emit_function(function, strings, allocation=None, options=()):
+    temp_offsets, save_offsets, frame_size = frame_layout(function, allocation)
+    context = {
+        "function": function,
+        "allocation": allocation,
+        "registers": allocation.registers if allocation else {},
+        "temp_offsets": temp_offsets,
+        "save_offsets": save_offsets,
+        "strings": strings,
+        "out": [],
+        "float_labels": 0,
+        "strength_reduce": "strength" in options,
+        "fused": fused_branches(function.code) if "fuse" in options else {},
+    }
+
+    fused_compares = set(map(id, context["fused"].values()))
+    for instr in function.code:
+        if not isinstance(instr, Label):
+            context["out"].append(MipsInstr("comment", (str(instr),)))
+        if id(instr) in fused_compares:
+            continue        # emitted as part of the branch after it
+        _emitters[type(instr)](instr, context)
+
+    instrs = emit_prologue(function, frame_size, context)
+    instrs.extend(context["out"])
+    instrs.append(MipsInstr("comment", ("EndFunc",)))
+    instrs.extend(emit_epilogue(context))
+    return instrs
+
+
+# --- Operand access ---
+
+# Scratch registers for operands and results that have no register of
+# their own; never allocated, and only live within one TAC instruction
+SCRATCH_LEFT = "$v1"
+SCRATCH_RIGHT = "$a3"
+SCRATCH_RESULT = "$a2"
+
+
+def home(operand, context):
+    """Memory operand for a variable's home, e.g. "-12($fp)"."""
+    if isinstance(operand, Temp):
+        return f"{context['temp_offsets'][operand.id]}($fp)"
+    if isinstance(operand, Symbol):
+        return f"{operand.offset}($gp)" if operand.is_global else f"{operand.offset}($fp)"
+    raise TypeError(f"{operand!r} has no memory home")
+
+
+def read(operand, scratch, context):
+    """
+    Returns a register holding operand: its allocated register, $zero, or
+    scratch after loading it there.
+    """
+    out = context["out"]
+    if isinstance(operand, int):
+        if operand == 0:
+            return "$zero"
+        out.append(MipsInstr("li", (scratch, str(operand)), f"load constant value {operand} into {scratch}"))
+        return scratch
+    register = context["registers"].get(operand)
+    if register is not None:
+        return register
+    out.append(MipsInstr("lw", (scratch, home(operand, context)), f"fill {operand.name} to {scratch}"))
+    return scratch
+
+
+def result_register(operand, context):
+    """Register an instruction should compute operand's new value into."""
+    return context["registers"].get(operand, SCRATCH_RESULT)
+
+
+def write_back(operand, register, context):
+    """Stores a freshly computed value to memory if operand has no register."""
+    if operand not in context["registers"]:
+        context["out"].append(MipsInstr("sw", (register, home(operand, context)), f"spill {operand.name} from {register}"))
+
+
+# --- Instructions ---
+
+def emit_assign(instr, context):
+    out = context["out"]
+    target = context["registers"].get(instr.dst)
+    if target is None:
+        write_back(instr.dst, read(instr.src, SCRATCH_RESULT, context), context)
+    elif isinstance(instr.src, int):
+        out.append(MipsInstr("li", (target, str(instr.src)), f"load constant value {instr.src} into {target}"))
+    else:
+        source = read(instr.src, target, context)
+        if source != target:
+            out.append(MipsInstr("move", (target, source)))
+
+
+def emit_load_string(instr, context):
+    strings = context["strings"]
+    label = strings.get(instr.text)
+    out = context["out"]
+    if label is None:
+        label = strings[instr.text] = f"_string{len(strings) + 1}"
+        out.append(MipsInstr("directive", (".data",), None))
+        out.append(MipsInstr("directive", (f"{label}: .asciiz {instr.text}",)))
+        out.append(MipsInstr("directive", (".text",)))
+    target = result_register(instr.dst, context)
+    out.append(MipsInstr("la", (target, label), "load label"))
+    write_back(instr.dst, target, context)
+
+
+def emit_binop(instr, context):
+    out = context["out"]
+    if context["strength_reduce"] and (emit_immediate_add(instr, context) or emit_reduced(instr, context)):
+        return
+    left = read(instr.left, SCRATCH_LEFT, context)
+    right = read(instr.right, SCRATCH_RIGHT, context)
+    target = result_register(instr.dst, context)
+
+    if instr.op in INTEGER_OPCODES:
+        out.append(MipsInstr(INTEGER_OPCODES[instr.op], (target, left, right)))
+    elif instr.op in FLOAT_OPCODES:
+        out.append(MipsInstr("mtc1", (left, "$f0")))
+        out.append(MipsInstr("mtc1", (right, "$f2")))
+        out.append(MipsInstr(FLOAT_OPCODES[instr.op], ("$f4", "$f0", "$f2")))
+        out.append(MipsInstr("mfc1", (target, "$f4")))
+    else:
+        emit_float_compare(instr.op, left, right, target, context)
+    write_back(instr.dst, target, context)
+
+
+def emit_immediate_add(instr, context):
+    """
+    addiu for + and - of a constant that fits in 16 signed bits, instead of
+    loading the constant first. Returns False, emitting nothing, otherwise.
+    """
+    if instr.op == "+" and isinstance(instr.right, int) and not isinstance(instr.left, int):
+        operand, constant = instr.left, instr.right
+    elif instr.op == "+" and isinstance(instr.left, int) and not isinstance(instr.right, int):
+        operand, constant = instr.right, instr.left
+    elif instr.op == "-" and isinstance(instr.right, int) and not isinstance(instr.left, int):
+        operand, constant = instr.left, -instr.right
+    else:
+        return False
+    if not -0x8000 <= constant <= 0x7FFF:
+        return False
+    value = read(operand, SCRATCH_LEFT, context)
+    target = result_register(instr.dst, context)
+    context["out"].append(MipsInstr("addiu", (target, value, str(constant))))
+    write_back(instr.dst, target, context)
+    return True
+
+
+def emit_reduced(instr, context):
+    """
+    Cheaper code for * by a power of two and for / and % by a constant
+    (see strength_reduction.py). Returns False, emitting nothing, when
+    instr is not one of those.
+    """
+    op = instr.op
+    if op == "*" and isinstance(instr.left, int) and not isinstance(instr.right, int):
+        operand, constant = instr.right, instr.left
+    elif op in ("*", "/", "%") and isinstance(instr.right, int) and not isinstance(instr.left, int):
+        operand, constant = instr.left, instr.right
+    else:
+        return False
+    shift = log2_exact(abs(constant))
+    if constant == 0 or constant == INT_MIN or (op == "*" and shift is None):
+        return False
+
+    out = context["out"]
+    value = read(operand, SCRATCH_LEFT, context)
+    target = result_register(instr.dst, context)
+    # $a3 is free (the constant needs no register); spare is the other free one
+    work = SCRATCH_RIGHT
+    spare = SCRATCH_LEFT if value != SCRATCH_LEFT else target
+
+    if op == "*":
+        out.append(MipsInstr("sll", (target, value, str(shift)), f"multiply by {abs(constant)}"))
+    elif abs(constant) == 1:
+        # No shift at all: a copy, a negation or zero
+        if op == "%":
+            out.append(MipsInstr("move", (target, "$zero"), f"remainder by {constant}"))
+        elif constant == 1:
+            out.append(MipsInstr("move", (target, value), "divide by 1"))
+        else:
+            out.append(MipsInstr("subu", (target, "$zero", value), "divide by -1"))
+    elif shift is not None:
+        # Add 2**shift - 1 to negative dividends so the shift rounds toward zero
+        out.append(MipsInstr("sra", (work, value, "31")))
+        out.append(MipsInstr("srl", (work, work, str(32 - shift))))
+        out.append(MipsInstr("addu", (work, value, work)))
+        if op == "/":
+            out.append(MipsInstr("sra", (target, work, str(shift)), f"divide by {abs(constant)}"))
+        else:
+            out.append(MipsInstr("sra", (work, work, str(shift))))
+            out.append(MipsInstr("sll", (work, work, str(shift))))
+            out.append(MipsInstr("subu", (target, value, work), f"remainder by {abs(constant)}"))
+    else:
+        multiplier, magic_shift = magic_signed(constant)
+        out.append(MipsInstr("li", (work, str(multiplier)), f"magic number for / {constant}"))
+        out.append(MipsInstr("mult", (value, work)))
+        out.append(MipsInstr("mfhi", (work,)))
+        if constant > 0 and multiplier < 0:
+            out.append(MipsInstr("addu", (work, work, value)))
+        elif constant < 0 and multiplier > 0:
+            out.append(MipsInstr("subu", (work, work, value)))
+        if magic_shift:
+            out.append(MipsInstr("sra", (work, work, str(magic_shift))))
+        out.append(MipsInstr("srl", (spare, work, "31")))
+        if op == "/":
+            out.append(MipsInstr("addu", (target, work, spare), f"divide by {constant}"))
+        else:
+            out.append(MipsInstr("addu", (work, work, spare)))
+            out.append(MipsInstr("li", (spare, str(constant))))
+            out.append(MipsInstr("mul", (work, work, spare)))
+            out.append(MipsInstr("subu", (target, value, work), f"remainder by {constant}"))
+    # x / -2**k and x * -2**k: negate the result
+    if constant < 0 and shift is not None and (op == "*" or op == "/" and constant != -1):
+        out.append(MipsInstr("subu", (target, "$zero", target)))
+    write_back(instr.dst, target, context)
+    return True
+
+
+def emit_float_compare(op, left, right, target, context):
+    """Leaves 0/1 in target for a float comparison of left and right."""
+    out = context["out"]
+    opcode, swap, negate = FLOAT_COMPARES[op]
+    done = f"{context['function'].label}_fcmp{context['float_labels']}"
+    context["float_labels"] += 1
+
+    out.append(MipsInstr("mtc1", (left, "$f0")))
+    out.append(MipsInstr("mtc1", (right, "$f2")))
+    out.append(MipsInstr(opcode, ("$f2", "$f0") if swap else ("$f0", "$f2")))
+    out.append(MipsInstr("li", (target, "0" if negate else "1")))
+    out.append(MipsInstr("bc1t", (done,)))
+    out.append(MipsInstr("li", (target, "1" if negate else "0")))
+    out.append(MipsInstr("label", (done,)))
+
+
+def emit_label(instr, context):
+    context["out"].append(MipsInstr("label", (instr.name,)))
+
+
+def emit_goto(instr, context):
+    context["out"].append(MipsInstr("b", (instr.label,), "unconditional branch"))
+
+
+def emit_ifz(instr, context):
+    compare = context["fused"].get(instr)
+    if compare is not None:
+        emit_fused_branch(compare, instr.label, context)
+        return
+    cond = read(instr.cond, SCRATCH_LEFT, context)
+    context["out"].append(MipsInstr("beqz", (cond, instr.label), "branch if zero"))
+
+
+def fused_branches(code):
+    """
+    {IfZ: comparison BinOp} for each IfZ testing the temp a comparison
+    right before it computed, when nothing else reads that temp.
+    """
+    reads = {}
+    for instr in code:
+        for operand in instr.uses():
+            if isinstance(operand, Temp):
+                reads[operand] = reads.get(operand, 0) + 1
+    fused = {}
+    for compare, branch in zip(code, code[1:]):
+        if (isinstance(compare, BinOp) and isinstance(branch, IfZ) and branch.cond is compare.dst
+                and isinstance(compare.dst, Temp) and reads[compare.dst] == 1
+                and (compare.op in BRANCH_IF_FALSE or compare.op in FLOAT_COMPARES)):
+            fused[branch] = compare
+    return fused
+
+
+def emit_fused_branch(compare, label, context):
+    """Jumps to label when compare is false, without materializing its 0/1 value."""
+    out = context["out"]
+    left = read(compare.left, SCRATCH_LEFT, context)
+    if compare.op in FLOAT_COMPARES:
+        right = read(compare.right, SCRATCH_RIGHT, context)
+        opcode, swap, negate = FLOAT_COMPARES[compare.op]
+        out.append(MipsInstr("mtc1", (left, "$f0")))
+        out.append(MipsInstr("mtc1", (right, "$f2")))
+        out.append(MipsInstr(opcode, ("$f2", "$f0") if swap else ("$f0", "$f2")))
+        out.append(MipsInstr("bc1t" if negate else "bc1f", (label,), f"branch unless {compare.op[1:]}"))
+    elif compare.right == 0:
+        out.append(MipsInstr(BRANCH_IF_FALSE_ZERO[compare.op], (left, label), f"branch unless {compare.op} 0"))
+    else:
+        right = read(compare.right, SCRATCH_RIGHT, context)
+        out.append(MipsInstr(BRANCH_IF_FALSE[compare.op], (left, right, label), f"branch unless {compare.op}"))
+
+
+def emit_push_param(instr, context):
+    arg = read(instr.arg, SCRATCH_LEFT, context)
+    context["out"].append(MipsInstr("subu", ("$sp", "$sp", "4"), "decrement sp to make space for param"))
+    context["out"].append(MipsInstr("sw", (arg, "4($sp)"), "copy param value to stack"))
+
+
+def emit_pop_params(instr, context):
+    context["out"].append(MipsInstr("addu", ("$sp", "$sp", str(instr.size)), "pop params off stack"))
+
+
+def emit_lcall(instr, context):
+    out = context["out"]
+    allocation = context["allocation"]
+    saved = allocation.saved_across.get(instr, ()) if allocation else ()
+    for register in saved:
+        out.append(MipsInstr("sw", (register, f"{context['save_offsets'][register]}($fp)"), f"save {register} across call"))
+    out.append(MipsInstr("jal", (instr.label,), "jump to function"))
+    for register in saved:
+        out.append(MipsInstr("lw", (register, f"{context['save_offsets'][register]}($fp)"), f"restore {register}"))
+
+    if instr.dst is not None:
+        target = result_register(instr.dst, context)
+        out.append(MipsInstr("move", (target, "$v0"), "copy function return value from $v0"))
+        write_back(instr.dst, target, context)
+
+
+def emit_return(instr, context):
+    out = context["out"]
+    if isinstance(instr.value, int):
+        out.append(MipsInstr("li", ("$v0", str(instr.value)), "load return value"))
+    elif instr.value is not None:
+        value = read(instr.value, "$v0", context)
+        if value != "$v0":
+            out.append(MipsInstr("move", ("$v0", value), "assign return value into $v0"))
+    out.extend(emit_epilogue(context))
+
+
+_emitters = {
+    Assign: emit_assign,
+    LoadString: emit_load_string,
+    BinOp: emit_binop,
+    Label: emit_label,
+    Goto: emit_goto,
+    IfZ: emit_ifz,
+    PushParam: emit_push_param,
+    PopParams: emit_pop_params,
+    LCall: emit_lcall,
+    Return: emit_return,
+}
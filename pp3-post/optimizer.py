@@ -0,0 +1,100 @@
+# optimizer.py
+"""
+Optimization passes for the TAC backend and the -O levels that select them.
+
+A TAC pass is a function taking one TacFunction, rewriting function.code
+in place and returning how many times it changed something; TAC_PASSES
+lists them in the order they run. Backend options ("regalloc", "fuse",
+...) are not TAC passes: compile() hands them to
+mips_backend.generate_mips(). OPT_LEVELS maps each -O level to the pass
+names it turns on. A "setting=N" entry (PASS_SETTINGS) among the names
+passes N to a TAC pass as a keyword argument, e.g. "unroll-factor=8".
+"""
+from constant_folding import fold_constants
+from counted_loops import reduce_induction_variables, unroll_loops
+from dead_code import remove_unreachable, eliminate_dead_stores
+from loops import hoist_invariants
+from sccp import propagate_constants
+from strength_reduction import simplify_algebra
+from value_numbering import number_values
+
+# (name, pass function) in the order optimize_program() runs them
+TAC_PASSES = [
+    ("fold", fold_constants),
+    ("sccp", propagate_constants),
+    ("algebra", simplify_algebra),
+    ("lvn", number_values),
+    ("licm", hoist_invariants),
+    ("ivsr", reduce_induction_variables),
+    ("unroll", unroll_loops),
+    ("unreachable", remove_unreachable),
+    ("dse", eliminate_dead_stores),
+]
+
+# Options consumed by mips_backend.generate_mips() rather than run on TAC
+BACKEND_OPTIONS = ("regalloc", "strength", "fuse", "peephole")
+
+# setting -> (pass name, keyword argument of its pass function)
+PASS_SETTINGS = {
+    "unroll-factor": ("unroll", "factor"),
+    "unroll-budget": ("unroll", "budget"),
+}
+
+OPT_LEVELS = {
+    0: (),
+    1: ("regalloc", "fuse", "peephole"),
+    2: ("fold", "sccp", "algebra", "lvn", "licm", "ivsr", "unroll", "unreachable", "dse", "regalloc", "strength", "fuse", "peephole"),
+}
+
+
+def known_passes():
+    return tuple(name for name, _ in TAC_PASSES) + BACKEND_OPTIONS
+
+
+def passes_for_level(level):
+    if level not in OPT_LEVELS:
+        raise ValueError(f"optimization level must be one of {', '.join(map(str, sorted(OPT_LEVELS)))}")
+    return OPT_LEVELS[level]
+
+
+def check_passes(names):
+    """Returns names as a frozenset, raising ValueError for unknown ones."""
+    known = known_passes()
+    unknown = []
+    for name in names:
+        setting, _, value = name.partition("=")
+        if setting in PASS_SETTINGS and value:
+            if not value.isdigit() or int(value) < 1:
+                raise ValueError(f"{setting} must be a positive integer, got {value!r}")
+        elif name not in known:
+            unknown.append(name)
+    if unknown:
+        settings = [f"{setting}=N" for setting in PASS_SETTINGS]
+        raise ValueError(f"unknown optimization {', '.join(unknown)} (known: {', '.join(known + tuple(settings))})")
+    return frozenset(names)
+
+
+def pass_settings(names):
+    """Keyword arguments for each TAC pass from the "setting=N" entries of names."""
+    settings = {}
+    for name in names:
+        setting, _, value = name.partition("=")
+        if setting in PASS_SETTINGS and value:
+            pass_name, keyword = PASS_SETTINGS[setting]
+            settings.setdefault(pass_name, {})[keyword] = int(value)
+    return settings
+
+
+def optimize_program(functions, passes, counters=None):
+    """
+    Runs the selected TAC passes over every function. counters, if given,
+    gets "opt_<pass>" fire counts.
+    """
+    settings = pass_settings(passes)
+    for name, run in TAC_PASSES:
+        if name not in passes:
+            continue
+        options = settings.get(name, {})
+        fired = sum(run(function, **options) for function in functions)
+        if counters is not None:
+            counters[f"opt_{name}"] = counters.get(f"opt_{name}", 0) + fired
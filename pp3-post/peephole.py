@@ -0,0 +1,273 @@
+# peephole.py
+"""
+Peephole optimizer over the MipsInstr lists mips_backend.py builds.
+
+Each rule looks at the instruction at one position and the next code
+instruction after it ("comment" lines are skipped over, labels and
+directives are not) and returns the edits to make, or None. optimize()
+applies the rules until none fires and counts how often each one did.
+
+Some rules need to know a register is dead afterwards. The backend's
+scratch registers ($v1, $a3, $a2) only carry values within one TAC
+instruction, and the backend starts every TAC instruction with a comment,
+so a scratch register is dead at the next comment unless something reads
+it first. Any other register, and anything reaching a label or a jump,
+counts as live.
+
+check_peephole.py runs every rule on sample code in a small MIPS
+interpreter to check that it keeps the meaning of the code.
+"""
+from mips_backend import MipsInstr, SCRATCH_LEFT, SCRATCH_RIGHT, SCRATCH_RESULT
+
+SCRATCH = (SCRATCH_LEFT, SCRATCH_RIGHT, SCRATCH_RESULT)
+
+# Opcodes whose first operand is written and whose other operands are read
+DEFINING_OPS = {
+    "li", "la", "move", "lw", "mfc1", "mfhi", "mflo",
+    "addu", "subu", "mul", "div", "rem", "and", "or", "xor", "nor",
+    "slt", "sle", "sgt", "sge", "seq", "sne", "sll", "srl", "sra",
+    "addiu", "andi", "ori", "sltu", "mulhi",
+}
+# Opcodes that only read their operands
+USING_OPS = {"sw", "mtc1", "mult"}
+UNCONDITIONAL_BRANCHES = {"b", "j"}
+CONDITIONAL_BRANCHES = {"beqz", "bnez", "beq", "bne", "blt", "ble", "bgt", "bge", "bltz", "bgez", "bgtz", "blez"}
+# Control leaves straight-line code here
+BARRIERS = UNCONDITIONAL_BRANCHES | CONDITIONAL_BRANCHES | {"jr", "jal", "bc1t", "bc1f", "syscall"}
+
+
+def is_register(arg):
+    return arg.startswith("$")
+
+
+def address_base(arg):
+    """Register inside an "offset(reg)" operand, else None."""
+    if arg.endswith(")") and "(" in arg:
+        return arg[arg.index("(") + 1:-1]
+    return None
+
+
+def reads(instr):
+    """Registers instr reads (None when unknown)."""
+    if instr.op in DEFINING_OPS:
+        operands = instr.args[1:]
+    elif instr.op in USING_OPS or instr.op in CONDITIONAL_BRANCHES:
+        operands = instr.args
+    elif instr.op in UNCONDITIONAL_BRANCHES or instr.op in ("label", "comment", "directive"):
+        return set()
+    else:
+        return None
+    found = set()
+    for arg in operands:
+        base = address_base(arg)
+        if base is not None:
+            found.add(base)
+        elif is_register(arg):
+            found.add(arg)
+    return found
+
+
+def writes(instr):
+    if instr.op in DEFINING_OPS:
+        return {instr.args[0]}
+    return set()
+
+
+def next_code(instrs, position):
+    """Index of the first non-comment instruction after position, or None."""
+    position += 1
+    while position < len(instrs) and instrs[position].op == "comment":
+        position += 1
+    return position if position < len(instrs) else None
+
+
+def dead_after(instrs, position, register):
+    """True if register's value after instrs[position] is never read."""
+    for instr in instrs[position + 1:]:
+        if instr.op == "comment":
+            return register in SCRATCH
+        if instr.op == "directive":
+            continue
+        if instr.op == "label" or instr.op in BARRIERS:
+            return False
+        used = reads(instr)
+        if used is None or register in used:
+            return False
+        if register in writes(instr):
+            return True
+    return register in SCRATCH
+
+
+# --- Rules ---
+# Each takes (instrs, position, labels) and returns {index: [replacement instrs]} or None
+
+def store_load(instrs, position, labels):
+    """sw R, M; lw D, M  ->  sw R, M; move D, R (nothing at all when D is R)"""
+    store = instrs[position]
+    following = next_code(instrs, position)
+    if store.op != "sw" or following is None:
+        return None
+    load = instrs[following]
+    if load.op != "lw" or load.args[1] != store.args[1]:
+        return None
+    if load.args[0] == store.args[0]:
+        return {following: []}
+    return {following: [MipsInstr("move", (load.args[0], store.args[0]), load.comment)]}
+
+
+def store_store(instrs, position, labels):
+    """sw R, M; sw S, M  ->  sw S, M"""
+    first = instrs[position]
+    following = next_code(instrs, position)
+    if first.op != "sw" or following is None:
+        return None
+    second = instrs[following]
+    if second.op == "sw" and second.args[1] == first.args[1] and address_base(first.args[1]) != first.args[0]:
+        return {position: []}
+    return None
+
+
+def fold_move(instrs, position, labels):
+    """li/la/lw/op R, ...; move D, R  (R dead)  ->  li/la/lw/op D, ..."""
+    producer = instrs[position]
+    following = next_code(instrs, position)
+    if producer.op not in DEFINING_OPS or following is None:
+        return None
+    move = instrs[following]
+    register = producer.args[0]
+    if move.op != "move" or move.args[1] != register or not dead_after(instrs, following, register):
+        return None
+    target = move.args[0]
+    if target == register:
+        return None
+    replacement = MipsInstr(producer.op, (target,) + producer.args[1:], producer.comment)
+    return {position: [replacement], following: []}
+
+
+def copy_propagate(instrs, position, labels):
+    """move R, S; op ..., R, ...  (R dead afterwards)  ->  op ..., S, ..."""
+    move = instrs[position]
+    following = next_code(instrs, position)
+    if move.op != "move" or following is None:
+        return None
+    register, source = move.args
+    user = instrs[following]
+    if user.op in DEFINING_OPS:
+        start = 1
+    elif user.op in USING_OPS or user.op in CONDITIONAL_BRANCHES:
+        start = 0
+    else:
+        return None
+    if register not in user.args[start:] or register in writes(user) or not dead_after(instrs, following, register):
+        return None
+    if any(address_base(arg) == register for arg in user.args):
+        return None
+    args = user.args[:start] + tuple(source if arg == register else arg for arg in user.args[start:])
+    return {position: [], following: [MipsInstr(user.op, args, user.comment)]}
+
+
+def self_move(instrs, position, labels):
+    """move R, R  ->  nothing"""
+    instr = instrs[position]
+    if instr.op == "move" and instr.args[0] == instr.args[1]:
+        return {position: []}
+    return None
+
+
+def branch_to_next(instrs, position, labels):
+    """b L / beqz R, L; L:  ->  L:"""
+    branch = instrs[position]
+    if branch.op not in UNCONDITIONAL_BRANCHES and branch.op not in CONDITIONAL_BRANCHES:
+        return None
+    target = branch.args[-1]
+    following = next_code(instrs, position)
+    while following is not None and instrs[following].op == "label":
+        if instrs[following].args[0] == target:
+            return {position: []}
+        following = next_code(instrs, following)
+    return None
+
+
+def branch_chain(instrs, position, labels):
+    """b L1 ... L1: b L2  ->  b L2 ... L1: b L2"""
+    branch = instrs[position]
+    if branch.op not in UNCONDITIONAL_BRANCHES and branch.op not in CONDITIONAL_BRANCHES:
+        return None
+    target = labels.get(branch.args[-1])
+    if target is None:
+        return None
+    following = next_code(instrs, target)
+    while following is not None and instrs[following].op == "label":
+        following = next_code(instrs, following)
+    if following is None or instrs[following].op not in UNCONDITIONAL_BRANCHES:
+        return None
+    final = instrs[following].args[0]
+    if final == branch.args[-1] or final not in labels:
+        return None
+    # Only retarget onto real code, so a cycle of branches cannot ping-pong
+    landing = next_code(instrs, labels[final])
+    while landing is not None and instrs[landing].op == "label":
+        landing = next_code(instrs, landing)
+    if landing is not None and instrs[landing].op in UNCONDITIONAL_BRANCHES:
+        return None
+    return {position: [MipsInstr(branch.op, branch.args[:-1] + (final,), branch.comment)]}
+
+
+def unreachable(instrs, position, labels):
+    """b/jr; code up to the next label  ->  b/jr"""
+    jump = instrs[position]
+    if jump.op not in UNCONDITIONAL_BRANCHES and jump.op != "jr":
+        return None
+    following = next_code(instrs, position)
+    if following is None or instrs[following].op in ("label", "directive"):
+        return None
+    return {following: []}
+
+
+RULES = (
+    ("store_load", store_load),
+    ("store_store", store_store),
+    ("fold_move", fold_move),
+    ("copy_propagate", copy_propagate),
+    ("self_move", self_move),
+    ("branch_to_next", branch_to_next),
+    ("branch_chain", branch_chain),
+    ("unreachable", unreachable),
+)
+
+
+def optimize(instrs, counts=None, rules=RULES):
+    """
+    Applies rules to instrs until none fires. Returns the new list; counts,
+    if given, gets {rule name: times fired} added to it.
+    """
+    instrs = list(instrs)
+    counts = {} if counts is None else counts
+    changed = True
+    while changed:
+        changed = False
+        labels = {instr.args[0]: index for index, instr in enumerate(instrs) if instr.op == "label"}
+        position = 0
+        while position < len(instrs):
+            for name, rule in rules:
+                edits = rule(instrs, position, labels)
+                if edits is None:
+                    continue
+                counts[name] = counts.get(name, 0) + 1
+                instrs = apply_edits(instrs, edits)
+                labels = {instr.args[0]: index for index, instr in enumerate(instrs) if instr.op == "label"}
+                changed = True
+                break
+            else:
+                position += 1
+    return instrs
+
+
+def apply_edits(instrs, edits):
+    result = []
+    for index, instr in enumerate(instrs):
+        if index in edits:
+            result.extend(edits[index])
+        else:
+            result.append(instr)
+    return result
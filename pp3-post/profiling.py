@@ -0,0 +1,177 @@
+# profiling.py
+"""
+Profiling modes for the compiler driver (main.py --profile).
+
+Both profilers are passed to compile() the way a CompileStats is: compile()
+enters profiler.phase(name) around tokenize, parse, check_semantics, bind
+and generate_code, so every recorded stack is rooted at the phase it ran in.
+
+    cprofile  Deterministic. One cProfile.Profile per phase; writes the
+              merged PREFIX.pstats and PREFIX.folded. Folded stacks are
+              rebuilt from cProfile's caller edges, splitting a function's
+              time between call paths in proportion to each edge's
+              cumulative time (exact for tree-shaped call graphs, an
+              estimate where one function is reached along several paths).
+    sample    Statistical. A SIGPROF interval timer samples the interpreter
+              stack; far lower overhead, Unix only. Writes PREFIX.folded
+              (there is no pstats data without cProfile).
+
+Folded ("collapsed") stacks are one line per stack, frames root first and
+separated by ';', followed by a count: microseconds for cprofile, samples
+for sample. flamegraph.pl, inferno and speedscope read them directly.
+"""
+import cProfile
+import os
+import pstats
+import signal
+from collections import Counter
+from contextlib import contextmanager
+
+PHASE_FRAME = "phase:{}"
+
+
+def frame_label(filename, line, function):
+    """Folded-stack name for one function: 'emit_argument (code_generation.py:374)'."""
+    if filename == "~":     # C functions
+        return function
+    return f"{function} ({os.path.basename(filename)}:{line})"
+
+
+def write_folded(path, stacks):
+    """Writes {tuple_of_frames: count} as collapsed stacks, heaviest first."""
+    with open(path, "w") as folded_file:
+        for stack, count in sorted(stacks.items(), key=lambda item: -item[1]):
+            if count > 0:
+                folded_file.write(f"{';'.join(stack)} {count}\n")
+
+
+class CProfileProfiler:
+    """Deterministic profile, one cProfile.Profile per compiler phase."""
+
+    mode = "cprofile"
+
+    def __init__(self):
+        self.profiles = []      # (phase name, Profile) in run order
+        self.counts = {}        # filled in by compile(), as for CompileStats
+
+    @contextmanager
+    def phase(self, name):
+        profile = cProfile.Profile()
+        self.profiles.append((name, profile))
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+
+    def merged_stats(self):
+        merged = None
+        for _, profile in self.profiles:
+            if merged is None:
+                merged = pstats.Stats(profile)
+            else:
+                merged.add(profile)
+        return merged
+
+    def folded_stacks(self):
+        stacks = Counter()
+        for name, profile in self.profiles:
+            profile_stats = pstats.Stats(profile).stats
+            callees = {}
+            for function, (_, _, _, _, callers) in profile_stats.items():
+                for caller, edge in callers.items():
+                    callees.setdefault(caller, []).append((function, edge[3]))
+
+            roots = [function for function, entry in profile_stats.items()
+                     if not entry[4] and "_lsprof.Profiler" not in function[2]]
+            for root in roots:
+                self._fold(profile_stats, callees, root, profile_stats[root][3],
+                           (PHASE_FRAME.format(name),), set(), stacks)
+        return stacks
+
+    def _fold(self, profile_stats, callees, function, inclusive, prefix, on_path, stacks):
+        """Attributes `inclusive` seconds spent in `function` along one call path."""
+        _, _, self_time, total_time, _ = profile_stats[function]
+        if total_time <= 0:
+            return
+        share = min(1.0, inclusive / total_time)
+        stack = prefix + (frame_label(*function),)
+        stacks[stack] += int(self_time * share * 1_000_000)
+
+        on_path.add(function)
+        for callee, edge_time in callees.get(function, ()):
+            if callee not in on_path:       # recursion is folded into the outer call
+                self._fold(profile_stats, callees, callee, edge_time * share, stack, on_path, stacks)
+        on_path.discard(function)
+
+    def write(self, prefix):
+        """Writes PREFIX.pstats and PREFIX.folded; returns the paths written."""
+        self.merged_stats().dump_stats(prefix + ".pstats")
+        write_folded(prefix + ".folded", self.folded_stacks())
+        return [prefix + ".pstats", prefix + ".folded"]
+
+    def report(self, limit=15):
+        """Top functions by self time."""
+        rows = sorted(self.merged_stats().stats.items(), key=lambda item: -item[1][2])[:limit]
+        lines = [f"{'self ms':>10}{'cum ms':>10}{'calls':>9}  function"]
+        for function, (_, calls, self_time, total_time, _) in rows:
+            lines.append(f"{self_time * 1000:>10.3f}{total_time * 1000:>10.3f}{calls:>9}  {frame_label(*function)}")
+        return "\n".join(lines)
+
+
+class SamplingProfiler:
+    """SIGPROF stack sampler; the phase is whatever phase() was last entered."""
+
+    mode = "sample"
+
+    def __init__(self, interval=0.001):
+        if not hasattr(signal, "setitimer"):
+            raise RuntimeError("the sampling profiler needs signal.setitimer (Unix only)")
+        self.interval = interval
+        self.current_phase = None
+        self.samples = Counter()
+        self.counts = {}
+
+    @contextmanager
+    def phase(self, name):
+        outer, self.current_phase = self.current_phase, name
+        try:
+            yield
+        finally:
+            self.current_phase = outer
+
+    def _sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(frame_label(code.co_filename, code.co_firstlineno, code.co_name))
+            frame = frame.f_back
+        stack.append(PHASE_FRAME.format(self.current_phase or "other"))
+        stack.reverse()
+        self.samples[tuple(stack)] += 1
+
+    @contextmanager
+    def running(self):
+        """Samples the enclosed code; must be entered from the main thread."""
+        previous = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        try:
+            yield
+        finally:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, previous)
+
+    def write(self, prefix):
+        write_folded(prefix + ".folded", self.samples)
+        return [prefix + ".folded"]
+
+    def report(self, limit=15):
+        """Top functions by samples in which they were the innermost frame."""
+        leaves = Counter()
+        for stack, count in self.samples.items():
+            leaves[stack[-1]] += count
+        total = sum(leaves.values())
+        lines = [f"{total} samples every {self.interval * 1000:g} ms", f"{'samples':>9}{'%':>7}  function"]
+        for label, count in leaves.most_common(limit):
+            lines.append(f"{count:>9}{100 * count / total:>7.1f}  {label}")
+        return "\n".join(lines)
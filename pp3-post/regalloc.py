@@ -0,0 +1,154 @@
+# regalloc.py
+"""
+Linear-scan register allocation for TAC functions.
+
+Every temp, formal and local gets a live interval over the function's
+linearized instruction positions (from liveness, dataflow.py); intervals are
+then scanned in order of start and given registers from $t0-$t9 and
+$s0-$s7. Intervals that live across a call prefer a callee-saved $s
+register (saved once in the prologue); other intervals prefer $t
+registers. Only when all 18 registers are taken is an interval spilled,
+the one ending furthest away, which keeps its memory home. A $t register
+whose value is live across a call is saved before the jal and restored
+after it. Globals always stay in memory.
+"""
+from binding import Symbol
+from cfg import build_cfg
+from dataflow import Liveness
+from tac import Temp, LCall
+
+CALLER_SAVED = tuple(f"$t{n}" for n in range(10))
+CALLEE_SAVED = tuple(f"$s{n}" for n in range(8))
+
+
+class Interval:
+    """Positions over which one variable must keep its register."""
+
+    __slots__ = ("variable", "start", "end", "crosses_call", "register")
+
+    def __init__(self, variable, position):
+        self.variable = variable
+        self.start = position
+        self.end = position
+        self.crosses_call = False
+        self.register = None
+
+    def __repr__(self):
+        return f"Interval({self.variable.name}, {self.start}-{self.end}, {self.register})"
+
+
+class Allocation:
+    """Result of allocating one function."""
+
+    def __init__(self):
+        self.registers = {}         # variable -> register
+        self.spilled = []           # variables left in memory
+        self.saved_across = {}      # LCall instr -> [$t registers to save around it]
+        self.callee_saved = []      # $s registers the prologue must save
+        self.formal_loads = []      # (formal, register) loaded by the prologue
+
+    def register_for(self, operand):
+        return self.registers.get(operand)
+
+
+def allocatable(variable):
+    return isinstance(variable, Temp) or (isinstance(variable, Symbol) and not variable.is_global)
+
+
+def build_intervals(function):
+    """
+    Returns (intervals sorted by start, [(call position, call instr, live-across bitset)],
+    liveness). Formals live on entry start at position -1, where the
+    prologue loads them.
+    """
+    cfg = build_cfg(function)
+    liveness = Liveness(cfg)
+    index = liveness.index
+    intervals = {}
+    calls = []
+
+    def touch(variable, position):
+        interval = intervals.get(variable)
+        if interval is None:
+            intervals[variable] = Interval(variable, position)
+        else:
+            interval.start = min(interval.start, position)
+            interval.end = max(interval.end, position)
+
+    for formal in function.formals:
+        if liveness.live_in.get(cfg.entry.index, 0) >> index.bit(formal) & 1:
+            touch(formal, -1)
+
+    position = 0
+    for block in cfg.blocks:
+        live_after = liveness.live_after(block)
+        for instr, live in zip(block.instrs, live_after):
+            for variable in instr.defines() + tuple(instr.uses()):
+                if allocatable(variable):
+                    touch(variable, position)
+            for variable in index.decode(live):
+                if allocatable(variable):
+                    touch(variable, position)
+            if isinstance(instr, LCall):
+                across = live & ~index.mask(instr.defines())
+                calls.append((position, instr, across))
+            position += 1
+
+    for _, instr, across in calls:
+        for variable in index.decode(across):
+            if variable in intervals:
+                intervals[variable].crosses_call = True
+
+    return sorted(intervals.values(), key=lambda interval: (interval.start, interval.end)), calls, liveness
+
+
+def allocate_registers(function):
+    intervals, calls, liveness = build_intervals(function)
+    allocation = Allocation()
+    free = {register: True for register in CALLER_SAVED + CALLEE_SAVED}
+    active = []         # intervals holding a register, sorted by end
+
+    def take(interval, register):
+        free[register] = False
+        interval.register = register
+        active.append(interval)
+        active.sort(key=lambda other: other.end)
+
+    for interval in intervals:
+        # Expire intervals that ended before this one starts
+        while active and active[0].end < interval.start:
+            free[active.pop(0).register] = True
+
+        preferred = (CALLEE_SAVED + CALLER_SAVED) if interval.crosses_call else (CALLER_SAVED + CALLEE_SAVED)
+        register = next((candidate for candidate in preferred if free[candidate]), None)
+        if register is not None:
+            take(interval, register)
+            continue
+
+        # Under pressure: spill whichever interval ends last
+        victim = active[-1]
+        if victim.end > interval.end:
+            register = victim.register
+            victim.register = None
+            active.pop()
+            allocation.spilled.append(victim.variable)
+            take(interval, register)
+        else:
+            allocation.spilled.append(interval.variable)
+
+    for interval in intervals:
+        if interval.register is not None:
+            allocation.registers[interval.variable] = interval.register
+            if interval.register in CALLEE_SAVED and interval.register not in allocation.callee_saved:
+                allocation.callee_saved.append(interval.register)
+            if interval.start == -1:
+                allocation.formal_loads.append((interval.variable, interval.register))
+
+    index = liveness.index
+    for _, instr, across in calls:
+        saved = sorted({allocation.registers[variable] for variable in index.decode(across)
+                        if allocation.registers.get(variable) in CALLER_SAVED})
+        if saved:
+            allocation.saved_across[instr] = saved
+    allocation.callee_saved.sort()
+    return allocation
@@ -0,0 +1,107 @@
+# sccp.py
+"""
+Conditional constant propagation over a whole function's CFG.
+
+The analysis is optimistic about control flow: only edges proven
+executable carry facts, starting from the entry. A block's state maps
+each variable known to hold a constant to that constant (a missing
+variable may hold anything); the state entering a block is the meet of
+the states leaving its executable predecessors, keeping only variables on
+which they all agree. An IfZ on a constant makes just one of its edges
+executable, so constants set before an if/while/for survive the join when
+the other arm is never taken. Facts only ever shrink, so the worklist
+terminates.
+
+Afterwards blocks that never became executable are deleted, every other
+block is folded with its entry state (constant_folding.fold_block), which
+also turns the decided IfZs into Gotos or nothing. Gotos to the very next
+instruction go, and so do labels no jump targets any more.
+"""
+from binding import Symbol
+from cfg import build_cfg, tidy_jumps
+from constant_folding import evaluate, fold_block
+from tac import Assign, BinOp, IfZ, LCall
+
+
+def propagate_constants(function):
+    """Runs the pass on one TacFunction. Returns the change count."""
+    cfg = build_cfg(function)
+    states = analyze(cfg)
+
+    code = []
+    changes = 0
+    for block in cfg.blocks:
+        if block.index not in states:
+            changes += len(block.instrs)
+            continue
+        block_code, block_changes = fold_block(block.instrs, dict(states[block.index]))
+        code.extend(block_code)
+        changes += block_changes
+
+    # A decided branch often leaves "Goto L" right before "L:"
+    function.code, dropped = tidy_jumps(code)
+    return changes + dropped
+
+
+def analyze(cfg):
+    """{block index: constants on entry} for every block found executable."""
+    states = {cfg.entry.index: {}}
+    worklist = [cfg.entry]
+    while worklist:
+        block = worklist.pop()
+        state = transfer(block, states[block.index])
+        for succ in executable_successors(cfg, block, state):
+            old = states.get(succ.index)
+            new = dict(state) if old is None else meet(old, state)
+            if old is None or new != old:
+                states[succ.index] = new
+                worklist.append(succ)
+    return states
+
+
+def meet(left, right):
+    return {variable: value for variable, value in left.items() if right.get(variable) == value}
+
+
+def constant_of(operand, state):
+    if isinstance(operand, int):
+        return operand
+    return state.get(operand)
+
+
+def transfer(block, state):
+    """Constants after the block's instructions, given those before."""
+    state = dict(state)
+    for instr in block.instrs:
+        result = None
+        if isinstance(instr, Assign):
+            result = constant_of(instr.src, state)
+        elif isinstance(instr, BinOp):
+            left = constant_of(instr.left, state)
+            right = constant_of(instr.right, state)
+            if left is not None and right is not None:
+                result = evaluate(instr.op, left, right)
+
+        for variable in instr.defines():
+            state.pop(variable, None)
+            if result is not None:
+                state[variable] = result
+        if isinstance(instr, LCall):
+            # The callee may assign any global
+            for variable in [variable for variable in state if isinstance(variable, Symbol) and variable.is_global]:
+                del state[variable]
+    return state
+
+
+def executable_successors(cfg, block, state):
+    last = block.terminator
+    if not isinstance(last, IfZ):
+        return block.succs
+    cond = constant_of(last.cond, state)
+    if cond is None:
+        return block.succs
+    if cond == 0:
+        return [cfg.block_for_label(last.label)]
+    # Falls through to the next block
+    following = block.index + 1
+    return [cfg.blocks[following]] if following < len(cfg.blocks) else []
@@ -1,42 +1,75 @@
 # semantic_analyzer.py
+import gc
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 from helper_functions import (
     semantic_error,
     find_token_on_line,
     get_line_content,
     make_pointer_line,
-    push_scope,
-    pop_scope,
-    initialize_scope_system,
-    declare,
-    is_declared_in_scope,
-    lookup,
     get_declared_type,
     get_token_range_on_line,
     get_token_range_between
 )
+from ast_visitor import make_dispatcher
+from symbol_table import SymbolTable
+
+def make_semantic_context(tokens, symbols=None):
+    """
+    Creates the per-compilation state threaded through every check_* function.
+    Nothing is kept at module level, so independent compilations can run
+    side by side in threads.
+    """
+    return {
+        "tokens": tokens,
+        "symbols": symbols if symbols is not None else SymbolTable(),
+        "errors": [],            # accumulated semantic error messages
+        "inside_loop": 0,        # loop nesting depth, used like a counter
+        "current_return_type": None,
+    }
+
+def check_semantics(ast_root, tokens, workers=None):
+    """
+    Runs both semantic passes over the program and returns the error list.
+    A fresh context (and SymbolTable) is created here and passed down explicitly.
+    With workers > 1 the function bodies are checked in a process pool;
+    errors come back in source order, so the output is the same either way.
+    workers is capped at the CPUs this process may run on: extra workers
+    only time-slice, so with one CPU the check stays serial.
+    """
+    context = make_semantic_context(tokens)
+    declare_globals(ast_root, context)
 
-errors = []  # Global list to accumulate semantic errors
-scope_stack = []         # List of dictionaries, one per scope level
-scope_names = []         # Optional: human-readable labels
-inside_loop = 0  # Used like a counter
-current_return_type = None
+    # Second pass: fully analyze functions
+    fn_entries = [decl for decl in ast_root["Program"] if "FnDecl" in decl]
+    workers = min(workers or 1, available_cpus())
+    if workers > 1 and len(fn_entries) > 1:
+        context["errors"].extend(check_functions_parallel(fn_entries, context, workers))
+    else:
+        for entry in fn_entries:
+            check_function_declaration(entry["FnDecl"], context)
 
-def check_semantics(ast_root, tokens):
-    global errors
-    errors = []
-    initialize_scope_system()
+    return context["errors"]
+
+def declare_globals(ast_root, context):
+    """
+    First pass: declares every function and global variable in the global
+    scope, reporting duplicates. After this the global scope is read-only.
+    """
+    tokens = context["tokens"]
+    symbols = context["symbols"]
 
-    # First pass: declare all functions and global variables
     for decl in ast_root["Program"]:
         if "FnDecl" in decl:
             fn_decl = decl["FnDecl"]
             fn_name = fn_decl["identifier"]["Identifier"]["name"]
-            if is_declared_in_scope("global", fn_name):
+            if symbols.is_declared_in_scope(fn_name):
                 token = find_token_on_line(tokens, fn_decl["line_num"], match_text=fn_name)
                 msg = f"Declared identifier '{fn_name}' more than once in same scope"
-                errors.append(semantic_error(tokens, token, msg, underline=True))
+                context["errors"].append(semantic_error(tokens, token, msg, underline=True))
             else:
-                declare("global", fn_name, fn_decl)
+                symbols.declare(fn_name, fn_decl)
 
         elif "VarDecl" in decl:
             var_decl = decl["VarDecl"]
@@ -46,72 +79,90 @@ def check_semantics(ast_root, tokens):
             else:
                 var_name = id_info
 
-            if is_declared_in_scope("global", var_name):
+            if symbols.is_declared_in_scope(var_name):
                 token = find_token_on_line(tokens, var_decl["line_num"], match_text=var_name)
                 msg = f"Declared identifier '{var_name}' more than once in same scope"
-                errors.append(semantic_error(tokens, token, msg, underline=True))
+                context["errors"].append(semantic_error(tokens, token, msg, underline=True))
             else:
-                declare("global", var_name, var_decl)
+                symbols.declare(var_name, var_decl)
 
-    # Second pass: fully analyze functions
-    for decl in ast_root["Program"]:
-        if "FnDecl" in decl:
-            check_function_declaration(decl["FnDecl"], tokens)
+def available_cpus():
+    """Number of CPUs this process may be scheduled on."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
 
-    return errors
+# Per-process state for pool workers, set by _init_semantic_worker().
+# The parent process never reads it.
+_worker_state = None
 
-def check_program(declarations, tokens):
+def _init_semantic_worker(tokens, global_bindings, fn_decls):
     """
-    Processes top-level declarations (global variables and functions).
-    Now supports two-pass processing:
-    - Pass 1: Declare all global variables and functions
-    - Pass 2: Check contents of functions and variable types
+    Pool initializer: builds this worker's context around a frozen copy of
+    the global scope. Runs once per worker process, so the tokens and
+    function list are transferred once instead of with every task.
     """
-    print("[check_program] 🚀 Starting two-pass declaration processing")
-
-    # Pass 1: Declare global variables and functions
-    for decl in declarations:
-        if "VarDecl" in decl:
-            var_decl = decl["VarDecl"]
-            id_info = var_decl["identifier"]
-            # Handle both top-level VarDecls and formals
-            if isinstance(id_info, dict) and "Identifier" in id_info:
-                var_name = id_info["Identifier"]["name"]
-            else:
-                var_name = id_info
+    global _worker_state
+    symbols = SymbolTable.from_globals(global_bindings)
+    _worker_state = (make_semantic_context(tokens, symbols), fn_decls)
 
-            print(f"[check_program] 🧾 Declaring global variable: {var_name}")
-
-            if is_declared_in_scope("global", var_name):
-                token = find_token_on_line(tokens, var_decl["line_num"], match_text=var_name)
-                msg = f"*** Declared identifier '{var_name}' more than once in same scope"
-                errors.append(semantic_error(tokens, token, msg))
-            else:
-                declare("global", var_name, var_decl)
-
-        elif "FnDecl" in decl:
-            fn_name = decl["FnDecl"]["identifier"]["Identifier"]["name"]
-            print(f"[check_program] 🧾 Declaring global function: {fn_name}")
-            if is_declared_in_scope("global", fn_name):
-                token = find_token_on_line(tokens, decl["FnDecl"]["line_num"], match_text=fn_name)
-                msg = f"*** Declared identifier '{fn_name}' more than once in same scope"
-                errors.append(semantic_error(tokens, token, msg))
-            else:
-                declare("global", fn_name, decl["FnDecl"])
+def _check_function_slice(bounds):
+    """
+    Checks functions fn_decls[start:stop] inside a worker and returns
+    their errors in source order, plus the checked functions themselves:
+    the parent's copy of the AST is not annotated.
+    """
+    context, fn_decls = _worker_state
+    context["errors"] = []
+    start, stop = bounds
+    checked = fn_decls[start:stop]
+    for fn_decl in checked:
+        check_function_declaration(fn_decl, context)
+    return context["errors"], checked
+
+def check_functions_parallel(fn_entries, context, workers):
+    """
+    Second pass over a process pool. fn_entries are the program's
+    {"FnDecl": ...} declarations. Each worker receives the tokens, the
+    global scope and the function list once, then checks contiguous index
+    ranges. pool.map keeps range order, so the merged errors are in source
+    order. Each worker's annotated copy of a function replaces the
+    parent's in its declaration entry, so nothing is walked twice.
+
+    The pool is created per call on purpose: forked workers inherit the
+    initargs, while a pool kept across calls would have to pickle the
+    tokens and AST for every compilation, which costs more than the check.
+    """
+    fn_decls = [entry["FnDecl"] for entry in fn_entries]
+    workers = min(workers, len(fn_decls))
+    # A few ranges per worker keeps the pool busy when bodies differ in size
+    slice_size = max(1, -(-len(fn_decls) // (workers * 4)))
+    bounds = [(i, i + slice_size) for i in range(0, len(fn_decls), slice_size)]
 
-    # Pass 2: Perform full semantic checks
-    print("[check_program] 🔍 Starting semantic analysis on declarations")
-    for decl in declarations:
-        if "VarDecl" in decl:
-            check_variable_declaration(decl["VarDecl"], tokens, "global")
-        elif "FnDecl" in decl:
-            check_function_declaration(decl["FnDecl"], tokens)
+    errors = []
+    initargs = (context["tokens"], context["symbols"].global_bindings(), fn_decls)
+    # Unpickling the returned subtrees allocates millions of containers;
+    # with the collector running it scans the growing AST over and over.
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with ProcessPoolExecutor(workers, initializer=_init_semantic_worker, initargs=initargs) as pool:
+            for (start, stop), (slice_errors, checked) in zip(bounds, pool.map(_check_function_slice, bounds)):
+                errors.extend(slice_errors)
+                for entry, fn_decl in zip(fn_entries[start:stop], checked):
+                    entry["FnDecl"] = fn_decl
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return errors
 
-def check_variable_declaration(vardecl, tokens, scope_name):
+def check_variable_declaration(vardecl, context):
     """
     Validates a variable declaration.
     Adds it to the current scope if not already declared.
     """
+    tokens = context["tokens"]
+    symbols = context["symbols"]
     if isinstance(vardecl["identifier"], dict) and "Identifier" in vardecl["identifier"]:
         var_name = vardecl["identifier"]["Identifier"]["name"]
     else:
@@ -121,56 +172,58 @@ def check_variable_declaration(vardecl, tokens, scope_name):
     line_num = vardecl["line_num"]
 
     # Check for duplicate declaration
-    if is_declared_in_scope(scope_name, var_name):
+    if symbols.is_declared_in_scope(var_name):
         token = find_token_on_line(tokens, line_num, match_text=var_name)
         msg = f"*** Declared identifier '{var_name}' more than once in same scope"
-        errors.append(semantic_error(tokens, token, msg))
+        context["errors"].append(semantic_error(tokens, token, msg))
         return
 
     # Add to current scope
-    declare(scope_name, var_name, var_type)
+    symbols.declare(var_name, var_type)
 
-def check_function_declaration(fndecl, tokens):
+def check_function_declaration(fndecl, context):
     """
     Validates a function declaration and its parameters/body.
     Creates separate scopes for parameters and body.
     """
+    symbols = context["symbols"]
     fn_name = fndecl["identifier"]["Identifier"]["name"]
     line_num = fndecl["line_num"]
 
     # Enter parameter scope
-    param_scope = push_scope(f"params:{fn_name}")
+    symbols.push_scope(f"params:{fn_name}")
     for formal in fndecl["formals"]:
-        check_variable_declaration(formal["VarDecl"], tokens, param_scope)
+        check_variable_declaration(formal["VarDecl"], context)
 
-    global current_return_type
-    current_return_type = get_declared_type(fndecl)
+    context["current_return_type"] = get_declared_type(fndecl)
 
 
     # Enter function body scope
-    body_scope = push_scope(f"body:{fn_name}")
-    check_statement_block(fndecl["body"], tokens, body_scope)
+    symbols.push_scope(f"body:{fn_name}")
+    check_statement_block(fndecl["body"], context)
 
-    pop_scope()  # Exit body scope
-    pop_scope()  # Exit param scope
+    symbols.pop_scope()  # Exit body scope
+    symbols.pop_scope()  # Exit param scope
 
-def check_function_call(call_node, tokens, scope_name):
+def check_function_call(call_node, context):
     """
     Checks if a function being called is declared and validates arguments.
     """
+    tokens = context["tokens"]
+    symbols = context["symbols"]
     fn_name = call_node["identifier"]
     actuals = call_node.get("actuals", [])
     line_num = call_node["line_num"]
 
-    fn_info = lookup(fn_name)
+    fn_info = symbols.lookup(fn_name)
     if fn_info is None:
         token = find_token_on_line(tokens, line_num, match_text=fn_name)
-        errors.append(semantic_error(tokens, token, f"No declaration for Function '{fn_name}' found"))
+        context["errors"].append(semantic_error(tokens, token, f"No declaration for Function '{fn_name}' found"))
         return
 
     if fn_name == "Print":
         for i, actual_expr in enumerate(actuals, start=1):
-            actual_type = get_expression_type(actual_expr, tokens, scope_name)
+            actual_type = get_expression_type(actual_expr, context)
 
             if actual_type not in ("int", "bool", "string") and actual_type != "error":
                 line = actual_expr.get("line_num", line_num)
@@ -197,7 +250,7 @@ def check_function_call(call_node, tokens, scope_name):
                     token = find_token_on_line(tokens, line)
 
                 # Now emit the semantic error under the actual argument
-                errors.append(semantic_error(
+                context["errors"].append(semantic_error(
                     tokens,
                     token,
                     f"Incompatible argument {i}: {actual_type} given, int/bool/string expected",
@@ -209,7 +262,7 @@ def check_function_call(call_node, tokens, scope_name):
     # Check that the symbol is actually a function
     if not isinstance(fn_info, dict) or "formals" not in fn_info:
         token = find_token_on_line(tokens, line_num, match_text=fn_name)
-        errors.append(semantic_error(tokens, token, f"No declaration for Function '{fn_name}' found"))
+        context["errors"].append(semantic_error(tokens, token, f"No declaration for Function '{fn_name}' found"))
         return
 
     formals = fn_info["formals"]
@@ -219,7 +272,7 @@ def check_function_call(call_node, tokens, scope_name):
     # Check for argument count mismatch
     if expected_count != actual_count:
         token = find_token_on_line(tokens, line_num, match_text=fn_name)
-        errors.append(semantic_error(tokens, token,
+        context["errors"].append(semantic_error(tokens, token,
             f"Function '{fn_name}' expects {expected_count} arguments but {actual_count} given", True))
         return  # don't bother type checking if count is wrong
 
@@ -230,7 +283,7 @@ def check_function_call(call_node, tokens, scope_name):
         else:
             expected_type = get_declared_type(formal)
 
-        actual_type = get_expression_type(actual_expr, tokens, scope_name)
+        actual_type = get_expression_type(actual_expr, context)
 
         if expected_type != actual_type and actual_type != "error":
             # Attempt to find the token that corresponds to the actual expression
@@ -268,10 +321,10 @@ def check_function_call(call_node, tokens, scope_name):
                 token = find_token_on_line(tokens, line)
 
             # Now use that token for error
-            errors.append(semantic_error(tokens, token,
+            context["errors"].append(semantic_error(tokens, token,
                 f"Incompatible argument {i}: {actual_type} given, {expected_type} expected", underline=True))
 
-def check_statement_block(stmtblock, tokens, scope_name):
+def check_statement_block(stmtblock, context):
     """
     Checks all statements and variable declarations inside a block.
     Supports both {"StmtBlock": [...] } and raw [...] list structures.
@@ -283,215 +336,147 @@ def check_statement_block(stmtblock, tokens, scope_name):
 
     for stmt in block:
         if "VarDecl" in stmt:
-            check_variable_declaration(stmt["VarDecl"], tokens, scope_name)
+            check_variable_declaration(stmt["VarDecl"], context)
         else:
 
-            check_statement(stmt, tokens, scope_name)
+            check_statement(stmt, context)
 
-def check_statement(stmt, tokens, scope_name):
+def check_nested_block(block, context):
     """
-    Dispatches to specific check functions based on statement type.
-    Each case is defined, but we are not calling the functions yet.
+    Checks a block nested inside a function body in a scope of its own, so
+    its declarations may shadow outer names and end with the block.
     """
-    if "ReturnStmt" in stmt:
-        check_return_statement(stmt["ReturnStmt"], tokens, scope_name)
-        
-    elif "AssignExpr" in stmt:
-        check_assign_expression(stmt["AssignExpr"], tokens, scope_name)
-       
-    elif "BreakStmt" in stmt:
-        check_break_statement(stmt["BreakStmt"], tokens)
-        
-    elif "IfStmt" in stmt:
-        check_if_statement(stmt["IfStmt"], tokens, scope_name)
-        pass
-
-    elif "ForStmt" in stmt:
-        check_for_statement(stmt["ForStmt"], tokens, scope_name)
-
-    elif "WhileStmt" in stmt:
-        check_while_statement(stmt["WhileStmt"], tokens, scope_name)
-      
-    elif "PrintStmt" in stmt:
-        #print("📣 Entered PrintStmt block in check_statement()")
-        check_print_statement(stmt["PrintStmt"], tokens, scope_name)
-
-    elif "Call" in stmt:
-        check_function_call(stmt["Call"], tokens, scope_name)
-
-    elif "StmtBlock" in stmt:
-        check_statement_block(stmt["StmtBlock"], tokens, scope_name)
-    
-    elif "ArithmeticExpr" in stmt:
-        get_expression_type(stmt["ArithmeticExpr"], tokens, scope_name)
-
-    elif "LogicalExpr" in stmt:
-        get_expression_type(stmt["LogicalExpr"], tokens, scope_name)
-
-    elif "EqualityExpr" in stmt:
-        get_expression_type(stmt["EqualityExpr"], tokens, scope_name)
-
-    elif "RelationalExpr" in stmt:
-        get_expression_type(stmt["RelationalExpr"], tokens, scope_name)
-
-    elif "Call" in stmt:
-        get_expression_type(stmt["Call"], tokens, scope_name)
-
-def get_expression_type(expr, tokens, scope_name):
-    """
-    Determines the type of an expression.
-    Starts with constants and variables.
-    """
-    if "IntConstant" in expr:
-        return "int"
-    if "DoubleConstant" in expr:
-        return "double"
-    if "BoolConstant" in expr:
-        return "bool"
-    if "StringConstant" in expr:
-        return "string"
-    if "ReadIntegerExpr" in expr:
-        return "int"
-    if "ReadLine" in expr:
-        return "string"
-
-    if "FieldAccess" in expr:
-        var_name = expr["FieldAccess"]["identifier"]
-        decl = lookup(var_name)
-
-        if decl is None:
-            line_num = expr["FieldAccess"]["line_num"]
-            token = find_token_on_line(tokens, line_num, match_text=var_name)
-            errors.append(semantic_error(tokens, token, f"No declaration for Variable '{var_name}' found", underline=True))
-            return "error"
-
-        # If it's a function declaration, accessing it like a variable is invalid
-        if isinstance(decl, dict) and "formals" in decl:
-            line_num = expr["FieldAccess"]["line_num"]
-            token = find_token_on_line(tokens, line_num, match_text=var_name)
-            errors.append(semantic_error(tokens, token, f"No declaration found for variable '{var_name}'", underline=True))
-            return "error"
-
-        return get_declared_type(decl)
-
-    # ArithmeticExpr (wrapped or bare)
-    if "ArithmeticExpr" in expr:
-        node = expr["ArithmeticExpr"]
-    elif "operator" in expr and "left" in expr and "right" in expr:
-        if expr["operator"] in ["+", "-", "*", "/", "%"]:
-            node = expr
-        else:
-            node = None
-    else:
-        node = None
+    symbols = context["symbols"]
+    symbols.push_scope("block")
+    check_statement_block(block, context)
+    symbols.pop_scope()
 
-    if node:
-        left_type = get_expression_type(node["left"], tokens, scope_name)
-        right_type = get_expression_type(node["right"], tokens, scope_name)
-        op = node["operator"]
-        line_num = node["line_num"]
-
-        if left_type == "error" or right_type == "error":
-            return "error"
+def check_statement(stmt, context):
+    """
+    Dispatches to specific check functions based on statement type.
+    The handler table is STATEMENT_CHECKS at the bottom of this module.
+    """
+    _dispatch_statement(stmt, context)
 
-        if left_type != right_type or left_type not in ("int", "double"):
-            token = find_token_on_line(tokens, line_num, match_text=op)
-            msg = semantic_error(tokens, token, f"Incompatible operands: {left_type} {op} {right_type}", underline=True)
-            errors.append(msg)
-            return "error"
+def check_empty_statement(node, context):
+    """
+    Empty for-loop clauses need no checking.
+    """
+    return None
 
-        return left_type
+def get_expression_type(expr, context):
+    """
+    Determines the type of an expression and records it on the node
+    (payload["expr_type"]).
+    Dispatches on the node kind through EXPRESSION_TYPES; bare operator
+    dicts (without a wrapper key) are classified by their operator.
+    """
+    return _dispatch_expression(expr, context)
 
-    # LogicalExpr (wrapped or bare)
-    if "LogicalExpr" in expr:
-        node = expr["LogicalExpr"]
-    elif "operator" in expr:
-        if expr["operator"] in ["&&", "||", "!"]:
-            node = expr
-        else:
-            node = None
-    else:
-        node = None
+def type_of_field_access(node, context):
+    tokens = context["tokens"]
+    symbols = context["symbols"]
+    var_name = node["identifier"]
+    decl = symbols.lookup(var_name)
 
-    if node and "operator" in node:
-        op = node["operator"]
+    if decl is None:
         line_num = node["line_num"]
+        token = find_token_on_line(tokens, line_num, match_text=var_name)
+        context["errors"].append(semantic_error(tokens, token, f"No declaration for Variable '{var_name}' found", underline=True))
+        return "error"
 
-        if "left" in node:
-            left_type = get_expression_type(node["left"], tokens, scope_name)
-            right_type = get_expression_type(node["right"], tokens, scope_name)
-            if left_type != "bool" or right_type != "bool":
-                token = find_token_on_line(tokens, line_num, match_text=op)
-                errors.append(semantic_error(tokens, token, f"Incompatible operands: {left_type} {op} {right_type}", underline=True))
-                return "error"
-        else:
-            right_type = get_expression_type(node["right"], tokens, scope_name)
-            if right_type != "bool":
-                token = find_token_on_line(tokens, line_num, match_text=op)
-                errors.append(semantic_error(tokens, token, f"Incompatible operand: {op} {right_type}", underline=True))
-                return "error"
-        return "bool"
-
-    # EqualityExpr (wrapped or bare)
-    if "EqualityExpr" in expr:
-        node = expr["EqualityExpr"]
-    elif "operator" in expr and expr["operator"] in ["==", "!="]:
-        node = expr
-    else:
-        node = None
-
-    if node:
-        left_type = get_expression_type(node["left"], tokens, scope_name)
-        right_type = get_expression_type(node["right"], tokens, scope_name)
-        op = node["operator"]
+    # If it's a function declaration, accessing it like a variable is invalid
+    if isinstance(decl, dict) and "formals" in decl:
         line_num = node["line_num"]
-
-        if left_type != right_type:
+        token = find_token_on_line(tokens, line_num, match_text=var_name)
+        context["errors"].append(semantic_error(tokens, token, f"No declaration found for variable '{var_name}'", underline=True))
+        return "error"
+
+    return get_declared_type(decl)
+
+def type_of_arithmetic_expr(node, context):
+    tokens = context["tokens"]
+    left_type = get_expression_type(node["left"], context)
+    right_type = get_expression_type(node["right"], context)
+    op = node["operator"]
+    line_num = node["line_num"]
+
+    if left_type == "error" or right_type == "error":
+        return "error"
+
+    if left_type != right_type or left_type not in ("int", "double"):
+        token = find_token_on_line(tokens, line_num, match_text=op)
+        msg = semantic_error(tokens, token, f"Incompatible operands: {left_type} {op} {right_type}", underline=True)
+        context["errors"].append(msg)
+        return "error"
+
+    return left_type
+
+def type_of_logical_expr(node, context):
+    tokens = context["tokens"]
+    op = node["operator"]
+    line_num = node["line_num"]
+
+    if "left" in node:
+        left_type = get_expression_type(node["left"], context)
+        right_type = get_expression_type(node["right"], context)
+        if left_type != "bool" or right_type != "bool":
             token = find_token_on_line(tokens, line_num, match_text=op)
-            errors.append(semantic_error(tokens, token, f"Incompatible operands: {left_type} {op} {right_type}", underline=True))
+            context["errors"].append(semantic_error(tokens, token, f"Incompatible operands: {left_type} {op} {right_type}", underline=True))
             return "error"
-
-        return "bool"
-
-    # RelationalExpr (wrapped or bare)
-    if "RelationalExpr" in expr:
-        node = expr["RelationalExpr"]
-    elif "operator" in expr and expr["operator"] in ["<", "<=", ">", ">="]:
-        node = expr
     else:
-        node = None
-
-    if node:
-        left_type = get_expression_type(node["left"], tokens, scope_name)
-        right_type = get_expression_type(node["right"], tokens, scope_name)
-        op = node["operator"]
-        line_num = node["line_num"]
-
-        if left_type == "error" or right_type == "error":
-            return "error"
-
-        if left_type != right_type or left_type not in ("int", "double"):
+        right_type = get_expression_type(node["right"], context)
+        if right_type != "bool":
             token = find_token_on_line(tokens, line_num, match_text=op)
-            errors.append(semantic_error(tokens, token, f"Incompatible operands: {left_type} {op} {right_type}", underline=True))
+            context["errors"].append(semantic_error(tokens, token, f"Incompatible operand: {op} {right_type}", underline=True))
             return "error"
-
-        return "bool"
-
-    # Function Call
-    if "Call" in expr:
-        node = expr["Call"]
-        check_function_call(node, tokens, scope_name)
-        fn_info = lookup(node["identifier"])
-        if fn_info and "type" in fn_info:
-            return get_declared_type(fn_info["type"])
-        return "int"
-
-    return "error"
-
-def check_assign_expression(assign_node, tokens, scope_name):
+    return "bool"
+
+def type_of_equality_expr(node, context):
+    tokens = context["tokens"]
+    left_type = get_expression_type(node["left"], context)
+    right_type = get_expression_type(node["right"], context)
+    op = node["operator"]
+    line_num = node["line_num"]
+
+    if left_type != right_type:
+        token = find_token_on_line(tokens, line_num, match_text=op)
+        context["errors"].append(semantic_error(tokens, token, f"Incompatible operands: {left_type} {op} {right_type}", underline=True))
+        return "error"
+
+    return "bool"
+
+def type_of_relational_expr(node, context):
+    tokens = context["tokens"]
+    left_type = get_expression_type(node["left"], context)
+    right_type = get_expression_type(node["right"], context)
+    op = node["operator"]
+    line_num = node["line_num"]
+
+    if left_type == "error" or right_type == "error":
+        return "error"
+
+    if left_type != right_type or left_type not in ("int", "double"):
+        token = find_token_on_line(tokens, line_num, match_text=op)
+        context["errors"].append(semantic_error(tokens, token, f"Incompatible operands: {left_type} {op} {right_type}", underline=True))
+        return "error"
+
+    return "bool"
+
+def type_of_call(node, context):
+    symbols = context["symbols"]
+    check_function_call(node, context)
+    fn_info = symbols.lookup(node["identifier"])
+    if fn_info and "type" in fn_info:
+        return get_declared_type(fn_info["type"])
+    return "int"
+
+def check_assign_expression(assign_node, context):
     """
     Checks the structure of an assignment and extracts the target variable name.
     """
+    tokens = context["tokens"]
+    symbols = context["symbols"]
     line_num = assign_node["line_num"]
     target = assign_node["target"]
     value = assign_node["value"]
@@ -499,26 +484,27 @@ def check_assign_expression(assign_node, tokens, scope_name):
     if "FieldAccess" in target:
         var_name = target["FieldAccess"]["identifier"]
 
-        var_info = lookup(var_name)
+        var_info = symbols.lookup(var_name)
         if var_info is None:
             token = find_token_on_line(tokens, line_num, match_text=var_name)
-            errors.append(semantic_error(tokens, token, f"No declaration for Variable '{var_name}' found"))
+            context["errors"].append(semantic_error(tokens, token, f"No declaration for Variable '{var_name}' found"))
             return
         
         lhs_type = get_declared_type(var_info)
-        rhs_type = get_expression_type(value, tokens, scope_name)
+        rhs_type = get_expression_type(value, context)
 
         if lhs_type != rhs_type and lhs_type != "error" and rhs_type != "error":
             token = find_token_on_line(tokens, line_num, match_text='=')
-            errors.append(semantic_error(tokens, token, f"Incompatible operands: {lhs_type} = {rhs_type}"))
+            context["errors"].append(semantic_error(tokens, token, f"Incompatible operands: {lhs_type} = {rhs_type}"))
 
-def check_if_statement(if_stmt, tokens, scope_name):
+def check_if_statement(if_stmt, context):
     """
     Checks the condition and both branches of an if statement.
     """
+    tokens = context["tokens"]
     if "test" in if_stmt:
         test_expr = if_stmt["test"]
-        test_type = get_expression_type(test_expr, tokens, scope_name)
+        test_type = get_expression_type(test_expr, context)
         if test_type != "bool" and test_type != "error":
             line_num = test_expr.get("line_num", if_stmt["line_num"])
             start_tok = None
@@ -554,28 +540,28 @@ def check_if_statement(if_stmt, tokens, scope_name):
                 None,
             )
 
-            errors.append(
+            context["errors"].append(
                 semantic_error(
                     tokens, token, "Test expression must have boolean type", underline=True
                 )
             )
 
     if "then" in if_stmt:
-        check_statement(if_stmt["then"], tokens, scope_name)
+        check_statement(if_stmt["then"], context)
 
     if "else" in if_stmt:
-        check_statement(if_stmt["else"], tokens, scope_name)
+        check_statement(if_stmt["else"], context)
 
-def check_for_statement(for_stmt, tokens, scope_name):
-    global inside_loop
-    inside_loop += 1
+def check_for_statement(for_stmt, context):
+    tokens = context["tokens"]
+    context["inside_loop"] += 1
 
     if "init" in for_stmt and for_stmt["init"] is not None:
-        check_statement(for_stmt["init"], tokens, scope_name)
+        check_statement(for_stmt["init"], context)
 
     if "test" in for_stmt and for_stmt["test"] is not None:
         test_expr = for_stmt["test"]
-        test_type = get_expression_type(test_expr, tokens, scope_name)
+        test_type = get_expression_type(test_expr, context)
         if test_type != "bool" and test_type != "error":
             line_num = test_expr.get("line_num", for_stmt["line_num"])
             line_tokens = [tok for tok in tokens if tok[1] == line_num]
@@ -598,21 +584,21 @@ def check_for_statement(for_stmt, tokens, scope_name):
                 end_tok = start_tok
 
             token = ("[for-test-expr]", line_num, start_tok[2], end_tok[3], None, None)
-            errors.append(semantic_error(tokens, token, "Test expression must have boolean type", underline=True))
+            context["errors"].append(semantic_error(tokens, token, "Test expression must have boolean type", underline=True))
 
     if "step" in for_stmt and for_stmt["step"] is not None:
-        check_statement(for_stmt["step"], tokens, scope_name)
+        check_statement(for_stmt["step"], context)
 
-    check_statement(for_stmt["body"], tokens, scope_name)
-    inside_loop -= 1
+    check_statement(for_stmt["body"], context)
+    context["inside_loop"] -= 1
 
-def check_while_statement(while_stmt, tokens, scope_name):
-    global inside_loop
-    inside_loop += 1
+def check_while_statement(while_stmt, context):
+    tokens = context["tokens"]
+    context["inside_loop"] += 1
 
     if "test" in while_stmt:
         test_expr = while_stmt["test"]
-        test_type = get_expression_type(test_expr, tokens, scope_name)
+        test_type = get_expression_type(test_expr, context)
         if test_type != "bool" and test_type != "error":
             line_num = test_expr.get("line_num", while_stmt["line_num"])
             line_tokens = [tok for tok in tokens if tok[1] == line_num]
@@ -635,28 +621,30 @@ def check_while_statement(while_stmt, tokens, scope_name):
                 end_tok = start_tok
 
             token = ("[while-test-expr]", line_num, start_tok[2], end_tok[3], None, None)
-            errors.append(semantic_error(tokens, token, "Test expression must have boolean type", underline=True))
+            context["errors"].append(semantic_error(tokens, token, "Test expression must have boolean type", underline=True))
 
-    check_statement(while_stmt["body"], tokens, scope_name)
-    inside_loop -= 1
+    check_statement(while_stmt["body"], context)
+    context["inside_loop"] -= 1
 
-def check_break_statement(break_stmt, tokens):
+def check_break_statement(break_stmt, context):
     """
     Verifies that 'break' is only used inside loops.
     """
+    tokens = context["tokens"]
     line_num = break_stmt["line_num"]
 
-    if inside_loop == 0:
+    if context["inside_loop"] == 0:
         token = find_token_on_line(tokens, line_num, match_text="break")
-        errors.append(semantic_error(tokens, token, "break is only allowed inside a loop", underline=True))
+        context["errors"].append(semantic_error(tokens, token, "break is only allowed inside a loop", underline=True))
 
-def check_return_statement(return_stmt, tokens, scope_name):
-    global current_return_type
+def check_return_statement(return_stmt, context):
+    tokens = context["tokens"]
+    current_return_type = context["current_return_type"]
     line_num = return_stmt["line_num"]
 
     # Get the actual return expression type
     if "expr" in return_stmt and return_stmt["expr"] is not None:
-        actual_type = get_expression_type(return_stmt["expr"], tokens, scope_name)
+        actual_type = get_expression_type(return_stmt["expr"], context)
     else:
         actual_type = "void"
 
@@ -673,22 +661,23 @@ def check_return_statement(return_stmt, tokens, scope_name):
         if token is None:
             token = find_token_on_line(tokens, line_num, match_text="return")
 
-        errors.append(semantic_error(
+        context["errors"].append(semantic_error(
             tokens,
             token,
             f"Incompatible return: {actual_type} given, {current_return_type} expected",
             underline=True
         ))
 
-def check_print_statement(print_stmt, tokens, scope_name):
+def check_print_statement(print_stmt, context):
     """
     Checks that all arguments to Print are int, bool, or string.
     """
+    tokens = context["tokens"]
     line_num = print_stmt["line_num"]
     actuals = print_stmt.get("args", [])
 
     for i, expr in enumerate(actuals, start=1):
-        actual_type = get_expression_type(expr, tokens, scope_name)
+        actual_type = get_expression_type(expr, context)
 
         if actual_type not in ("int", "bool", "string") and actual_type != "error":
             line = expr.get("line_num", line_num)
@@ -738,9 +727,66 @@ def check_print_statement(print_stmt, tokens, scope_name):
                 else:
                     token = start_tok or find_token_on_line(tokens, line, match_text=match_text)
 
-            errors.append(semantic_error(
+            context["errors"].append(semantic_error(
                 tokens,
                 token,
                 f"Incompatible argument {i}: {actual_type} given, int/bool/string expected",
                 underline=True
             ))
+
+def _constant_type(type_name):
+    return lambda node, context: type_name
+
+EXPRESSION_TYPES = {
+    "IntConstant": _constant_type("int"),
+    "DoubleConstant": _constant_type("double"),
+    "BoolConstant": _constant_type("bool"),
+    "StringConstant": _constant_type("string"),
+    "ReadIntegerExpr": _constant_type("int"),
+    "ReadLine": _constant_type("string"),
+    # Empty for-loop tests and bare returns carry no type
+    "Empty": _constant_type("error"),
+    "FieldAccess": type_of_field_access,
+    "ArithmeticExpr": type_of_arithmetic_expr,
+    "LogicalExpr": type_of_logical_expr,
+    "EqualityExpr": type_of_equality_expr,
+    "RelationalExpr": type_of_relational_expr,
+    "Call": type_of_call,
+}
+
+# Any expression may also appear as a statement of its own (e.g. `a + 1;`),
+# in which case it is only type checked
+STATEMENT_CHECKS = dict(EXPRESSION_TYPES)
+STATEMENT_CHECKS.update({
+    "ReturnStmt": check_return_statement,
+    "AssignExpr": check_assign_expression,
+    "BreakStmt": check_break_statement,
+    "IfStmt": check_if_statement,
+    "ForStmt": check_for_statement,
+    "WhileStmt": check_while_statement,
+    "PrintStmt": check_print_statement,
+    "Call": check_function_call,
+    "StmtBlock": check_nested_block,
+    "VarDecl": check_variable_declaration,
+    "Empty": check_empty_statement,
+})
+
+_dispatch_statement = make_dispatcher("semantic_analyzer", STATEMENT_CHECKS)
+
+def _recording_type(type_of):
+    """
+    Wraps a type_of_* handler so the resolved type is also stored on the
+    node's payload as "expr_type". Code generation reads it from there
+    instead of working types out again.
+    """
+    def record(node, context):
+        expr_type = type_of(node, context)
+        if type(node) is dict:
+            node["expr_type"] = expr_type
+        return expr_type
+    return record
+
+_dispatch_expression = make_dispatcher(
+    "semantic_analyzer",
+    {kind: _recording_type(type_of) for kind, type_of in EXPRESSION_TYPES.items()},
+)
@@ -0,0 +1,82 @@
+# strength_reduction.py
+"""
+Algebraic simplification and the arithmetic behind strength reduction.
+
+simplify_algebra() is a TAC pass rewriting integer identities into plain
+copies: x+0, x-0, x*1 and x/1 (to x), x*0, x%1, x%-1 and x-x (to 0), and
+x*-1 and x/-1 (to 0-x). Float operators are left alone.
+
+The strength reduction itself happens during instruction selection in
+mips_backend.py (the "strength" backend option): a multiply by a
+power of two becomes a shift, a signed division by a power of two a
+shift sequence that rounds toward zero, a division by any other constant
+a multiply by its magic number (magic_signed()), a remainder by a
+constant the dividend minus quotient * divisor, and adding or subtracting
+a 16-bit constant a single addiu.
+"""
+from tac import wrap32, Assign, BinOp
+
+
+def log2_exact(value):
+    """k if value == 2**k (k >= 0), else None."""
+    if value > 0 and value & (value - 1) == 0:
+        return value.bit_length() - 1
+    return None
+
+
+def magic_signed(divisor):
+    """
+    (multiplier, shift) for signed 32-bit division by divisor, |divisor| >= 2
+    (Hacker's Delight, 10-1): the quotient is the high word of
+    dividend * multiplier, corrected by +dividend when divisor > 0 and
+    multiplier < 0 (-dividend for the opposite signs), shifted right
+    arithmetically by shift, plus one if that is negative.
+    """
+    two31 = 1 << 31
+    magnitude = abs(divisor)
+    t = two31 + (1 if divisor < 0 else 0)
+    anc = t - 1 - t % magnitude         # |nc|
+    p = 31
+    q1, r1 = divmod(two31, anc)
+    q2, r2 = divmod(two31, magnitude)
+    while True:
+        p += 1
+        q1, r1 = 2 * q1, 2 * r1
+        if r1 >= anc:
+            q1, r1 = q1 + 1, r1 - anc
+        q2, r2 = 2 * q2, 2 * r2
+        if r2 >= magnitude:
+            q2, r2 = q2 + 1, r2 - magnitude
+        delta = magnitude - r2
+        if not (q1 < delta or (q1 == delta and r1 == 0)):
+            break
+    multiplier = wrap32(q2 + 1)
+    return (wrap32(-multiplier) if divisor < 0 else multiplier), p - 32
+
+
+def simplify_algebra(function):
+    """Rewrites integer identities into copies. Returns the change count."""
+    changes = 0
+    for position, instr in enumerate(function.code):
+        if isinstance(instr, BinOp):
+            simpler = simplify(instr)
+            if simpler is not None:
+                function.code[position] = simpler
+                changes += 1
+    return changes
+
+
+def simplify(instr):
+    """The copy (or negation) instr reduces to, or None."""
+    op, left, right = instr.op, instr.left, instr.right
+    if op in ("+", "-") and right == 0 or op in ("*", "/") and right == 1:
+        return Assign(instr.dst, left)
+    if op == "+" and left == 0 or op == "*" and left == 1:
+        return Assign(instr.dst, right)
+    if op == "*" and (right == 0 or left == 0) or op == "%" and right in (1, -1):
+        return Assign(instr.dst, 0)
+    if op in ("*", "/") and right == -1:
+        return BinOp(instr.dst, "-", 0, left)
+    if op == "-" and left is right and not isinstance(left, int):
+        return Assign(instr.dst, 0)
+    return None
@@ -0,0 +1,114 @@
+# symbol_table.py
+
+
+class SymbolTable:
+    """
+    Scoped symbol table used by the semantic analyzer.
+
+    Each name maps to a stack of bindings (innermost last), and every open
+    scope keeps an undo log of the names it declared. pop_scope() replays
+    that log to remove exactly those bindings, so lookup() is a single
+    dictionary access no matter how deeply blocks are nested.
+    """
+
+    def __init__(self):
+        self._bindings = {}           # name -> [(depth, entry), ...]
+        self._undo_log = [[]]         # names declared in each open scope
+        self._scope_names = ["global"]
+        self._frozen = False          # True once the global scope is read-only
+        self.global_reads = None      # set to a set() to record global-level lookups
+
+    @property
+    def depth(self):
+        """Index of the current scope (0 is the global scope)."""
+        return len(self._undo_log) - 1
+
+    @property
+    def current_scope_name(self):
+        return self._scope_names[-1]
+
+    def push_scope(self, scope_label):
+        """
+        Opens a new scope.
+        Returns the label for convenience.
+        """
+        self._undo_log.append([])
+        self._scope_names.append(scope_label)
+        return scope_label
+
+    def pop_scope(self):
+        """
+        Closes the current scope, removing every binding it declared.
+        The global scope is never popped.
+        """
+        if self.depth == 0:
+            return
+
+        for name in reversed(self._undo_log.pop()):
+            stack = self._bindings[name]
+            stack.pop()
+            if not stack:
+                del self._bindings[name]
+        self._scope_names.pop()
+
+    def declare(self, name, entry):
+        """
+        Binds name in the current scope, shadowing any outer binding.
+        """
+        depth = self.depth
+        if depth == 0 and self._frozen:
+            raise RuntimeError(f"cannot declare '{name}': global scope is frozen")
+        stack = self._bindings.setdefault(name, [])
+        if stack and stack[-1][0] == depth:
+            # Redeclaration in the same scope replaces the binding in place
+            stack[-1] = (depth, entry)
+            return
+        stack.append((depth, entry))
+        self._undo_log[-1].append(name)
+
+    def is_declared_in_scope(self, name):
+        """
+        Checks only the current (innermost) scope for the given name.
+        """
+        stack = self._bindings.get(name)
+        return bool(stack) and stack[-1][0] == self.depth
+
+    def lookup(self, name):
+        """
+        Returns the innermost visible binding for name, or None.
+        While global_reads is a set, names that resolve to the global scope
+        (or to nothing) are added to it.
+        """
+        stack = self._bindings.get(name)
+        if stack:
+            if self.global_reads is not None and stack[-1][0] == 0:
+                self.global_reads.add(name)
+            return stack[-1][1]
+        if self.global_reads is not None:
+            # An unresolved name is a dependency too: declaring it later matters
+            self.global_reads.add(name)
+        return None
+
+    def global_bindings(self):
+        """
+        Returns the global scope as a plain dict (name -> entry).
+        The dict is picklable, so it can be shipped to worker processes.
+        """
+        return {
+            name: stack[0][1]
+            for name, stack in self._bindings.items()
+            if stack[0][0] == 0
+        }
+
+    @classmethod
+    def from_globals(cls, bindings):
+        """
+        Rebuilds a table whose global scope holds the given bindings and is
+        frozen: inner scopes can still be pushed and popped, but any further
+        declaration at global level raises RuntimeError.
+        """
+        table = cls()
+        for name, entry in bindings.items():
+            table.declare(name, entry)
+        table._frozen = True
+        return table
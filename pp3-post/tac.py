@@ -0,0 +1,242 @@
+# tac.py
+"""
+Three-address code: the IR between the AST and MIPS.
+
+lowering.py turns each FnDecl into a TacFunction holding a flat list of
+the instructions below; mips_backend.py turns that list into MIPS.
+
+Operands are one of:
+    Temp      a compiler temporary (_tmpN)
+    Symbol    a declared variable (binding.Symbol: global, formal or local)
+    int       a 32-bit constant (bools are 0/1; doubles travel as the bits of
+              a single-precision float)
+
+Every instruction has uses() (the operands it reads) and, if it writes a
+value, a `dst` operand; defines() returns it as a tuple. Printed with str()
+an instruction reads like the "# _tmpN = ..." comments the direct emitter
+writes.
+"""
+from binding import Symbol
+
+# Binary operators. Integer arithmetic and comparisons use the Decaf spelling;
+# && and || combine 0/1 values; the f-prefixed forms act on single-precision
+# floats (Decaf doubles).
+ARITHMETIC_OPS = ("+", "-", "*", "/", "%")
+COMPARISON_OPS = ("<", "<=", ">", ">=", "==", "!=")
+LOGICAL_OPS = ("&&", "||")
+FLOAT_OPS = tuple("f" + op for op in ARITHMETIC_OPS[:4] + COMPARISON_OPS)
+
+
+def wrap32(value):
+    """Wraps a Python int to a signed 32-bit machine word."""
+    value &= 0xFFFFFFFF
+    return value - 0x100000000 if value & 0x80000000 else value
+
+
+class Temp:
+    """A compiler temporary."""
+
+    __slots__ = ("id", "name")
+
+    def __init__(self, temp_id):
+        self.id = temp_id
+        self.name = f"_tmp{temp_id}"
+
+    def __repr__(self):
+        return self.name
+
+
+def is_variable(operand):
+    """True for operands that name storage (temps and declared variables)."""
+    return isinstance(operand, (Temp, Symbol))
+
+
+def operand_name(operand):
+    if isinstance(operand, (Temp, Symbol)):
+        return operand.name
+    return str(operand)
+
+
+class Instr:
+    """Base class: no destination, no operands."""
+
+    __slots__ = ()
+    dst = None
+
+    def uses(self):
+        return ()
+
+    def defines(self):
+        return () if self.dst is None else (self.dst,)
+
+
+class Assign(Instr):
+    """dst = src"""
+
+    __slots__ = ("dst", "src")
+
+    def __init__(self, dst, src):
+        self.dst = dst
+        self.src = src
+
+    def uses(self):
+        return (self.src,)
+
+    def __str__(self):
+        return f"{operand_name(self.dst)} = {operand_name(self.src)}"
+
+
+class LoadString(Instr):
+    """dst = address of a string literal (text includes its quotes)"""
+
+    __slots__ = ("dst", "text")
+
+    def __init__(self, dst, text):
+        self.dst = dst
+        self.text = text
+
+    def __str__(self):
+        return f"{operand_name(self.dst)} = {self.text}"
+
+
+class BinOp(Instr):
+    """dst = left op right"""
+
+    __slots__ = ("dst", "op", "left", "right")
+
+    def __init__(self, dst, op, left, right):
+        self.dst = dst
+        self.op = op
+        self.left = left
+        self.right = right
+
+    def uses(self):
+        return (self.left, self.right)
+
+    def __str__(self):
+        return f"{operand_name(self.dst)} = {operand_name(self.left)} {self.op} {operand_name(self.right)}"
+
+
+class Label(Instr):
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __str__(self):
+        return f"{self.name}:"
+
+
+class Goto(Instr):
+    __slots__ = ("label",)
+
+    def __init__(self, label):
+        self.label = label
+
+    def __str__(self):
+        return f"Goto {self.label}"
+
+
+class IfZ(Instr):
+    """Jump to label when cond is zero."""
+
+    __slots__ = ("cond", "label")
+
+    def __init__(self, cond, label):
+        self.cond = cond
+        self.label = label
+
+    def uses(self):
+        return (self.cond,)
+
+    def __str__(self):
+        return f"IfZ {operand_name(self.cond)} Goto {self.label}"
+
+
+class PushParam(Instr):
+    __slots__ = ("arg",)
+
+    def __init__(self, arg):
+        self.arg = arg
+
+    def uses(self):
+        return (self.arg,)
+
+    def __str__(self):
+        return f"PushParam {operand_name(self.arg)}"
+
+
+class PopParams(Instr):
+    __slots__ = ("size",)
+
+    def __init__(self, size):
+        self.size = size
+
+    def __str__(self):
+        return f"PopParams {self.size}"
+
+
+class LCall(Instr):
+    """Call a label; dst (may be None) receives $v0."""
+
+    __slots__ = ("dst", "label")
+
+    def __init__(self, label, dst=None):
+        self.label = label
+        self.dst = dst
+
+    def __str__(self):
+        if self.dst is None:
+            return f"LCall {self.label}"
+        return f"{operand_name(self.dst)} = LCall {self.label}"
+
+
+class Return(Instr):
+    """Return from the function, with value in $v0 unless value is None."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value=None):
+        self.value = value
+
+    def uses(self):
+        return () if self.value is None else (self.value,)
+
+    def __str__(self):
+        return "Return" if self.value is None else f"Return {operand_name(self.value)}"
+
+
+# Instructions after which control never falls through
+JUMPS = (Goto, Return)
+BRANCHES = (Goto, IfZ)
+
+
+class TacFunction:
+    """One lowered function."""
+
+    def __init__(self, name, label, formals, local_slots):
+        self.name = name
+        self.label = label                  # "main" or "_name"
+        self.formals = formals              # [Symbol]
+        self.local_slots = local_slots      # frame slots binding.py assigned
+        self.code = []                      # [Instr]
+
+    def temps(self):
+        """Temps the function uses, in first-appearance order."""
+        seen = {}
+        for instr in self.code:
+            for operand in instr.defines() + tuple(instr.uses()):
+                if isinstance(operand, Temp):
+                    seen.setdefault(operand.id, operand)
+        return list(seen.values())
+
+    def __str__(self):
+        lines = [f"{self.label}:"]
+        for instr in self.code:
+            lines.append(f"{instr}" if isinstance(instr, Label) else f"\t{instr}")
+        return "\n".join(lines)
+
+
+def format_tac(functions):
+    """Readable listing of a lowered program."""
+    return "\n\n".join(str(function) for function in functions) + "\n"
@@ -0,0 +1,168 @@
+# value_numbering.py
+"""
+Local value numbering over TAC: common subexpression elimination within
+each basic block.
+
+Every value a block computes gets a number. A variable maps to the number
+of the value it holds now, a constant to a number of its own, and an
+expression to the number of (op, left number, right number), with the
+operands of commutative operators put in a fixed order. When an
+expression's number already exists and some variable still holds it, the
+BinOp becomes a copy of that variable. Operands are replaced by a
+non-global variable holding the same value, so repeated reads of one value
+all go through one register.
+
+Globals live in memory. When a block reads a global more than once before
+changing it, the first read copies it into a new temp and the later reads
+use that temp. Assigning a variable gives it a new number, which quietly
+invalidates whatever was known through its old one; a call gives every
+global a new number, since the callee may have assigned it.
+"""
+from itertools import count
+
+from binding import Symbol
+from cfg import split_blocks
+from tac import Temp, Assign, BinOp, LoadString, IfZ, PushParam, LCall, Return
+
+COMMUTATIVE_OPS = {"+", "*", "==", "!=", "&&", "||", "f+", "f*", "f==", "f!="}
+
+
+def is_global(operand):
+    return isinstance(operand, Symbol) and operand.is_global
+
+
+def number_values(function):
+    """Runs value numbering on every block of function. Returns the change count."""
+    next_temp = [max((temp.id for temp in function.temps()), default=-1) + 1]
+
+    def new_temp():
+        temp = Temp(next_temp[0])
+        next_temp[0] += 1
+        return temp
+
+    code = []
+    changes = 0
+    for block in split_blocks(function.code):
+        block_code, block_changes = number_block(block, new_temp)
+        code.extend(block_code)
+        changes += block_changes
+    function.code = code
+    return changes
+
+
+def reads_again(instrs, position, variable):
+    """True if variable is read after instrs[position] before it can change."""
+    for instr in instrs[position + 1:]:
+        if variable in instr.uses():
+            return True
+        if variable in instr.defines() or isinstance(instr, LCall):
+            return False
+    return False
+
+
+def number_block(instrs, new_temp):
+    variable_numbers = {}   # variable -> number of the value it holds
+    constant_numbers = {}   # constant -> number
+    constants = {}          # number -> constant
+    expressions = {}        # (op, number, number) -> number
+    holders = {}            # number -> variable that held it first
+    out = []
+    changes = 0
+    numbers = count()
+
+    def number_of(operand):
+        if isinstance(operand, int):
+            if operand not in constant_numbers:
+                constant_numbers[operand] = next(numbers)
+                constants[constant_numbers[operand]] = operand
+            return constant_numbers[operand]
+        if operand not in variable_numbers:
+            variable_numbers[operand] = next(numbers)
+            holders.setdefault(variable_numbers[operand], operand)
+        return variable_numbers[operand]
+
+    def holder(number):
+        """A variable holding number right now, or None."""
+        variable = holders.get(number)
+        if variable is not None and variable_numbers.get(variable) == number:
+            return variable
+        return None
+
+    def define(variable, number):
+        variable_numbers[variable] = number
+        current = holder(number)
+        if current is None or (is_global(current) and not is_global(variable)):
+            holders[number] = variable
+
+    def operand(value, position):
+        """The cheapest operand with the same value as `value`."""
+        nonlocal changes
+        if isinstance(value, int):
+            return value
+        number = number_of(value)
+        if number in constants:
+            changes += 1
+            return constants[number]
+        current = holder(number)
+        if current is not None and not is_global(current):
+            if current is not value:
+                changes += 1
+            return current
+        if is_global(value) and (reads_again(instrs, position, value)
+                                 or list(instrs[position].uses()).count(value) > 1):
+            # Read the global once into a temp for this and the later reads
+            temp = new_temp()
+            out.append(Assign(temp, value))
+            define(temp, number)
+            changes += 1
+            return temp
+        return value
+
+    for position, instr in enumerate(instrs):
+        if isinstance(instr, Assign):
+            instr.src = operand(instr.src, position)
+            define(instr.dst, number_of(instr.src))
+            if instr.src is instr.dst:
+                changes += 1
+                continue
+        elif isinstance(instr, BinOp):
+            instr.left = operand(instr.left, position)
+            instr.right = operand(instr.right, position)
+            key = (instr.op, number_of(instr.left), number_of(instr.right))
+            if instr.op in COMMUTATIVE_OPS and key[1] > key[2]:
+                key = (instr.op, key[2], key[1])
+            number = expressions.get(key)
+            current = None if number is None else holder(number)
+            if current is not None:
+                changes += 1
+                define(instr.dst, number)
+                if current is instr.dst:
+                    continue
+                instr = Assign(instr.dst, current)
+            else:
+                number = expressions[key] = next(numbers)
+                define(instr.dst, number)
+        elif isinstance(instr, LoadString):
+            key = ("string", instr.text)
+            number = expressions.get(key)
+            current = None if number is None else holder(number)
+            if current is not None:
+                changes += 1
+                instr = Assign(instr.dst, current)
+            else:
+                number = expressions[key] = next(numbers)
+            define(instr.dst, number)
+        elif isinstance(instr, PushParam):
+            instr.arg = operand(instr.arg, position)
+        elif isinstance(instr, IfZ):
+            instr.cond = operand(instr.cond, position)
+        elif isinstance(instr, Return) and instr.value is not None:
+            instr.value = operand(instr.value, position)
+        elif isinstance(instr, LCall):
+            # The callee may assign any global
+            for variable in [variable for variable in variable_numbers if is_global(variable)]:
+                variable_numbers[variable] = next(numbers)
+            if instr.dst is not None:
+                define(instr.dst, next(numbers))
+        out.append(instr)
+    return out, changes